@@ -1,4 +1,5 @@
 import os
+import sys
 import logging
 from logging.handlers import RotatingFileHandler
 import csv
@@ -23,6 +24,9 @@ from urllib.parse import urljoin
 from pathlib import Path
 from datetime import datetime
 import concurrent.futures
+import hashlib
+import threading
+import json
 import requests
 
 
@@ -35,6 +39,25 @@ from urllib.parse import urlparse, urlunparse
 # -------- Configuración --------
 busqueda = "alcoy-alcoi"
 SCRIPT_DIR = Path(__file__).resolve().parent
+# Raíz del repo (para importar utils/ al lanzar el script directamente)
+REPO_ROOT = SCRIPT_DIR.parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from ego_parser import extract_preference_html
+from utils import net_blocking
+from utils.cookie_store import (
+    CookieStore,
+    apply_to_browser,
+    apply_to_session,
+    cookies_from_session,
+)
+from utils.browser_pool import BrowserWorkerPool, max_workers_for_memory
+from utils.http_session import HttpStats, mount_pool
+from utils.journal import PARSE_RESUME, ParseJournal
+from utils.lazy_load import FOTOCASA_CARD_COUNT_JS, scroll_until_stable
+from utils.upsert import keyed_upsert
+
 PROJECT_ROOT = (
     SCRIPT_DIR.parent.parent
 )  # .../Scrappers/Idealista/Scripts -> sube dos niveles
@@ -151,40 +174,11 @@ def build_browser(headless=False):
         "profile.managed_default_content_settings.stylesheets": 1,
     }
     opts.add_experimental_option("prefs", prefs)
+    net_blocking.configure_options(opts)
 
     browser = uc.Chrome(options=opts)
-    # Bloquear recursos pesados vía CDP para acelerar
-    try:
-        browser.execute_cdp_cmd("Network.enable", {})
-        browser.execute_cdp_cmd(
-            "Network.setBlockedURLs",
-            {
-                "urls": [
-                    "*.png",
-                    "*.jpg",
-                    "*.jpeg",
-                    "*.gif",
-                    "*.webp",
-                    "*.svg",
-                    "*.ico",
-                    "*.woff",
-                    "*.woff2",
-                    "*.ttf",
-                    "*.otf",
-                    "*.eot",
-                    "*.mp4",
-                    "*.webm",
-                    "*.mp3",
-                    "*.avi",
-                    "*.mov",
-                    "*.m4a",
-                    "*.mkv",
-                    "*.flac",
-                ]
-            },
-        )
-    except Exception:
-        pass
+    # Bloquear recursos pesados (media, fuentes, imágenes) y terceros vía CDP
+    net_blocking.apply_blocking(browser, "ego")
 
     # Timeouts más agresivos en modo FAST
     try:
@@ -231,6 +225,7 @@ def clear_browser_state(browser, *, clear_cache=True, clear_cookies=True):
     """
     Limpia caché y cookies vía CDP para cortar crecimiento de memoria.
     """
+    net_blocking.collect(browser)
     try:
         if clear_cache:
             browser.execute_cdp_cmd("Network.clearBrowserCache", {})
@@ -414,9 +409,6 @@ def scrape_fotocasa_ids(
     def _build_url(busq, t):
         return f"https://www.fotocasa.es/es/{_segmento(t)}/{busq}/todas-las-zonas/l"
 
-    def _sleep():
-        time.sleep(random.uniform(min_wait, max_wait))
-
     def _accept_cookies_if_any():
 
         for xpath in (
@@ -431,69 +423,6 @@ def scrape_fotocasa_ids(
             except Exception:
                 continue
 
-    def _vh():
-        try:
-            return int(browser.execute_script("return window.innerHeight || 0;") or 0)
-        except JavascriptException:
-            return 0
-
-    def _scroll_y():
-        try:
-            return int(
-                browser.execute_script(
-                    "return window.scrollY || window.pageYOffset || 0;"
-                )
-                or 0
-            )
-        except JavascriptException:
-            return 0
-
-    def _page_height():
-        try:
-            return int(
-                browser.execute_script("return document.body.scrollHeight || 0") or 0
-            )
-        except JavascriptException:
-            return 0
-
-    def _at_bottom(margin_px=64):
-        h = _page_height()
-        y = _scroll_y()
-        vh = _vh()
-        return (y + vh) >= max(0, h - margin_px)
-
-    def _micro_scroll():
-        try:
-            browser.execute_script(f"window.scrollBy(0, {int(step_px)});")
-        except JavascriptException:
-            pass
-
-    def _cards_count():
-        try:
-            js = """
-              const isRealCard = (el) => (
-                !el.closest('.re-RecommenderSearch') &&
-                !el.closest('[class*="recommender-slider"]') &&
-                !el.closest('.re-SearchResultAdjacents') &&
-                !el.closest('[data-testid="recommender"]')
-              );
-              const sels = [
-                'article.container.w-full',
-                '[data-testid="re-Card"]',
-                'article[id^="re-Card"]',
-                'article[data-testid*="Card"]',
-                'article'
-              ];
-              for (const s of sels) {
-                const nodes = [...document.querySelectorAll(s)].filter(isRealCard);
-                if (nodes.length > 0) return nodes.length;
-              }
-              return 0;
-            """
-            return int(browser.execute_script(js) or 0)
-        except JavascriptException:
-            return 0
-
     def _remove_non_listing_sections(soup) -> None:
         selectors = [
             "div.re-RecommenderSearch",
@@ -707,31 +636,16 @@ def scrape_fotocasa_ids(
             _accept_cookies_if_any()
             first_page = False
 
-        stable = 0
-        bottom_hits = 0
-        last_count = 0
-        last_height = 0
-        for _ in range(max_scrolls):
-            _micro_scroll()
-            _sleep()
-            cnt = _cards_count()
-            h = _page_height()
-            grew_cards = cnt > last_count
-            grew_height = h > last_height
-            stable = 0 if (grew_cards or grew_height) else (stable + 1)
-            last_count = max(last_count, cnt)
-            last_height = max(last_height, h)
-            if _at_bottom():
-                if stable >= stability_rounds:
-                    bottom_hits += 1
-                    try:
-                        browser.execute_script("window.scrollBy(0, -50);")
-                        _sleep()
-                        browser.execute_script("window.scrollBy(0, 50);")
-                    except JavascriptException:
-                        pass
-                if bottom_hits >= bottom_rounds and stable >= stability_rounds:
-                    break
+        # Scroll hasta el fondo y recuento de tarjetas en una sola llamada
+        scroll_until_stable(
+            browser,
+            count_js=FOTOCASA_CARD_COUNT_JS,
+            step_px=step_px,
+            pause_ms=int((min_wait + max_wait) / 2 * 1000),
+            stability_rounds=stability_rounds,
+            bottom_rounds=bottom_rounds,
+            max_steps=max_scrolls,
+        )
 
         html = browser.page_source
         for can in _collect_detail_links(html):
@@ -848,72 +762,18 @@ def parsear_inmueble(id_inmueble_url, browser, first_run):
             pass
 
         # ---------- SCROLL A FONDO ANTES DE PARSEAR ----------
-        def _vh():
-            try:
-                return int(browser.execute_script("return window.innerHeight||0") or 0)
-            except Exception:
-                return 0
-
-        def _scroll_y():
-            try:
-                return int(browser.execute_script("return window.scrollY||0") or 0)
-            except Exception:
-                return 0
-
-        def _page_height():
-            try:
-                return int(
-                    browser.execute_script("return document.body.scrollHeight||0") or 0
-                )
-            except Exception:
-                return 0
-
-        def _at_bottom(margin_px=64):
-            h = _page_height()
-            y = _scroll_y()
-            vh = _vh()
-            return (y + vh) >= max(0, h - margin_px)
-
-        step_px = 200
-        stability_rounds = 3
-        bottom_rounds = 1
-        max_scrolls = 300  # límite duro de seguridad
-
-        stable = 0
-        bottom_hits = 0
-        last_height = 0
-
-        for _ in range(max_scrolls):
-            try:
-                browser.execute_script(f"window.scrollBy(0,{step_px});")
-            except Exception:
-                break
-            time.sleep(random.uniform(0.03, 0.06))  # micro-espera para lazy-load
-            h = _page_height()
-            if h > last_height:
-                stable = 0
-                last_height = h
-            else:
-                stable += 1
-
-            if _at_bottom():
-                if stable >= stability_rounds:
-                    bottom_hits += 1
-                    # pequeño 'shake' para disparar últimos observers
-                    try:
-                        browser.execute_script("window.scrollBy(0,-40);")
-                        time.sleep(0.03)
-                        browser.execute_script("window.scrollBy(0,40);")
-                    except Exception:
-                        pass
-                if bottom_hits >= bottom_rounds and stable >= stability_rounds:
-                    break
-        # (Opcional) subir un poco para que queden en viewport algunos bloques clave
-        try:
-            browser.execute_script("window.scrollBy(0,-200);")
-        except Exception:
-            pass
-        # -----------------------------------------------------
+        # Una sola llamada asíncrona; al terminar sube 200px para dejar en
+        # viewport algunos bloques clave
+        scroll_until_stable(
+            browser,
+            step_px=200,
+            pause_ms=45,
+            stability_rounds=3,
+            bottom_rounds=1,
+            max_steps=300,
+            shake_px=40,
+            back_up_px=200,
+        )
 
         html = browser.page_source
         soup = bs(html, "lxml")
@@ -1223,6 +1083,54 @@ try:
     _workers_env = int(os.getenv("EGO_HTTP_WORKERS") or "0")
 except Exception:
     _workers_env = 0
+# Listado por HTTP contra el endpoint AJAX (entitysearch) en vez de paginar con Selenium
+EGO_HTTP_LIST = (os.getenv("EGO_HTTP_LIST") or "true").lower() in ("1", "true", "yes")
+try:
+    EGO_LIST_PAGE_SIZE = max(10, int(os.getenv("EGO_LIST_PAGE_SIZE") or "200"))
+except Exception:
+    EGO_LIST_PAGE_SIZE = 200
+try:
+    EGO_LIST_WORKERS = max(1, min(16, int(os.getenv("EGO_LIST_WORKERS") or "6")))
+except Exception:
+    EGO_LIST_WORKERS = 6
+# Tipos de contacto: Cliente Potencial (1), Cliente (6), Informador (1103)
+EGO_ENTITY_TYPES = (1, 6, 1103)
+# Reintentos (con backoff) de las peticiones HTTP ante 429/5xx
+try:
+    EGO_HTTP_RETRIES = max(0, int(os.getenv("EGO_HTTP_RETRIES") or "3"))
+except Exception:
+    EGO_HTTP_RETRIES = 3
+# Fallback Selenium de preferencias: navegadores en paralelo (acotados por RAM)
+try:
+    EGO_FALLBACK_WORKERS = max(1, int(os.getenv("EGO_FALLBACK_WORKERS") or "3"))
+except Exception:
+    EGO_FALLBACK_WORKERS = 3
+EGO_MB_PER_WORKER = int(os.getenv("EGO_MB_PER_WORKER") or "700")
+EGO_FALLBACK_RECYCLE_EVERY = int(os.getenv("EGO_FALLBACK_RECYCLE_EVERY") or "60")
+# Visitas tras el listado (EGO_VISIT_AFTER_LIST) por HTTP con concurrencia acotada
+EGO_VISIT_HTTP = (os.getenv("EGO_VISIT_HTTP") or "true").lower() in ("1", "true", "yes")
+try:
+    EGO_VISIT_WORKERS = max(1, min(32, int(os.getenv("EGO_VISIT_WORKERS") or "8")))
+except Exception:
+    EGO_VISIT_WORKERS = 8
+# Modo 'all': días tras los que se vuelve a pedir la preferencia aunque la
+# firma del listado no haya cambiado
+try:
+    EGO_PREF_TTL_DAYS = float(os.getenv("EGO_PREF_TTL_DAYS") or "7")
+except Exception:
+    EGO_PREF_TTL_DAYS = 7.0
+# Histogramas de latencia/estado de todas las peticiones HTTP del proceso
+HTTP_STATS = HttpStats()
+# Sesión autenticada persistida entre ejecuciones (cifrada con Fernet).
+# EGO_SESSION_KEY: clave Fernet (Fernet.generate_key()); sin ella no se guarda.
+EGO_SESSION_KEY = os.getenv("EGO_SESSION_KEY") or ""
+try:
+    EGO_SESSION_MAX_AGE_H = float(os.getenv("EGO_SESSION_MAX_AGE_H") or "72")
+except Exception:
+    EGO_SESSION_MAX_AGE_H = 72.0
+SESSION_STORE = CookieStore(
+    REPO_ROOT / ".cache" / "ego_session.bin", EGO_SESSION_KEY, EGO_SESSION_MAX_AGE_H
+)
 
 
 def ego_login(browser):
@@ -1404,7 +1312,15 @@ def apply_entity_type_filters(browser, values=(6,)):
 
 
 def parse_contact_card(card):
-    soup = bs(card.get_attribute("outerHTML"), "lxml")
+    return parse_contact_card_html(card.get_attribute("outerHTML"))
+
+
+def parse_contact_card_html(html):
+    """
+    Campos de una tarjeta del listado de contactos a partir de su HTML (o de
+    un nodo bs4 ya parseado). Lo comparten el listado Selenium y el HTTP.
+    """
+    soup = bs(html, "lxml") if isinstance(html, str) else html
 
     def txt(sel):
         el = soup.select_one(sel)
@@ -1492,33 +1408,8 @@ def collect_contacts_on_page(browser):
             logger.warning("Listado: sin tarjetas visibles tras espera")
             return [], 1, ""
 
-    cards = browser.find_elements(By.CSS_SELECTOR, "div.listItem.contactItem")
-    if not cards:
-        # Fallback a listItem genérico si cambió la clase
-        cards = browser.find_elements(By.CSS_SELECTOR, "div.listItem")
-    rows = []
-    for c in cards:
-        try:
-            rows.append(parse_contact_card(c))
-        except Exception:
-            continue
-    # info de página
-    curr = 1
-    try:
-        curr = int(
-            browser.find_element(
-                By.CSS_SELECTOR, ".listPagination[data-current-page]"
-            ).get_attribute("data-current-page")
-        )
-    except Exception:
-        pass
-    vis = ""
-    try:
-        vis = browser.find_element(By.CSS_SELECTOR, "#hVisibleObjIDs").get_attribute(
-            "value"
-        )
-    except Exception:
-        pass
+    # Una sola instantánea del DOM en lugar de un outerHTML por tarjeta
+    rows, curr, vis = parse_contacts_page_html(browser.page_source)
     logger.info(
         "Listado: tarjetas=%s pagina=%s visibles_len=%s",
         len(rows),
@@ -1528,6 +1419,41 @@ def collect_contacts_on_page(browser):
     return rows, curr, vis
 
 
+def _contact_cards_from_soup(soup):
+    cards = soup.select("div.listItem.contactItem") or soup.select("div.listItem")
+    rows = []
+    for c in cards:
+        try:
+            rows.append(parse_contact_card_html(c))
+        except Exception:
+            continue
+    return rows
+
+
+def parse_contact_cards_html(html: str):
+    """Todas las tarjetas de un HTML de listado (página completa o fragmento AJAX)."""
+    return _contact_cards_from_soup(bs(html or "", "lxml"))
+
+
+def parse_contacts_page_html(html: str):
+    """
+    Tarjetas, página actual y valor de #hVisibleObjIDs a partir de una sola
+    instantánea del DOM (page_source): un único árbol para toda la página.
+    """
+    soup = bs(html or "", "lxml")
+    rows = _contact_cards_from_soup(soup)
+    curr = 1
+    pag = soup.select_one(".listPagination[data-current-page]")
+    if pag is not None:
+        try:
+            curr = int(pag.get("data-current-page"))
+        except (TypeError, ValueError):
+            pass
+    vis_el = soup.select_one("#hVisibleObjIDs")
+    vis = (vis_el.get("value") or "") if vis_el is not None else ""
+    return rows, curr, vis
+
+
 # -------- Parser: Oportunidades del detalle de contacto Ego --------
 def _parse_opportunities_from_html(html: str, person_id: str):
     """
@@ -1710,17 +1636,13 @@ def fetch_contact_opportunities(browser, person_id: str):
 def _extract_preference_text_from_html(html: str) -> str:
     """
     Extrae el HTML del bloque .contactCardPreference completo (outer HTML).
-    Devuelve una cadena HTML, o "" si no existe.
+    Devuelve una cadena HTML, o "" si no existe. Solo parsea el fragmento del
+    bloque, no la página entera (ver ego_parser).
     """
     try:
-        soup = bs(html, "lxml")
-        pref = soup.select_one(".contactCardPreference")
-        if pref:
-            # Devolver el HTML del bloque (incluyendo sus spans internos)
-            return str(pref)
+        return extract_preference_html(html)
     except Exception:
-        pass
-    return ""
+        return ""
 
 
 def fetch_contact_preferences_http(
@@ -1730,15 +1652,13 @@ def fetch_contact_preferences_http(
     url = f"https://admin.egorealestate.com/egocore/person/{person_id}"
     try:
         r = session.get(url, timeout=timeout, allow_redirects=True)
+        # Sesión caducada: relogin por HTTP y un reintento
+        if _looks_like_login(r) and refresh_http_session(session):
+            r = session.get(url, timeout=timeout, allow_redirects=True)
         if r.status_code == 200 and (r.text or "").strip():
             # Detectar HTML de login/redirección (ReturnURL) y evitar tratarlo como ficha
-            try:
-                if ("ReturnURL=" in r.url) or ("ReturnURL=" in (r.text or "")):
-                    return ""
-                if re.search(r"<input[^>]+type=\"password\"", r.text or "", flags=re.I):
-                    return ""
-            except Exception:
-                pass
+            if _looks_like_login(r):
+                return ""
             return _extract_preference_text_from_html(r.text)
         else:
             logger.debug(
@@ -1751,33 +1671,35 @@ def fetch_contact_preferences_http(
     return ""
 
 
-def fetch_contact_preferences_browser(browser, person_id: str) -> str:
-    """Fallback con Selenium para asegurar la preferencia si no se obtuvo por HTTP."""
+def _browser_on_login(browser) -> bool:
+    """True si el navegador está en el login (redirección con ReturnURL o formulario)."""
+    try:
+        if "ReturnURL=" in (browser.current_url or ""):
+            return True
+        return bool(browser.find_elements(By.CSS_SELECTOR, "input[type='password']"))
+    except Exception:
+        return False
+
+
+def fetch_contact_preferences_browser(browser, person_id: str):
+    """
+    Fallback con Selenium para asegurar la preferencia si no se obtuvo por HTTP.
+    Devuelve el texto ("" si la ficha no tiene preferencia) o None si la ficha
+    no se pudo cargar (error o sesión perdida), para no darla por vacía.
+    """
     try:
         detail_url = f"https://admin.egorealestate.com/egocore/person/{person_id}"
         safe_get(browser, detail_url, timeout=20)
         # Si nos ha redirigido a login (ReturnURL) o hay formulario de login, reloguear y reintentar una vez
-        try:
-            curr_url = browser.current_url
-        except Exception:
-            curr_url = ""
-        need_login = False
-        if "ReturnURL=" in (curr_url or ""):
-            need_login = True
-        else:
-            try:
-                need_login = bool(
-                    browser.find_elements(By.CSS_SELECTOR, "input[type='password']")
-                )
-            except Exception:
-                need_login = False
-        if need_login:
+        if _browser_on_login(browser):
             try:
                 logger.info("Sesion expirada al abrir %s; relogueando...", detail_url)
                 ego_login(browser)
                 safe_get(browser, detail_url, timeout=20)
             except Exception:
                 pass
+            if _browser_on_login(browser):
+                return None
         try:
             WebDriverWait(browser, 4 if EGO_FAST else 6).until(
                 EC.presence_of_element_located(
@@ -1789,19 +1711,19 @@ def fetch_contact_preferences_browser(browser, person_id: str) -> str:
         html = browser.page_source
         return _extract_preference_text_from_html(html)
     except Exception:
-        return ""
+        logger.debug("Selenium: error leyendo preferencia de %s", person_id, exc_info=True)
+        return None
 
 
-def make_http_session_from_browser(browser) -> requests.Session:
-    """Crea una sesión HTTP con cookies de Selenium para llamadas AJAX rápidas."""
+def make_http_session(cookies=(), user_agent=None, pool_size: int = 10) -> requests.Session:
+    """
+    Sesión HTTP para las llamadas AJAX con las cookies dadas (formato Selenium).
+    `pool_size` debe ser el nº de hilos que la comparten (ver mount_pool).
+    """
     sess = requests.Session()
-    # User-Agent del navegador para mantener coherencia
-    try:
-        ua = browser.execute_script("return navigator.userAgent") or None
-    except Exception:
-        ua = None
-    if ua:
-        sess.headers.update({"User-Agent": ua})
+    mount_pool(sess, pool_size, retries=EGO_HTTP_RETRIES, stats=HTTP_STATS)
+    if user_agent:
+        sess.headers.update({"User-Agent": user_agent})
     sess.headers.update(
         {
             "Referer": CONTACTS_URL,
@@ -1810,25 +1732,145 @@ def make_http_session_from_browser(browser) -> requests.Session:
             "X-Requested-With": "XMLHttpRequest",
         }
     )
-    # Copiar cookies del dominio admin.egorealestate.com
+    # Solo cookies del dominio admin.egorealestate.com
+    apply_to_session(sess, cookies, domain="egorealestate.com")
+    logger.debug("HTTP: sesión preparada con %s cookies", len(sess.cookies))
+    return sess
+
+
+def make_http_session_from_browser(browser, pool_size: int = 10) -> requests.Session:
+    """Crea una sesión HTTP con cookies de Selenium para llamadas AJAX rápidas."""
+    # User-Agent del navegador para mantener coherencia
     try:
-        for c in browser.get_cookies():
-            try:
-                if ".egorealestate.com" in (
-                    c.get("domain") or ""
-                ) or "egorealestate.com" in (c.get("domain") or ""):
-                    sess.cookies.set(
-                        c.get("name"),
-                        c.get("value"),
-                        domain=c.get("domain"),
-                        path=c.get("path", "/"),
-                    )
-            except Exception:
+        ua = browser.execute_script("return navigator.userAgent") or None
+    except Exception:
+        ua = None
+    try:
+        cookies = browser.get_cookies()
+    except Exception:
+        cookies = []
+    return make_http_session(cookies, ua, pool_size)
+
+
+# -------- Sesión persistida y relogin por HTTP --------
+_SESSION_LOCK = threading.Lock()
+# Si el login HTTP falla una vez no se reintenta en cada petición del pool
+_HTTP_LOGIN_FALLIDO = threading.Event()
+
+
+def probe_session(sess: requests.Session, timeout: float = 15.0) -> str:
+    """
+    Comprueba por HTTP que la sesión sigue autenticada pidiendo el listado de
+    contactos. Devuelve su HTML si es válida (sirve para leer data-search-url)
+    o "" si redirige al login.
+    """
+    try:
+        r = sess.get(CONTACTS_URL, timeout=timeout, allow_redirects=True)
+    except requests.RequestException:
+        return ""
+    if r.status_code != 200 or _looks_like_login(r) or "entitysearch" not in (r.text or ""):
+        return ""
+    return r.text
+
+
+def login_http(sess: requests.Session, timeout: float = 20.0) -> bool:
+    """
+    Login sin navegador: rellena el formulario de login (con sus campos
+    ocultos, p. ej. el token antifalsificación) y lo envía con la sesión.
+    Devuelve True si después la sesión pasa probe_session.
+    """
+    try:
+        r = sess.get(LOGIN_URL, timeout=timeout, allow_redirects=True)
+        soup = bs(r.text or "", "lxml")
+        pwd = soup.select_one("input[type='password']")
+        if pwd is None:
+            # Sin formulario: o ya estamos dentro o el login no es el esperado
+            return bool(probe_session(sess))
+        form = pwd.find_parent("form")
+        user = None
+        if form is not None:
+            user = form.select_one(
+                "input[type='email'], input[name*='email' i], input#Email"
+            ) or form.select_one("input[type='text']")
+        if form is None or user is None or not user.get("name") or not pwd.get("name"):
+            logger.info("Login HTTP: formulario no reconocido")
+            return False
+        data = {}
+        for inp in form.select("input[name]"):
+            tipo = (inp.get("type") or "text").lower()
+            if tipo in ("submit", "button", "image"):
+                continue
+            if tipo in ("checkbox", "radio") and not inp.has_attr("checked"):
                 continue
+            data[inp["name"]] = inp.get("value") or ""
+        data[user["name"]] = EGO_EMAIL
+        data[pwd["name"]] = EGO_PASS
+        action = urljoin(r.url, form.get("action") or r.url)
+        sess.post(action, data=data, timeout=timeout, allow_redirects=True)
     except Exception:
-        pass
-    logger.debug("HTTP: sesión preparada con %s cookies", len(sess.cookies))
-    return sess
+        logger.exception("Login HTTP: error")
+        return False
+    return bool(probe_session(sess))
+
+
+def save_session(sess: requests.Session) -> None:
+    """Persiste (cifradas) las cookies actuales de la sesión."""
+    if SESSION_STORE.save(cookies_from_session(sess), sess.headers.get("User-Agent")):
+        logger.debug("Sesión: cookies guardadas")
+
+
+def refresh_http_session(sess: requests.Session) -> bool:
+    """
+    Renueva por HTTP una sesión caducada a mitad de ejecución. Entre hilos se
+    serializa: el primero relogea y los demás ven la sesión ya válida.
+    """
+    if _HTTP_LOGIN_FALLIDO.is_set():
+        return False
+    with _SESSION_LOCK:
+        if _HTTP_LOGIN_FALLIDO.is_set():
+            return False
+        if probe_session(sess):
+            return True
+        logger.info("Sesión caducada; relogin por HTTP")
+        ok = login_http(sess)
+        if ok:
+            save_session(sess)
+        else:
+            _HTTP_LOGIN_FALLIDO.set()
+            logger.warning("Login HTTP: no se pudo renovar la sesión")
+        return ok
+
+
+def build_logged_browser(sess=None):
+    """
+    Navegador dentro de Ego: con las cookies de `sess` si siguen valiendo o,
+    si no, con el login del formulario. Queda en el listado de contactos.
+    """
+    browser = build_browser(headless=EGO_HEADLESS)
+    try:
+        cookies = cookies_from_session(sess) if sess is not None else []
+        if not (cookies and restore_browser_session(browser, cookies)):
+            ego_login(browser)
+            goto_contacts(browser)
+    except Exception:
+        try:
+            browser.quit()
+        except Exception:
+            pass
+        raise
+    return browser
+
+
+def restore_browser_session(browser, cookies) -> bool:
+    """Lleva las cookies de la sesión al navegador y abre el listado sin login."""
+    try:
+        # add_cookie exige estar en el dominio
+        safe_get(browser, LOGIN_URL, timeout=25)
+        apply_to_browser(browser, cookies)
+        goto_contacts(browser)
+        return True
+    except Exception:
+        return False
 
 
 def fetch_contact_opportunities_http(
@@ -1851,6 +1893,229 @@ def fetch_contact_opportunities_http(
     return []
 
 
+# -------- Listado de contactos por HTTP (endpoint entitysearch) --------
+ENTITYSEARCH_URL = "https://admin.egorealestate.com/egocore/search/entitysearch"
+
+
+def _looks_like_login(resp) -> bool:
+    """True si la respuesta es la página de login (sesión caducada)."""
+    try:
+        body = resp.text or ""
+        if ("ReturnURL=" in resp.url) or ("ReturnURL=" in body):
+            return True
+        return bool(re.search(r"<input[^>]+type=\"password\"", body, flags=re.I))
+    except Exception:
+        return False
+
+
+def entitysearch_url_from_html(html: str) -> str:
+    """URL AJAX del listado que anuncia el contenedor (data-search-url)."""
+    try:
+        el = bs(html or "", "lxml").select_one(
+            "div.list.PageContext[data-search-url*='entitysearch']"
+        )
+        if el is not None and el.get("data-search-url"):
+            return urljoin(CONTACTS_URL, el["data-search-url"])
+    except Exception:
+        pass
+    return ENTITYSEARCH_URL
+
+
+def entitysearch_filters_from_html(html: str, values=EGO_ENTITY_TYPES):
+    """
+    Filtros de tipo tal como los envía el sidebar (#QuickSearch): nombre del
+    parámetro (data-name) y valor de cada etiqueta de EntityType. Devuelve
+    (params, tipos) con tipos = {etiqueta en minúsculas: valor} de todas las
+    etiquetas del grupo, o None si alguno de `values` no está en la página (la
+    petición sería una suposición y se usa la paginación Selenium).
+    """
+    try:
+        anchors = bs(html or "", "lxml").select(
+            "#QuickSearch .sidebarTagGroup .sideTag a[data-name='EntityType'][data-value]"
+        )
+    except Exception:
+        return None
+    params = {}
+    tipos = {}
+    for a in anchors:
+        value = str(a.get("data-value") or "").strip()
+        label = a.get_text(" ", strip=True).lower()
+        if label and value:
+            tipos[label] = value
+        if value in {str(v) for v in values}:
+            params.setdefault(a["data-name"], []).append(value)
+    found = {v for vals in params.values() for v in vals}
+    if found != {str(v) for v in values}:
+        logger.info(
+            "HTTP listado: el sidebar no anuncia EntityType=%s",
+            ",".join(sorted({str(v) for v in values} - found)),
+        )
+        return None
+    return params, tipos
+
+
+def _listing_html_from_response(resp) -> str:
+    """El endpoint devuelve HTML; si llegara JSON, busca el campo con las tarjetas."""
+    ctype = (resp.headers.get("Content-Type") or "").lower()
+    if "json" not in ctype:
+        return resp.text or ""
+    try:
+        data = resp.json()
+    except ValueError:
+        return resp.text or ""
+    stack = [data]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, str) and "listItem" in cur:
+            return cur
+        if isinstance(cur, dict):
+            stack.extend(cur.values())
+        elif isinstance(cur, list):
+            stack.extend(cur)
+    return ""
+
+
+def _total_pages_from_html(html: str) -> int:
+    """Nº de páginas según la paginación del fragmento (0 si no se puede saber)."""
+    soup = bs(html or "", "lxml")
+    total = 0
+    pag = soup.select_one(".listPagination")
+    if pag is not None:
+        for attr in ("data-total-pages", "data-page-count", "data-pages"):
+            try:
+                total = max(total, int(pag.get(attr) or 0))
+            except ValueError:
+                pass
+    for a in soup.select(".paginationPages a"):
+        t = a.get_text(strip=True)
+        if t.isdigit():
+            total = max(total, int(t))
+    return total
+
+
+def fetch_contacts_page_http(
+    session: requests.Session,
+    search_url: str,
+    page: int,
+    filters: dict,
+    page_size: int = EGO_LIST_PAGE_SIZE,
+    timeout: float = 30.0,
+    retries: int = 1,
+):
+    """
+    Descarga una página del listado vía entitysearch con los filtros del
+    sidebar (ver entitysearch_filters_from_html).
+    Devuelve (filas, total_paginas) o None si falla (o la sesión caducó).
+    """
+    params = dict(filters, page=str(page), pageSize=str(page_size))
+    for attempt in range(retries + 1):
+        try:
+            r = session.get(search_url, params=params, timeout=timeout)
+            if r.status_code == 200 and not _looks_like_login(r):
+                html = _listing_html_from_response(r)
+                return parse_contact_cards_html(html), _total_pages_from_html(html)
+            logger.debug(
+                "HTTP listado: status %s en página %s (intento %s)",
+                r.status_code,
+                page,
+                attempt + 1,
+            )
+            if _looks_like_login(r) and not refresh_http_session(session):
+                return None
+        except Exception:
+            logger.debug("HTTP listado: error en página %s", page, exc_info=True)
+        time.sleep(0.5 * (attempt + 1))
+    return None
+
+
+def list_contacts_http(
+    session: requests.Session,
+    search_url: str,
+    filters: dict,
+    tipos: dict,
+    entity_types=EGO_ENTITY_TYPES,
+    page_size: int = EGO_LIST_PAGE_SIZE,
+    workers: int = EGO_LIST_WORKERS,
+):
+    """
+    Recorre el listado completo por HTTP con páginas grandes y descargas
+    concurrentes. Si la paginación indica el total se piden todas de golpe; si
+    no, por tandas de `workers` páginas hasta una que no aporte IDs nuevos.
+    `filters` y `tipos` salen de entitysearch_filters_from_html.
+    Devuelve (filas, páginas) o None si alguna página falla, el listado acaba
+    antes del total anunciado o aparecen tarjetas de otros tipos (el servidor
+    ignoró el filtro), para que el llamador use la paginación Selenium (un
+    listado parcial o de más falsearía los nuevos).
+    """
+    first = fetch_contacts_page_http(session, search_url, 1, filters, page_size)
+    if first is None or not first[0]:
+        logger.info("HTTP listado: sin tarjetas en la primera página")
+        return None
+    rows_p1, total = first
+    pages = {1: rows_p1}
+    seen = {str(r.get("contact_id") or "") for r in rows_p1}
+
+    def _fetch(p):
+        return p, fetch_contacts_page_http(session, search_url, p, filters, page_size)
+
+    next_p = 2
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+        while True:
+            if total:
+                batch = list(range(next_p, total + 1))
+            else:
+                batch = list(range(next_p, next_p + workers))
+            if not batch:
+                break
+            results = dict(fut.result() for fut in [ex.submit(_fetch, p) for p in batch])
+            if any(results[p] is None for p in batch):
+                logger.warning("HTTP listado: fallo descargando páginas %s", batch)
+                return None
+            fin = False
+            for p in batch:
+                rows_p = results[p][0]
+                ids_p = {str(r.get("contact_id") or "") for r in rows_p} - {""}
+                # Página vacía o repetida (el servidor devuelve la última): fin
+                if not ids_p or ids_p <= seen:
+                    fin = True
+                    break
+                seen |= ids_p
+                pages[p] = rows_p
+                total = max(total, results[p][1])
+            if fin or (total and batch[-1] >= total):
+                break
+            next_p = batch[-1] + 1
+
+    # Con total conocido, una página vacía o repetida antes del final es un
+    # listado cortado (sesión caducada, límite del servidor), no el final
+    if total and max(pages) < total:
+        logger.warning(
+            "HTTP listado: cortado en la página %s de %s", max(pages), total
+        )
+        return None
+
+    rows = [r for p in sorted(pages) for r in pages[p]]
+    # El rol de la tarjeta es la etiqueta de su tipo: uno no pedido significa
+    # que el filtro no se aplicó
+    permitidos = {str(v) for v in entity_types}
+    ajenos = {
+        r.get("rol")
+        for r in rows
+        if tipos.get((r.get("rol") or "").strip().lower(), "") not in ("", *permitidos)
+    }
+    if ajenos:
+        logger.warning("HTTP listado: tarjetas de tipos no pedidos %s", sorted(ajenos))
+        return None
+    logger.info(
+        "HTTP listado: páginas=%s tarjetas=%s (page_size=%s workers=%s)",
+        len(pages),
+        len(rows),
+        page_size,
+        workers,
+    )
+    return rows, len(pages)
+
+
 def next_page(browser, expected_curr):
     """
     Avanza a la siguiente página del listado de contactos.
@@ -2105,6 +2370,81 @@ def visit_contact_detail(browser, person_id: str, *, wait_for_ready=True) -> boo
         return False
 
 
+# -------- Detección de cambios por contacto (modo 'all') --------
+def _hash_text(text) -> str:
+    return hashlib.sha1(str(text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def contact_signature(row: dict) -> str:
+    """
+    Firma barata del contacto con datos que ya trae el listado: % de perfil,
+    etiquetas y creado_info. Si cambia, probablemente cambió la preferencia.
+    """
+    partes = [str(row.get(k) or "").strip() for k in ("perfil_pct", "labels", "creado_info")]
+    return _hash_text("|".join(partes))
+
+
+def load_contact_state(path: str) -> dict:
+    """{id: {"sig", "pref_hash", "ts"}} de la última descarga de cada preferencia."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_contact_state(path: str, state: dict) -> None:
+    try:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def contacts_needing_refresh(ids, base_by_id, state, prev_pref_by_id, ttl_days):
+    """
+    IDs cuya preferencia hay que volver a pedir: sin estado previo, con la
+    firma del listado cambiada, con el pref_text guardado distinto del último
+    descargado (vacío o editado a mano) o con el TTL vencido.
+    """
+    ahora = time.time()
+    ttl_s = ttl_days * 86400
+    out = []
+    for cid in ids:
+        st = state.get(cid)
+        if (
+            not st
+            or st.get("sig") != contact_signature(base_by_id.get(cid, {}))
+            or st.get("pref_hash") != _hash_text(prev_pref_by_id.get(cid))
+            or ahora - float(st.get("ts") or 0) > ttl_s
+        ):
+            out.append(cid)
+    return out
+
+
+def visit_contact_detail_http(
+    session: requests.Session, person_id: str, timeout: float = 12.0
+):
+    """
+    Equivalente HTTP de visit_contact_detail: carga la ficha con la sesión.
+    Devuelve (ok, pref_text); la preferencia de la misma página se aprovecha
+    para no volver a pedirla en el paso de preferencias.
+    """
+    url = f"https://admin.egorealestate.com/egocore/person/{person_id}"
+    try:
+        r = session.get(url, timeout=timeout, allow_redirects=True)
+        if _looks_like_login(r) and refresh_http_session(session):
+            r = session.get(url, timeout=timeout, allow_redirects=True)
+        if r.status_code == 200 and not _looks_like_login(r):
+            return True, _extract_preference_text_from_html(r.text)
+    except Exception:
+        logger.debug("HTTP: error visitando contacto %s", person_id, exc_info=True)
+    return False, ""
+
+
 def main_contacts():
     ids_today_file = os.path.join(BASE_DIR, "contacts_ids_today.csv")
     ids_yesterday_file = os.path.join(BASE_DIR, "contacts_ids_yesterday.csv")
@@ -2112,6 +2452,7 @@ def main_contacts():
     data_today_file = os.path.join(BASE_DIR, "contacts_today.csv")
     data_new_file = os.path.join(BASE_DIR, "contacts_new.csv")
     checkpoint_today_file = os.path.join(BASE_DIR, "contacts_today_checkpoint.csv")
+    state_file = os.path.join(BASE_DIR, "contacts_state.json")
     os.makedirs(BASE_DIR, exist_ok=True)
 
     # Respaldo de IDs para poder comparar delta
@@ -2150,6 +2491,20 @@ def main_contacts():
             missing_pref_ids = set()
     except Exception:
         missing_pref_ids = set()
+    # pref_text ya guardado por id (modo 'all': se conserva si no se repide)
+    try:
+        if (not df_today_prev.empty) and ("pref_text" in df_today_prev.columns):
+            prev_pref_by_id = dict(
+                zip(
+                    df_today_prev["id"].astype(str),
+                    df_today_prev["pref_text"].fillna("").astype(str),
+                )
+            )
+        else:
+            prev_pref_by_id = {}
+    except Exception:
+        prev_pref_by_id = {}
+    contact_state = load_contact_state(state_file)
 
     # Preparar salidas incrementales (append) con las columnas requeridas
     OUTPUT_COLS = [
@@ -2184,12 +2539,50 @@ def main_contacts():
         EGO_FAST,
         EGO_VISIT_AFTER_LIST,
     )
-    browser = build_browser(headless=EGO_HEADLESS)
+    # Concurrencia para velocidad
+    if _workers_env and _workers_env > 0:
+        max_workers = max(1, min(64, _workers_env))
+    elif EGO_FAST:
+        cpu = os.cpu_count() or 4
+        max_workers = min(48, max(8, cpu * 2))
+    else:
+        max_workers = min(16, max(4, os.cpu_count() or 4))
+    # Un pool de conexiones por hilo: sin él, los hilos que no caben en
+    # las 10 conexiones por defecto repiten el handshake TLS en cada petición
+    pool_size = max(max_workers, EGO_LIST_WORKERS, EGO_VISIT_WORKERS)
+
+    # El navegador solo se arranca si hace falta (login o fallbacks Selenium)
+    browser = None
+    sess = None
+
+    def _browser():
+        nonlocal browser
+        if browser is None:
+            browser = build_logged_browser(sess)
+        return browser
+
     try:
-        ego_login(browser)
-        goto_contacts(browser)
-        # Selecciona tipos: Cliente Potencial (1), Cliente (6), Informador (1103)
-        apply_entity_type_filters(browser, values=(1, 6, 1103))
+        # Sesión: 1) la guardada de otra ejecución, 2) login HTTP, 3) navegador
+        contacts_html = ""
+        guardada = SESSION_STORE.load()
+        if guardada:
+            sess = make_http_session(
+                guardada["cookies"], guardada.get("user_agent"), pool_size
+            )
+            contacts_html = probe_session(sess)
+            if contacts_html:
+                logger.info("Sesión: reutilizada la sesión guardada, sin login")
+        if not contacts_html:
+            sess = make_http_session(pool_size=pool_size)
+            if login_http(sess):
+                contacts_html = probe_session(sess)
+                logger.info("Sesión: login por HTTP, sin navegador")
+        if not contacts_html:
+            sess = None
+            _browser()
+            sess = make_http_session_from_browser(browser, pool_size=pool_size)
+            contacts_html = probe_session(sess)
+        save_session(sess)
 
         # PASO 1: Recorrer todas las páginas y recolectar IDs + datos básicos
         all_ids = set()
@@ -2198,6 +2591,31 @@ def main_contacts():
         pages_guard = 2000  # permite más páginas si fuera necesario
 
         total_rows = 0
+        listado_http = None
+        filtros = entitysearch_filters_from_html(contacts_html) if EGO_HTTP_LIST else None
+        if filtros is not None:
+            try:
+                listado_http = list_contacts_http(
+                    sess, entitysearch_url_from_html(contacts_html), *filtros
+                )
+            except Exception:
+                logger.exception("HTTP listado: error; se usa la paginación Selenium")
+                listado_http = None
+        if listado_http is not None:
+            rows_http, page = listado_http
+            total_rows = len(rows_http)
+            for r in rows_http:
+                cid = str(r.get("contact_id") or "").strip()
+                if not cid:
+                    continue
+                all_ids.add(cid)
+                r["fecha_inclusion"] = datetime.today().strftime("%Y-%m-%d")
+                base_by_id[cid] = r
+            pages_guard = 0
+        else:
+            _browser()
+            # Selecciona tipos: Cliente Potencial (1), Cliente (6), Informador (1103)
+            apply_entity_type_filters(browser, values=EGO_ENTITY_TYPES)
         while pages_guard > 0:
             try:
                 rows, curr, vis = collect_contacts_on_page(browser)
@@ -2242,7 +2660,27 @@ def main_contacts():
         logger.info("IDs: hoy=%s nuevos=%s", len(all_ids), len(new_ids_only))
 
         # PASO 1.5 (opcional): Recorrer todas las fichas para asegurarse de visitarlas
-        if EGO_VISIT_AFTER_LIST and all_ids:
+        visited_pref = {}
+        if EGO_VISIT_AFTER_LIST and all_ids and EGO_VISIT_HTTP:
+            logger.info(
+                "Visitas HTTP: recorriendo %s fichas tras listado (workers=%s)",
+                len(all_ids),
+                EGO_VISIT_WORKERS,
+            )
+            ok_visits = 0
+            ids_visita = sorted(all_ids)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=EGO_VISIT_WORKERS) as ex:
+                resultados = ex.map(
+                    lambda c: visit_contact_detail_http(sess, c), ids_visita
+                )
+                for cid, (ok, pref) in zip(ids_visita, resultados):
+                    if ok:
+                        ok_visits += 1
+                    if pref:
+                        visited_pref[cid] = pref
+            logger.info("Visitas: realizadas %s de %s", ok_visits, len(all_ids))
+        elif EGO_VISIT_AFTER_LIST and all_ids:
+            _browser()
             logger.info("Visitas: recorriendo %s fichas tras listado", len(all_ids))
             ok_visits = 0
             for k, cid in enumerate(sorted(all_ids)):
@@ -2261,7 +2699,15 @@ def main_contacts():
 
         # PASO 2: Decidir conjunto de IDs objetivo según modo
         if EGO_UPDATE_MODE == "all":
-            target_ids = sorted(all_ids)
+            target_ids = sorted(
+                contacts_needing_refresh(
+                    all_ids, base_by_id, contact_state, prev_pref_by_id, EGO_PREF_TTL_DAYS
+                )
+            )
+            logger.info(
+                "Preferencias: %s contactos sin cambios en firma ni TTL vencido",
+                len(all_ids) - len(target_ids),
+            )
         elif EGO_UPDATE_MODE == "missing":
             target_ids = sorted(
                 [cid for cid in all_ids if (cid not in existing_ids) or (cid in missing_pref_ids)]
@@ -2275,24 +2721,44 @@ def main_contacts():
             len(target_ids),
             len(all_ids),
         )
-        sess = make_http_session_from_browser(browser)
         pref_text_by_id = {}
 
-        # Concurrencia para velocidad
-        if _workers_env and _workers_env > 0:
-            max_workers = max(1, min(64, _workers_env))
-        elif EGO_FAST:
-            cpu = os.cpu_count() or 4
-            max_workers = min(48, max(8, cpu * 2))
+        # Diario de preferencias: cada contacto terminado se añade al momento;
+        # si una ejecución de hoy cayó a medias, no se vuelve a pedir
+        journal = ParseJournal.for_today(BASE_DIR, prefix="ego_prefs")
+        if PARSE_RESUME:
+            previos = journal.load()
         else:
-            max_workers = min(16, max(4, os.cpu_count() or 4))
+            journal.reset()
+            previos = {}
+        for cid in target_ids:
+            if previos.get(cid) is not None:
+                pref_text_by_id[cid] = previos[cid].get("pref_text") or ""
+        pendientes = [cid for cid in target_ids if cid not in pref_text_by_id]
+        if pref_text_by_id:
+            logger.info(
+                "Preferencias: %s recuperadas del diario; quedan %s",
+                len(pref_text_by_id),
+                len(pendientes),
+            )
+
+        # Preferencias ya obtenidas en la pasada de visitas HTTP
+        for cid in pendientes:
+            if visited_pref.get(cid):
+                pref_text_by_id[cid] = visited_pref[cid]
+                journal.append(cid, {"pref_text": visited_pref[cid]})
+        pendientes = [cid for cid in pendientes if cid not in pref_text_by_id]
 
         def _fetch_pref_http(cid: str):
-            return cid, fetch_contact_preferences_http(sess, cid)
+            pref = fetch_contact_preferences_http(sess, cid)
+            # Las vacías irán al fallback Selenium; se registran al resolverse
+            if pref:
+                journal.append(cid, {"pref_text": pref})
+            return cid, pref
 
         logger.info("Preferencias HTTP: max_workers=%s", max_workers)
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
-            future_map = {ex.submit(_fetch_pref_http, cid): cid for cid in target_ids}
+            future_map = {ex.submit(_fetch_pref_http, cid): cid for cid in pendientes}
             for i, fut in enumerate(concurrent.futures.as_completed(future_map)):
                 cid = future_map[fut]
                 try:
@@ -2324,36 +2790,44 @@ def main_contacts():
                     )
                 except Exception:
                     pass
-                if (i + 1) % 50 == 0:
+                if browser is not None and (i + 1) % 50 == 0:
                     clear_browser_state(
                         browser,
                         clear_cache=False if EGO_FAST else True,
                         clear_cookies=False,
                     )
 
-        # Fallback Selenium para las que quedaron vacías
-        missing_prefs = [cid for cid in target_ids if not pref_text_by_id.get(cid)]
+        # Fallback Selenium para las que quedaron vacías: pool de navegadores
+        # con la sesión compartida, limitado por la RAM disponible
+        missing_prefs = [cid for cid in pendientes if not pref_text_by_id.get(cid)]
         if missing_prefs:
+            n_browsers = max_workers_for_memory(
+                min(EGO_FALLBACK_WORKERS, len(missing_prefs)),
+                mb_per_worker=EGO_MB_PER_WORKER,
+            )
             logger.info(
-                "Preferencias Selenium (fallback): pendientes=%s", len(missing_prefs)
+                "Preferencias Selenium (fallback): pendientes=%s navegadores=%s",
+                len(missing_prefs),
+                n_browsers,
             )
-        for j, cid in enumerate(missing_prefs):
-            try:
-                pref_text_by_id[cid] = (
-                    fetch_contact_preferences_browser(browser, cid) or ""
+
+            def _pref_task(b, cid, first_run):
+                return fetch_contact_preferences_browser(b, cid)
+
+            def _clear_state(b):
+                clear_browser_state(
+                    b,
+                    clear_cache=False if EGO_FAST else True,
+                    clear_cookies=False,
                 )
+
+            def _on_pref(pos, cid, pref):
+                pref_text_by_id[cid] = pref or ""
+                # None = el navegador falló: sin registrar, se reintenta al reanudar
+                if pref is not None:
+                    journal.append(cid, {"pref_text": pref_text_by_id[cid]})
                 try:
-                    base = base_by_id.get(
-                        cid,
-                        {
-                            "contact_id": cid,
-                            "nombre": None,
-                            "telefono": None,
-                            "email": None,
-                            "creado_info": None,
-                            "fecha_inclusion": datetime.today().strftime("%Y-%m-%d"),
-                        },
-                    )
+                    base = base_by_id.get(cid, {})
                     print(
                         "[ROW]",
                         f"id={cid}",
@@ -2364,14 +2838,20 @@ def main_contacts():
                     )
                 except Exception:
                     pass
-            except Exception:
-                pass
-            if (j + 1) % 15 == 0:
-                clear_browser_state(
-                    browser,
-                    clear_cache=False if EGO_FAST else True,
-                    clear_cookies=False,
-                )
+
+            pool = BrowserWorkerPool(
+                # Cookies de la sesión HTTP en el momento de crear cada navegador
+                lambda: build_logged_browser(sess),
+                n_browsers,
+                recycle_every=EGO_FALLBACK_RECYCLE_EVERY,
+                clear_state_every=15,
+                max_retries=2,
+                clear_state=_clear_state,
+                reset_on=(WebDriverException,),
+                on_result=_on_pref,
+                on_quit=net_blocking.collect,
+            )
+            pool.map(_pref_task, missing_prefs)
 
         # Construir datasets finales (1 fila por contacto) con columnas requeridas
         def _build_contact_row(cid: str):
@@ -2394,7 +2874,9 @@ def main_contacts():
                 "fecha_inclusion": base.get("fecha_inclusion")
                 or datetime.today().strftime("%Y-%m-%d"),
                 "creado_info": base.get("creado_info"),
-                "pref_text": pref_text_by_id.get(str(cid), ""),
+                "pref_text": pref_text_by_id.get(
+                    str(cid), prev_pref_by_id.get(str(cid), "")
+                ),
             }
 
         def _wrap_spans(df: pd.DataFrame) -> pd.DataFrame:
@@ -2407,33 +2889,17 @@ def main_contacts():
         rows_new = [_build_contact_row(cid) for cid in sorted(new_ids_only)]
 
         def _upsert_today(existing_df: pd.DataFrame, new_rows: list) -> pd.DataFrame:
-            try:
-                cols = OUTPUT_COLS
-                df_exist = existing_df.copy() if existing_df is not None else pd.DataFrame(columns=cols)
-                if df_exist.empty:
-                    return pd.DataFrame(new_rows, columns=cols)
-                if "id" not in df_exist.columns and "contact_id" in df_exist.columns:
-                    df_exist = df_exist.rename(columns={"contact_id": "id"})
-                for c in cols:
-                    if c not in df_exist.columns:
-                        df_exist[c] = None
-                df_exist = df_exist[cols]
-                df_exist = df_exist.set_index("id", drop=False)
-                for r in new_rows:
-                    rid = str(r.get("id"))
-                    if not rid:
-                        continue
-                    row = {k: r.get(k) for k in cols}
-                    df_exist.loc[rid] = row
-                return df_exist.reset_index(drop=True)
-            except Exception:
-                try:
-                    return (
-                        pd.concat([existing_df, pd.DataFrame(new_rows)], ignore_index=True)
-                        .drop_duplicates(subset=["id"], keep="last")
-                    )
-                except Exception:
-                    return pd.DataFrame(new_rows, columns=OUTPUT_COLS)
+            # Upsert por id en bloque: la fila nueva sustituye a la existente
+            df_exist = existing_df if existing_df is not None else pd.DataFrame()
+            if "id" not in df_exist.columns and "contact_id" in df_exist.columns:
+                df_exist = df_exist.rename(columns={"contact_id": "id"})
+            return keyed_upsert(
+                df_exist,
+                pd.DataFrame(new_rows, columns=OUTPUT_COLS),
+                key="id",
+                on_conflict="replace",
+                columns=OUTPUT_COLS,
+            )
 
         if rows_new:
             df_new = pd.DataFrame(rows_new)
@@ -2453,6 +2919,33 @@ def main_contacts():
             atomic_write_csv(data_today_file, df_upd)
             atomic_write_csv(checkpoint_today_file, df_upd)
 
+        # El diario ya está compactado en contacts_today.csv
+        journal.discard()
+
+        # Estado para la detección de cambios: solo se marcan como al día las
+        # preferencias obtenidas (las vacías se reintentan la próxima vez)
+        ahora = time.time()
+        sin_cambios = 0
+        for cid, pref in pref_text_by_id.items():
+            if not pref:
+                continue
+            h = _hash_text(pref)
+            if (contact_state.get(cid) or {}).get("pref_hash") == h:
+                sin_cambios += 1
+            contact_state[cid] = {
+                "sig": contact_signature(base_by_id.get(cid, {})),
+                "pref_hash": h,
+                "ts": ahora,
+            }
+        if all_ids:
+            contact_state = {k: v for k, v in contact_state.items() if k in all_ids}
+        save_contact_state(state_file, contact_state)
+        logger.info(
+            "Preferencias: %s descargadas, %s idénticas a la anterior",
+            sum(1 for v in pref_text_by_id.values() if v),
+            sin_cambios,
+        )
+
         # Mensaje final de resumen
         try:
             n_new = len(safe_read_df_csv(data_new_file))
@@ -2468,10 +2961,18 @@ def main_contacts():
         )
 
     finally:
-        try:
-            browser.quit()
-        except Exception:
-            pass
+        if sess is not None:
+            # Cookies renovadas durante la ejecución para la próxima
+            save_session(sess)
+        if browser is not None:
+            net_blocking.collect(browser)
+        net_blocking.run_stats.report("ego")
+        HTTP_STATS.report("ego")
+        if browser is not None:
+            try:
+                browser.quit()
+            except Exception:
+                pass
 
 
 if __name__ == "__main__":
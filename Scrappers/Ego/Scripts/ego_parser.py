@@ -0,0 +1,66 @@
+"""
+Parseo puro de páginas de contacto de Ego: HTML -> fragmento, sin navegador
+ni red. Lo usan ego.py y benchmarks/bench_ego_prefs.py.
+"""
+
+import re
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+# Etiqueta de apertura cuyo atributo class contiene contactCardPreference
+# (como clase completa, igual que el selector CSS .contactCardPreference)
+_PREF_OPEN = re.compile(
+    r"<([a-zA-Z][\w-]*)\b[^>]*?\bclass\s*=\s*(?:\"[^\"]*|'[^']*|)"
+    r"(?<![\w-])contactCardPreference(?![\w-])[^>]*>",
+    re.I,
+)
+_VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "wbr", "source", "area", "col"}
+
+
+def _slice_element(html: str, start: int, tag: str, open_end: int) -> Optional[str]:
+    """Recorta el elemento `tag` que abre en `start` hasta su cierre (anidamiento incluido)."""
+    if tag.lower() in _VOID_TAGS or html[open_end - 2 : open_end] == "/>":
+        return html[start:open_end]
+    tags = re.compile(r"<(/?)%s\b[^>]*>" % re.escape(tag), re.I)
+    depth = 1
+    for m in tags.finditer(html, open_end):
+        if m.group(1):
+            depth -= 1
+            if depth == 0:
+                return html[start : m.end()]
+        elif not m.group(0).endswith("/>"):
+            depth += 1
+    return None
+
+
+def extract_preference_html_full(html: str) -> str:
+    """Camino completo: árbol lxml de toda la página y select_one."""
+    try:
+        pref = BeautifulSoup(html or "", "lxml").select_one(".contactCardPreference")
+        if pref:
+            return str(pref)
+    except Exception:
+        pass
+    return ""
+
+
+def extract_preference_html(html: str) -> str:
+    """
+    HTML del bloque .contactCardPreference (outer HTML) o "".
+
+    Localiza el bloque con una búsqueda de texto y solo construye el árbol
+    del fragmento, así que el coste ya no depende del tamaño de la página.
+    El fragmento se serializa con BeautifulSoup para devolver exactamente lo
+    mismo que extract_preference_html_full; si el recorte no es fiable (HTML
+    mal cerrado) se usa el camino completo.
+    """
+    if not html or "contactCardPreference" not in html:
+        return ""
+    m = _PREF_OPEN.search(html)
+    if m is None:
+        return extract_preference_html_full(html)
+    fragment = _slice_element(html, m.start(), m.group(1), m.end())
+    if fragment is None:
+        return extract_preference_html_full(html)
+    return extract_preference_html_full(fragment)
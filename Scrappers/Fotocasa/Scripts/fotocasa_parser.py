@@ -0,0 +1,514 @@
+"""
+Parseo puro de fichas de Fotocasa: HTML -> dict de la fila, sin navegador,
+red ni pandas. Lo usan fotocasa_scrapper.py y los benchmarks de benchmarks/.
+"""
+
+import json
+import re
+from datetime import datetime
+from urllib.parse import urlparse, urlunparse
+
+from bs4 import BeautifulSoup as bs
+
+
+def canonicalize_fotocasa_url(url: str) -> str:
+    """
+    Devuelve la URL canónica sin query ni fragment.
+    Normaliza el esquema/host a https://www.fotocasa.es
+    """
+    try:
+        p = urlparse(url)
+        if not p.netloc:
+            # convertir ruta relativa a absoluta
+            url = "https://www.fotocasa.es" + (
+                url if url.startswith("/") else f"/{url}"
+            )
+            p = urlparse(url)
+        clean = p._replace(
+            scheme="https", netloc="www.fotocasa.es", params="", query="", fragment=""
+        )
+        return urlunparse(clean).rstrip("/")
+    except Exception:
+        return url.split("?")[0].split("#")[0].rstrip("/")
+
+
+# -------- Estado JSON embebido en la ficha --------
+_STATE_PATTERNS = [
+    # window.__INITIAL_PROPS__ = JSON.parse("...escapado...")
+    re.compile(
+        r'window\.__INITIAL_PROPS__\s*=\s*JSON\.parse\(\s*"((?:[^"\\]|\\.)*)"\s*\)',
+        re.S,
+    ),
+    # window.__INITIAL_PROPS__ = {...};
+    re.compile(r"window\.__INITIAL_PROPS__\s*=\s*(\{.*?\})\s*;?\s*</script>", re.S),
+    # Next.js
+    re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S),
+]
+
+
+def extract_state_blob(html):
+    """Devuelve el estado JSON embebido de la ficha (dict) o None si no está."""
+    if not html:
+        return None
+    for i, pat in enumerate(_STATE_PATTERNS):
+        m = pat.search(html)
+        if not m:
+            continue
+        raw = m.group(1)
+        try:
+            if i == 0:
+                raw = json.loads(f'"{raw}"')  # des-escapar el literal JS
+            data = json.loads(raw)
+        except Exception:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def _find_real_estate(state, max_nodes=20000):
+    """
+    Busca (en anchura) el dict del inmueble dentro del estado: el primero con
+    precio y con características o dirección.
+    """
+    cola = [state]
+    vistos = 0
+    while cola and vistos < max_nodes:
+        nodo = cola.pop(0)
+        vistos += 1
+        if isinstance(nodo, dict):
+            keys = set(nodo)
+            if keys & {"price", "rawPrice"} and keys & {
+                "features",
+                "address",
+                "location",
+            }:
+                return nodo
+            cola.extend(v for v in nodo.values() if isinstance(v, (dict, list)))
+        elif isinstance(nodo, list):
+            cola.extend(v for v in nodo if isinstance(v, (dict, list)))
+    return None
+
+
+def _pick(d, *keys):
+    """Primer valor no vacío de `keys` en el dict `d`."""
+    if not isinstance(d, dict):
+        return None
+    for k in keys:
+        v = d.get(k)
+        if v not in (None, "", [], {}):
+            return v
+    return None
+
+
+def _features_dict(features):
+    """Normaliza features ([{key, value}] o dict) a un dict plano en minúsculas."""
+    out = {}
+    if isinstance(features, dict):
+        for k, v in features.items():
+            out[str(k).lower()] = v
+    elif isinstance(features, list):
+        for f in features:
+            if isinstance(f, dict):
+                k = _pick(f, "key", "name", "type")
+                if k is not None:
+                    out[str(k).lower()] = _pick(f, "value", "maxValue", "minValue")
+    return out
+
+
+def datos_estado(state):
+    """
+    Extrae del estado embebido los mismos campos que el parseo del DOM.
+    Solo incluye las claves que encuentra; el resto se completa con el DOM.
+    """
+    inm = _find_real_estate(state)
+    if not inm:
+        return {}
+    out = {}
+    feats = _features_dict(inm.get("features"))
+    adr = _pick(inm, "address", "location") or {}
+    if isinstance(adr, dict):
+        municipio = _pick(adr, "municipality", "locality", "city", "addressLocality")
+        barrio = _pick(adr, "neighbourhood", "district", "zone")
+        if municipio:
+            out["municipio"] = str(municipio)
+        loc = ", ".join(str(p) for p in (barrio, municipio) if p)
+        if loc:
+            out["localizacion"] = loc
+        if barrio:
+            out["zona"] = str(barrio)
+        calle = _pick(adr, "ubication", "street", "streetAddress")
+        if calle and not out.get("zona"):
+            out["direccion"] = str(calle)
+
+    for campo, keys in (
+        ("titulo", ("title", "propertyTitle", "name")),
+        ("descripcion", ("description",)),
+        ("anunciante", ("clientAlias", "advertiserName", "agencyName")),
+    ):
+        v = _pick(inm, *keys)
+        if isinstance(v, str) and v.strip():
+            out[campo] = v.strip()
+    if "anunciante" not in out:
+        adv = _pick(inm, "advertiser", "client", "agency")
+        nombre = _pick(adv, "name", "alias", "clientAlias") if isinstance(adv, dict) else None
+        if nombre:
+            out["anunciante"] = str(nombre)
+
+    for campo, v in (
+        ("precio", _pick(inm, "rawPrice", "price")),
+        ("precio_bajada", _pick(inm, "reducedPrice", "priceDrop", "priceReduction")),
+        ("habitaciones", _pick(feats, "rooms", "bedrooms") or _pick(inm, "rooms")),
+        ("baños", _pick(feats, "bathrooms") or _pick(inm, "bathrooms")),
+        ("metros_cuadrados", _pick(feats, "surface", "size") or _pick(inm, "surface")),
+    ):
+        if isinstance(v, dict):
+            v = _pick(v, "value", "amount", "raw")
+        if v is not None:
+            out[campo] = v
+
+    energia = _pick(inm, "energyCertificate", "energyEfficiency") or {}
+    if isinstance(energia, dict):
+        consumo = _pick(energia, "consumption", "energyConsumption", "consumptionRating")
+        emisiones = _pick(energia, "emissions", "environmentImpact", "emissionsRating")
+        if consumo:
+            out["consumo_energia"] = str(consumo)
+        if emisiones:
+            out["emisiones_energia"] = str(emisiones)
+
+    media = _pick(inm, "multimedia", "multimedias", "images", "photos")
+    if isinstance(media, list) and media:
+        out["fotos_total"] = len(media)
+    return out
+
+
+def _zona_desde_direccion(full_zone):
+    """Zona a partir de la dirección completa: la parte a la izquierda de 'Alcoy'."""
+    zona = None
+    partes = [p.strip() for p in full_zone.split(",")]
+    # Buscar el índice de la parte que contiene 'Alcoy / Alcoi'
+    for i, p in enumerate(partes):
+        if "Alcoy" in p:
+            if i > 0:
+                zona = partes[i - 1]  # la parte inmediatamente a la izquierda
+            break
+    if not zona and partes:
+        zona = partes[0]  # fallback en caso de no encontrar "Alcoy"
+    return zona
+
+
+# -------- Parser de ficha de Fotocasa --------
+def parse_ficha(html, url):
+    """
+    Parsea el HTML de una ficha de Fotocasa (venga del navegador, de una
+    petición HTTP o de la caché). `url` debe ser la URL canónica. Devuelve el
+    dict de la fila; vacío si el HTML no se puede parsear.
+    """
+
+    def _to_int(txt):
+        try:
+            if txt is None:
+                return None
+            s = str(txt)
+            s = s.replace("\xa0", " ").replace(".", "").replace(",", "")
+            s = re.sub(r"[^\d\-]", "", s)
+            if s.strip() == "":
+                return None
+            return int(s)
+        except Exception:
+            return None
+
+    def _num(v):
+        # Valores del estado JSON / JSON-LD: si ya son numéricos se redondean
+        # (150000.0 -> 150000, 85.5 -> 86); _to_int es solo para texto del DOM
+        if isinstance(v, bool):
+            return None
+        if isinstance(v, (int, float)):
+            return int(round(v)) if v == v and abs(v) != float("inf") else None
+        return _to_int(v)
+
+    def _int_from_text(el):
+        if not el:
+            return None
+        return _to_int(el.get_text(" ", strip=True))
+
+    def _text(el):
+        return el.get_text(" ", strip=True) if el else ""
+
+    try:
+        soup = bs(html, "lxml")
+
+        # Inicialización de campos
+        titulo = localizacion = municipio = zona = ""
+        precio = precio_bajada = m2 = habs = banos = None
+        descripcion = consumo_energia = emisiones_energia = ""
+        breadcrumb = []
+        fotos_total = None
+        ref_catastral = ""
+        edificabilidad = parcela_m2 = parcela_min_m2 = fachada_min_m = altura_max_m = (
+            None
+        )
+        sector_urbanistico = ""
+        link_inmueble_siguiente = ""
+        anunciante = ""
+
+        # Estado JSON embebido (fuente principal); el DOM completa lo que falte
+        estado = datos_estado(extract_state_blob(html) or {})
+        titulo = estado.get("titulo", titulo)
+        localizacion = estado.get("localizacion", localizacion)
+        municipio = estado.get("municipio", municipio)
+        precio = _num(estado.get("precio"))
+        precio_bajada = _num(estado.get("precio_bajada"))
+        m2 = estado.get("metros_cuadrados")
+        habs = estado.get("habitaciones")
+        banos = estado.get("baños")
+        descripcion = estado.get("descripcion", descripcion)
+        consumo_energia = estado.get("consumo_energia", consumo_energia)
+        emisiones_energia = estado.get("emisiones_energia", emisiones_energia)
+        fotos_total = estado.get("fotos_total")
+        anunciante = estado.get("anunciante", anunciante)
+
+        # JSON-LD
+        try:
+            for s in soup.find_all("script", {"type": "application/ld+json"}):
+                try:
+                    data = json.loads(s.string or "{}")
+                except Exception:
+                    continue
+                blocks = data if isinstance(data, list) else [data]
+                for b in list(blocks):
+                    if isinstance(b, dict) and "@graph" in b:
+                        blocks.extend(
+                            [g for g in b.get("@graph") if isinstance(g, dict)]
+                        )
+                for b in blocks:
+                    if not isinstance(b, dict):
+                        continue
+                    typ = (b.get("@type") or "").lower()
+                    if typ in (
+                        "offer",
+                        "product",
+                        "residence",
+                        "apartment",
+                        "house",
+                        "singlefamilyresidence",
+                        "realestatelisting",
+                        "place",
+                    ):
+                        titulo = titulo or b.get("name", "") or b.get("headline", "")
+                        adr = b.get("address") or {}
+                        if isinstance(adr, dict):
+                            loc_parts = [
+                                adr.get("addressLocality") or "",
+                                adr.get("addressRegion") or "",
+                            ]
+                            loc = ", ".join([p for p in loc_parts if p]).strip(", ")
+                            if loc:
+                                localizacion = localizacion or loc
+                                municipio = municipio or (
+                                    adr.get("addressLocality") or ""
+                                )
+                        off = b.get("offers") or {}
+                        if isinstance(off, dict):
+                            precio = precio or _num(off.get("price"))
+                        size = b.get("floorSize") or {}
+                        if isinstance(size, dict):
+                            m2 = m2 or _num(size.get("value"))
+                        if habs is None:
+                            habs = _num(
+                                b.get("numberOfRooms")
+                                or b.get("numberOfRoomsTotal")
+                                or None
+                            )
+                        if banos is None:
+                            banos = _num(
+                                b.get("numberOfBathroomsTotal")
+                                or b.get("numberOfBathrooms")
+                                or None
+                            )
+        except Exception:
+            pass
+
+        # HTML
+        if not titulo:
+            h1 = soup.find("h1", class_=re.compile("re-DetailHeader-propertyTitle"))
+            titulo = _text(h1)
+
+        if not municipio:
+            muni = soup.find(
+                "p", class_=re.compile("re-DetailHeader-municipalityTitle")
+            )
+            municipio = _text(muni)
+        if not localizacion:
+            loc_el = soup.find(attrs={"data-testid": "re-DetailHeader-address"})
+            localizacion = _text(loc_el) or municipio
+
+        if precio is None:
+            # 1) Exacto al <span> del precio
+            price_el = soup.select_one("span.re-DetailHeader-price")
+
+            # 2) Fallbacks por si cambian la estructura
+            if not price_el:
+                price_el = soup.find("span", class_="re-DetailHeader-price")
+            if not price_el:
+                # Evita capturar el *Container*
+                price_el = soup.find(
+                    lambda tag: tag.name == "span"
+                    and tag.has_attr("class")
+                    and "re-DetailHeader-price" in tag.get("class", [])
+                )
+
+            precio = _int_from_text(price_el)
+
+        reduced = soup.select_one("div.re-DetailHeader-reducedPrice")
+        if reduced and precio_bajada is None:
+            precio_bajada = _to_int(_text(reduced))  # "Ha bajado 9.100€" -> 9100
+        if precio is None or precio_bajada is None:
+            box = soup.select_one("div.re-DetailHeader-priceContainer")
+            if box:
+                nums = re.findall(r"\d[\d\.\,]*", box.get_text(" ", strip=True))
+                if nums and precio is None:
+                    posible_precio = _to_int(nums[0])
+                    if posible_precio:
+                        precio = posible_precio
+                if len(nums) >= 2 and precio_bajada is None:
+                    posible_bajada = _to_int(nums[1])
+                    if posible_bajada:
+                        precio_bajada = posible_bajada
+        rooms_li = soup.find("li", class_=re.compile("re-DetailHeader-rooms"))
+        baths_li = soup.find("li", class_=re.compile("re-DetailHeader-bathrooms"))
+        surf_li = soup.find("li", class_=re.compile("re-DetailHeader-surface"))
+        if habs is None:
+            habs = _int_from_text(rooms_li)
+        if banos is None:
+            banos = _int_from_text(baths_li)
+        if m2 is None:
+            m2 = _int_from_text(surf_li)
+
+        feats = soup.find(attrs={"data-testid": "featuresList"}) or soup.find(
+            class_=re.compile("re-DetailFeaturesList")
+        )
+        if feats:
+            for f in feats.find_all(class_=re.compile("re-DetailFeaturesList-feature")):
+                label = _text(f.find(class_=re.compile("featureLabel"))).lower()
+                value = _text(f.find(class_=re.compile("featureValue")))
+                if "consumo energía" in label:
+                    consumo_energia = value or consumo_energia
+                if "emisiones" in label:
+                    emisiones_energia = value or emisiones_energia
+
+        desc_p = None if descripcion else soup.find("p", class_=re.compile("re-DetailDescription"))
+        if desc_p:
+            for br in desc_p.find_all("br"):
+                br.replace_with("\n")
+            descripcion = _text(desc_p)
+
+        if descripcion:
+            m = re.search(r"Ref\.?\s*catastral:\s*([A-Z0-9]+)", descripcion, flags=re.I)
+            if m:
+                ref_catastral = m.group(1).strip()
+            m = re.search(r"Edificabilidad:\s*([\d\.]+)\s*m2?", descripcion, flags=re.I)
+            if m:
+                edificabilidad = _to_int(m.group(1))
+            m = re.search(
+                r"Parcela\s+urbana\s+residencial\s+de\s*([\d\.,]+)\s*m2",
+                descripcion,
+                flags=re.I,
+            )
+            if m:
+                parcela_m2 = _to_int(m.group(1))
+            m = re.search(r"Parcela mínima\s*([\d\.,]+)\s*m2", descripcion, flags=re.I)
+            if m:
+                parcela_min_m2 = _to_int(m.group(1))
+            m = re.search(r"Fachada mínima\s*([\d\.,]+)\s*m", descripcion, flags=re.I)
+            if m:
+                fachada_min_m = _to_int(m.group(1))
+            m = re.search(r"Altura\s*Máx\.?\s*([\d\.,]+)\s*m", descripcion, flags=re.I)
+            if m:
+                altura_max_m = _to_int(m.group(1))
+            m = re.search(r"dentro del\s+(Sector\s*[^\.\n]+)", descripcion, flags=re.I)
+            if m:
+                sector_urbanistico = m.group(1).strip()
+
+        bc = soup.find("nav", attrs={"aria-label": "Ruta de navegación"})
+        if bc:
+            breadcrumb = [
+                a.get_text(strip=True) for a in bc.select(".re-Breadcrumb-link")
+            ] + [
+                (
+                    bc.select_one(".re-Breadcrumb-text").get_text(strip=True)
+                    if bc.select_one(".re-Breadcrumb-text")
+                    else ""
+                )
+            ]
+            breadcrumb = [b for b in breadcrumb if b]
+
+        if fotos_total is None:
+            extra_fotos = 0
+            extra_badge = soup.find(class_=re.compile("re-DetailMosaicPhoto-moreText"))
+            if extra_badge:
+                extra_fotos = _to_int(extra_badge.text)
+            visibles = soup.select(".re-DetailMosaicPhotoWrapper img")
+            fotos_total = len(visibles) or None
+            if fotos_total is not None and extra_fotos:
+                fotos_total += extra_fotos
+
+        next_a = soup.find("a", class_=re.compile("re-DetailPagination-action--next"))
+        link_inmueble_siguiente = (
+            canonicalize_fotocasa_url(next_a.get("href"))
+            if next_a and next_a.get("href")
+            else ""
+        )
+
+        if not anunciante:
+            try:
+                client_block = soup.select_one(".re-FormContactDetailDown-client h4")
+                if client_block:
+                    anunciante = client_block.get_text(strip=True)
+            except Exception:
+                pass
+
+        # --- Zona ---
+        zona = estado.get("zona")
+        if not zona:
+            zone_el = soup.select_one("h2.re-DetailMap-address")
+            if zone_el:
+                zona = _zona_desde_direccion(zone_el.get_text(" ", strip=True))
+            elif estado.get("direccion"):
+                zona = _zona_desde_direccion(estado["direccion"])
+        habs = _num(habs)
+        banos = _num(banos)
+        m2 = _num(m2)
+
+        casas = {
+            "id_inmueble": url,
+            "link_inmueble": url,
+            "link_inmueble_siguiente": link_inmueble_siguiente or "",
+            "titulo": titulo,
+            "localizacion": localizacion,
+            "municipio": municipio,
+            "precio": precio,
+            "precio_bajada": precio_bajada,
+            "metros_cuadrados": m2,
+            "habitaciones": habs,
+            "baños": banos,
+            "consumo_energia": consumo_energia,
+            "emisiones_energia": emisiones_energia,
+            "descripcion": descripcion,
+            "breadcrumb": " > ".join(breadcrumb) if breadcrumb else "",
+            "fotos_total": fotos_total,
+            "ref_catastral": ref_catastral,
+            "edificabilidad_m2techo": edificabilidad,
+            "parcela_m2": parcela_m2,
+            "parcela_min_m2": parcela_min_m2,
+            "fachada_min_m": fachada_min_m,
+            "altura_max_m": altura_max_m,
+            "sector_urbanistico": sector_urbanistico,
+            "anunciante": anunciante,
+            "zona": zona,
+            "fecha_inclusion": datetime.today().strftime("%Y-%m-%d"),
+        }
+        return casas
+
+    except Exception:
+        return {}
@@ -1,10 +1,9 @@
 import os
+import sys
 import csv
-import time
 import shutil
 import pandas as pd
 from bs4 import BeautifulSoup as bs
-import time
 from bs4 import BeautifulSoup as bs
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -14,21 +13,40 @@ from selenium.common.exceptions import (
     JavascriptException,
     TimeoutException,
 )
-import time
 from urllib.parse import urljoin
 from pathlib import Path
-from datetime import datetime
 
 
 # Selenium / undetected-chromedriver
 import undetected_chromedriver as uc
 from selenium.common.exceptions import WebDriverException
-from urllib.parse import urlparse, urlunparse
 
 
 # -------- Configuración --------
 busqueda = "alcoy-alcoi"
 SCRIPT_DIR = Path(__file__).resolve().parent
+# Raíz del repo (para importar utils/ al lanzar el script directamente)
+REPO_ROOT = SCRIPT_DIR.parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from fotocasa_parser import canonicalize_fotocasa_url, extract_state_blob, parse_ficha
+from utils import net_blocking
+from utils.browser_pool import BrowserWorkerPool, max_workers_for_memory
+from utils.journal import PARSE_RESUME, ParseJournal
+from utils.lazy_load import FOTOCASA_CARD_COUNT_JS, scroll_until_stable
+from utils.page_cache import PageCache
+from utils.rate_limit import AdaptivePacer, HostRateLimiter
+from utils.upsert import keyed_upsert, rebuild_today_from_cache
+from utils.http_session import (
+    fetch_html,
+    http_first_map,
+    looks_blocked,
+    looks_complete,
+    make_http_session_from_browser,
+    mount_pool,
+)
+
 PROJECT_ROOT = (
     SCRIPT_DIR.parent.parent
 )  # .../Scrappers/Idealista/Scripts -> sube dos niveles
@@ -39,6 +57,23 @@ max_wait = 12
 max_page = 999_999_999
 max_scrolls = 200
 
+# Navegadores en paralelo para el parseo de fichas (se recorta según la RAM libre)
+FOTOCASA_WORKERS = int(os.getenv("FOTOCASA_WORKERS") or "3")
+FOTOCASA_MB_PER_WORKER = int(os.getenv("FOTOCASA_MB_PER_WORKER") or "700")
+# Fichas por HTTP (cookies del navegador) antes de recurrir a Selenium
+FOTOCASA_HTTP = (os.getenv("FOTOCASA_HTTP") or "true").lower() in ("1", "true", "yes")
+# Pocos hilos y un intervalo mínimo por host compartido por todos: una ráfaga
+# de fichas es lo que hace que fotocasa.es bloquee la sesión
+FOTOCASA_HTTP_WORKERS = int(os.getenv("FOTOCASA_HTTP_WORKERS") or "2")
+FOTOCASA_HTTP_MIN_INTERVAL = float(os.getenv("FOTOCASA_HTTP_MIN_INTERVAL") or "1")
+FOTOCASA_HTTP_RETRIES = int(os.getenv("FOTOCASA_HTTP_RETRIES") or "2")
+# Ritmo adaptativo (AIMD) de las fichas por HTTP: frena ante bloqueo/captcha
+FOTOCASA_FICHA_MIN_DELAY = float(os.getenv("FOTOCASA_FICHA_MIN_DELAY") or "0.5")
+FICHA_PACER = AdaptivePacer(initial=2, min_delay=FOTOCASA_FICHA_MIN_DELAY, max_delay=60)
+# HTML de fichas en caché comprimida; con PAGE_CACHE_OFFLINE=true se reparsea
+# el día desde ella sin navegador ni red
+FICHA_CACHE = PageCache.for_portal(REPO_ROOT, "fotocasa")
+
 # -------- Nuevo: construcción y utilidades del navegador --------
 import undetected_chromedriver as uc
 from selenium.webdriver.chrome.service import Service as ChromeService
@@ -58,6 +93,7 @@ def build_browser():
     Crea un Chrome endurecido para scraping:
       - pageLoadStrategy 'eager' para cortar carga de recursos tardíos
       - Imágenes y fuentes desactivadas
+      - Anuncios, analítica, vídeo y mapas bloqueados por CDP (utils.net_blocking)
       - Memoria compartida y GPU desactivadas
       - Timeouts base configurados
     """
@@ -82,8 +118,10 @@ def build_browser():
         "profile.managed_default_content_settings.stylesheets": 1,
     }
     opts.add_experimental_option("prefs", prefs)
+    net_blocking.configure_options(opts)
 
     browser = uc.Chrome(options=opts)
+    net_blocking.apply_blocking(browser, "fotocasa")
     browser.set_page_load_timeout(25)
     browser.set_script_timeout(20)
     return browser
@@ -179,27 +217,6 @@ def backup_to_yesterday(ids_today_path, ids_yesterday_path):
         pass
 
 
-def canonicalize_fotocasa_url(url: str) -> str:
-    """
-    Devuelve la URL canónica sin query ni fragment.
-    Normaliza el esquema/host a https://www.fotocasa.es
-    """
-    try:
-        p = urlparse(url)
-        if not p.netloc:
-            # convertir ruta relativa a absoluta
-            url = "https://www.fotocasa.es" + (
-                url if url.startswith("/") else f"/{url}"
-            )
-            p = urlparse(url)
-        clean = p._replace(
-            scheme="https", netloc="www.fotocasa.es", params="", query="", fragment=""
-        )
-        return urlunparse(clean).rstrip("/")
-    except Exception:
-        return url.split("?")[0].split("#")[0].rstrip("/")
-
-
 # -------- Utilidades de ficheros (Datos) --------
 def safe_read_df_csv(ruta):
     if os.path.exists(ruta):
@@ -220,7 +237,6 @@ def safe_write_df_csv(ruta, df):
 
 
 # -------- Scraper de Fotocasa (IDs como URLs) --------
-import time
 import random
 from bs4 import BeautifulSoup as bs
 from selenium.common.exceptions import (
@@ -283,9 +299,6 @@ def scrape_fotocasa_ids(
     def _build_url(busq, t):
         return f"https://www.fotocasa.es/es/{_segmento(t)}/{busq}/todas-las-zonas/l"
 
-    def _sleep():
-        time.sleep(random.uniform(min_wait, max_wait))
-
     def _accept_cookies_if_any():
 
         for xpath in (
@@ -300,69 +313,6 @@ def scrape_fotocasa_ids(
             except Exception:
                 continue
 
-    def _vh():
-        try:
-            return int(browser.execute_script("return window.innerHeight || 0;") or 0)
-        except JavascriptException:
-            return 0
-
-    def _scroll_y():
-        try:
-            return int(
-                browser.execute_script(
-                    "return window.scrollY || window.pageYOffset || 0;"
-                )
-                or 0
-            )
-        except JavascriptException:
-            return 0
-
-    def _page_height():
-        try:
-            return int(
-                browser.execute_script("return document.body.scrollHeight || 0") or 0
-            )
-        except JavascriptException:
-            return 0
-
-    def _at_bottom(margin_px=64):
-        h = _page_height()
-        y = _scroll_y()
-        vh = _vh()
-        return (y + vh) >= max(0, h - margin_px)
-
-    def _micro_scroll():
-        try:
-            browser.execute_script(f"window.scrollBy(0, {int(step_px)});")
-        except JavascriptException:
-            pass
-
-    def _cards_count():
-        try:
-            js = """
-              const isRealCard = (el) => (
-                !el.closest('.re-RecommenderSearch') &&
-                !el.closest('[class*="recommender-slider"]') &&
-                !el.closest('.re-SearchResultAdjacents') &&
-                !el.closest('[data-testid="recommender"]')
-              );
-              const sels = [
-                'article.container.w-full',
-                '[data-testid="re-Card"]',
-                'article[id^="re-Card"]',
-                'article[data-testid*="Card"]',
-                'article'
-              ];
-              for (const s of sels) {
-                const nodes = [...document.querySelectorAll(s)].filter(isRealCard);
-                if (nodes.length > 0) return nodes.length;
-              }
-              return 0;
-            """
-            return int(browser.execute_script(js) or 0)
-        except JavascriptException:
-            return 0
-
     def _remove_non_listing_sections(soup) -> None:
         selectors = [
             "div.re-RecommenderSearch",
@@ -576,31 +526,16 @@ def scrape_fotocasa_ids(
             _accept_cookies_if_any()
             first_page = False
 
-        stable = 0
-        bottom_hits = 0
-        last_count = 0
-        last_height = 0
-        for _ in range(max_scrolls):
-            _micro_scroll()
-            _sleep()
-            cnt = _cards_count()
-            h = _page_height()
-            grew_cards = cnt > last_count
-            grew_height = h > last_height
-            stable = 0 if (grew_cards or grew_height) else (stable + 1)
-            last_count = max(last_count, cnt)
-            last_height = max(last_height, h)
-            if _at_bottom():
-                if stable >= stability_rounds:
-                    bottom_hits += 1
-                    try:
-                        browser.execute_script("window.scrollBy(0, -50);")
-                        _sleep()
-                        browser.execute_script("window.scrollBy(0, 50);")
-                    except JavascriptException:
-                        pass
-                if bottom_hits >= bottom_rounds and stable >= stability_rounds:
-                    break
+        # Scroll hasta el fondo y recuento de tarjetas en una sola llamada
+        scroll_until_stable(
+            browser,
+            count_js=FOTOCASA_CARD_COUNT_JS,
+            step_px=step_px,
+            pause_ms=int((min_wait + max_wait) / 2 * 1000),
+            stability_rounds=stability_rounds,
+            bottom_rounds=bottom_rounds,
+            max_steps=max_scrolls,
+        )
 
         html = browser.page_source
         for can in _collect_detail_links(html):
@@ -637,43 +572,55 @@ def merge_unique_ordered(list_a, list_b):
 
 
 # -------- Parser de ficha de Fotocasa --------
+# El parseo puro (HTML -> dict) está en fotocasa_parser.py
+def parse_ficha_html(html, url):
+    """
+    Parsea el HTML de una ficha con fotocasa_parser.parse_ficha.
+    Devuelve (df_row, dict_row); ambos vacíos si el HTML no se puede parsear.
+    """
+    row = parse_ficha(html, url)
+    if not row:
+        return pd.DataFrame(), {}
+    return pd.DataFrame([row]), row
+
+
+def parsear_desde_cache(url):
+    """(df_row, dict_row) de la ficha cacheada de `url` o None si no hay entrada vigente."""
+    html = FICHA_CACHE.get(url)
+    if html is None:
+        return None
+    df_i, row = parse_ficha_html(html, url)
+    return None if df_i.empty else (df_i, row)
+
+
+def _parse_y_cachear(html, url):
+    df_i, row = parse_ficha_html(html, url)
+    if not df_i.empty:
+        FICHA_CACHE.put(url, html)
+    return df_i, row
+
+
 def parsear_inmueble(id_inmueble_url, browser, first_run):
     """
     id_inmueble_url es la URL canónica a la ficha. Devuelve (df_row, dict_row)
     Implementa:
+      - En offline, solo la caché de HTML (online siempre se descarga: la
+        ficha puede haber cambiado de precio aunque la entrada siga vigente)
       - Carga con timeout y abortado
       - Cierre de modales
       - Espera corta de contenido clave
       - SCROLL a fondo antes de parsear para forzar lazy-load
+    El parseo del HTML está en parse_ficha_html.
     """
-    import re, json, time, random
+    import time, random
     import pandas as pd
-    from bs4 import BeautifulSoup as bs
     from selenium.common.exceptions import WebDriverException, TimeoutException
 
-    def _to_int(txt):
-        try:
-            if txt is None:
-                return None
-            s = str(txt)
-            s = s.replace("\xa0", " ").replace(".", "").replace(",", "")
-            s = re.sub(r"[^\d\-]", "", s)
-            if s.strip() == "":
-                return None
-            return int(s)
-        except Exception:
-            return None
-
-    def _int_from_text(el):
-        if not el:
-            return None
-        return _to_int(el.get_text(" ", strip=True))
-
-    def _text(el):
-        return el.get_text(" ", strip=True) if el else ""
-
     try:
         url = canonicalize_fotocasa_url(str(id_inmueble_url))
+        if FICHA_CACHE.offline:
+            cached = parsear_desde_cache(url)
+            return cached if cached is not None else (pd.DataFrame(), {})
         safe_get(browser, url, timeout=20)
 
         # Primer run: cookies
@@ -716,338 +663,26 @@ def parsear_inmueble(id_inmueble_url, browser, first_run):
         except TimeoutException:
             pass
 
-        # ---------- SCROLL A FONDO ANTES DE PARSEAR ----------
-        def _vh():
-            try:
-                return int(browser.execute_script("return window.innerHeight||0") or 0)
-            except Exception:
-                return 0
-
-        def _scroll_y():
-            try:
-                return int(browser.execute_script("return window.scrollY||0") or 0)
-            except Exception:
-                return 0
-
-        def _page_height():
-            try:
-                return int(
-                    browser.execute_script("return document.body.scrollHeight||0") or 0
-                )
-            except Exception:
-                return 0
-
-        def _at_bottom(margin_px=64):
-            h = _page_height()
-            y = _scroll_y()
-            vh = _vh()
-            return (y + vh) >= max(0, h - margin_px)
-
-        step_px = 200
-        stability_rounds = 3
-        bottom_rounds = 1
-        max_scrolls = 300  # límite duro de seguridad
-
-        stable = 0
-        bottom_hits = 0
-        last_height = 0
-
-        for _ in range(max_scrolls):
-            try:
-                browser.execute_script(f"window.scrollBy(0,{step_px});")
-            except Exception:
-                break
-            time.sleep(random.uniform(0.03, 0.06))  # micro-espera para lazy-load
-            h = _page_height()
-            if h > last_height:
-                stable = 0
-                last_height = h
-            else:
-                stable += 1
-
-            if _at_bottom():
-                if stable >= stability_rounds:
-                    bottom_hits += 1
-                    # pequeño 'shake' para disparar últimos observers
-                    try:
-                        browser.execute_script("window.scrollBy(0,-40);")
-                        time.sleep(0.03)
-                        browser.execute_script("window.scrollBy(0,40);")
-                    except Exception:
-                        pass
-                if bottom_hits >= bottom_rounds and stable >= stability_rounds:
-                    break
-        # (Opcional) subir un poco para que queden en viewport algunos bloques clave
-        try:
-            browser.execute_script("window.scrollBy(0,-200);")
-        except Exception:
-            pass
-        # -----------------------------------------------------
-
+        # Con el estado JSON embebido no hace falta forzar el lazy-load
         html = browser.page_source
-        soup = bs(html, "lxml")
-
-        # Inicialización de campos
-        titulo = localizacion = municipio = zona = ""
-        precio = precio_bajada = m2 = habs = banos = None
-        descripcion = consumo_energia = emisiones_energia = ""
-        breadcrumb = []
-        fotos_total = None
-        ref_catastral = ""
-        edificabilidad = parcela_m2 = parcela_min_m2 = fachada_min_m = altura_max_m = (
-            None
-        )
-        sector_urbanistico = ""
-        link_inmueble_siguiente = ""
-
-        # JSON-LD
-        try:
-            for s in soup.find_all("script", {"type": "application/ld+json"}):
-                try:
-                    data = json.loads(s.string or "{}")
-                except Exception:
-                    continue
-                blocks = data if isinstance(data, list) else [data]
-                for b in list(blocks):
-                    if isinstance(b, dict) and "@graph" in b:
-                        blocks.extend(
-                            [g for g in b.get("@graph") if isinstance(g, dict)]
-                        )
-                for b in blocks:
-                    if not isinstance(b, dict):
-                        continue
-                    typ = (b.get("@type") or "").lower()
-                    if typ in (
-                        "offer",
-                        "product",
-                        "residence",
-                        "apartment",
-                        "house",
-                        "singlefamilyresidence",
-                        "realestatelisting",
-                        "place",
-                    ):
-                        titulo = titulo or b.get("name", "") or b.get("headline", "")
-                        adr = b.get("address") or {}
-                        if isinstance(adr, dict):
-                            loc_parts = [
-                                adr.get("addressLocality") or "",
-                                adr.get("addressRegion") or "",
-                            ]
-                            loc = ", ".join([p for p in loc_parts if p]).strip(", ")
-                            if loc:
-                                localizacion = localizacion or loc
-                                municipio = municipio or (
-                                    adr.get("addressLocality") or ""
-                                )
-                        off = b.get("offers") or {}
-                        if isinstance(off, dict):
-                            precio = precio or _to_int(off.get("price"))
-                        size = b.get("floorSize") or {}
-                        if isinstance(size, dict):
-                            m2 = m2 or _to_int(size.get("value"))
-                        if habs is None:
-                            habs = _to_int(
-                                b.get("numberOfRooms")
-                                or b.get("numberOfRoomsTotal")
-                                or None
-                            )
-                        if banos is None:
-                            banos = _to_int(
-                                b.get("numberOfBathroomsTotal")
-                                or b.get("numberOfBathrooms")
-                                or None
-                            )
-        except Exception:
-            pass
-
-        # HTML
-        if not titulo:
-            h1 = soup.find("h1", class_=re.compile("re-DetailHeader-propertyTitle"))
-            titulo = _text(h1)
+        if extract_state_blob(html):
+            return _parse_y_cachear(html, url)
 
-        if not municipio:
-            muni = soup.find(
-                "p", class_=re.compile("re-DetailHeader-municipalityTitle")
-            )
-            municipio = _text(muni)
-        if not localizacion:
-            loc_el = soup.find(attrs={"data-testid": "re-DetailHeader-address"})
-            localizacion = _text(loc_el) or municipio
-
-        if precio is None:
-            # 1) Exacto al <span> del precio
-            price_el = soup.select_one("span.re-DetailHeader-price")
-
-            # 2) Fallbacks por si cambian la estructura
-            if not price_el:
-                price_el = soup.find("span", class_="re-DetailHeader-price")
-            if not price_el:
-                # Evita capturar el *Container*
-                price_el = soup.find(
-                    lambda tag: tag.name == "span"
-                    and tag.has_attr("class")
-                    and "re-DetailHeader-price" in tag.get("class", [])
-                )
-
-            precio = _int_from_text(price_el)
-
-        reduced = soup.select_one("div.re-DetailHeader-reducedPrice")
-        if reduced:
-            precio_bajada = _to_int(_text(reduced))  # "Ha bajado 9.100€" -> 9100
-        if precio is None or precio_bajada is None:
-            box = soup.select_one("div.re-DetailHeader-priceContainer")
-            if box:
-                nums = re.findall(r"\d[\d\.\,]*", box.get_text(" ", strip=True))
-                if nums and precio is None:
-                    posible_precio = _to_int(nums[0])
-                    if posible_precio:
-                        precio = posible_precio
-                if len(nums) >= 2 and precio_bajada is None:
-                    posible_bajada = _to_int(nums[1])
-                    if posible_bajada:
-                        precio_bajada = posible_bajada
-        rooms_li = soup.find("li", class_=re.compile("re-DetailHeader-rooms"))
-        baths_li = soup.find("li", class_=re.compile("re-DetailHeader-bathrooms"))
-        surf_li = soup.find("li", class_=re.compile("re-DetailHeader-surface"))
-        if habs is None:
-            habs = _int_from_text(rooms_li)
-        if banos is None:
-            banos = _int_from_text(baths_li)
-        if m2 is None:
-            m2 = _int_from_text(surf_li)
-
-        feats = soup.find(attrs={"data-testid": "featuresList"}) or soup.find(
-            class_=re.compile("re-DetailFeaturesList")
-        )
-        if feats:
-            for f in feats.find_all(class_=re.compile("re-DetailFeaturesList-feature")):
-                label = _text(f.find(class_=re.compile("featureLabel"))).lower()
-                value = _text(f.find(class_=re.compile("featureValue")))
-                if "consumo energía" in label:
-                    consumo_energia = value or consumo_energia
-                if "emisiones" in label:
-                    emisiones_energia = value or emisiones_energia
-
-        desc_p = soup.find("p", class_=re.compile("re-DetailDescription"))
-        if desc_p:
-            for br in desc_p.find_all("br"):
-                br.replace_with("\n")
-            descripcion = _text(desc_p)
-
-        if descripcion:
-            m = re.search(r"Ref\.?\s*catastral:\s*([A-Z0-9]+)", descripcion, flags=re.I)
-            if m:
-                ref_catastral = m.group(1).strip()
-            m = re.search(r"Edificabilidad:\s*([\d\.]+)\s*m2?", descripcion, flags=re.I)
-            if m:
-                edificabilidad = _to_int(m.group(1))
-            m = re.search(
-                r"Parcela\s+urbana\s+residencial\s+de\s*([\d\.,]+)\s*m2",
-                descripcion,
-                flags=re.I,
-            )
-            if m:
-                parcela_m2 = _to_int(m.group(1))
-            m = re.search(r"Parcela mínima\s*([\d\.,]+)\s*m2", descripcion, flags=re.I)
-            if m:
-                parcela_min_m2 = _to_int(m.group(1))
-            m = re.search(r"Fachada mínima\s*([\d\.,]+)\s*m", descripcion, flags=re.I)
-            if m:
-                fachada_min_m = _to_int(m.group(1))
-            m = re.search(r"Altura\s*Máx\.?\s*([\d\.,]+)\s*m", descripcion, flags=re.I)
-            if m:
-                altura_max_m = _to_int(m.group(1))
-            m = re.search(r"dentro del\s+(Sector\s*[^\.\n]+)", descripcion, flags=re.I)
-            if m:
-                sector_urbanistico = m.group(1).strip()
-
-        bc = soup.find("nav", attrs={"aria-label": "Ruta de navegación"})
-        if bc:
-            breadcrumb = [
-                a.get_text(strip=True) for a in bc.select(".re-Breadcrumb-link")
-            ] + [
-                (
-                    bc.select_one(".re-Breadcrumb-text").get_text(strip=True)
-                    if bc.select_one(".re-Breadcrumb-text")
-                    else ""
-                )
-            ]
-            breadcrumb = [b for b in breadcrumb if b]
-
-        extra_fotos = 0
-        extra_badge = soup.find(class_=re.compile("re-DetailMosaicPhoto-moreText"))
-        if extra_badge:
-            extra_fotos = _to_int(extra_badge.text)
-        visibles = soup.select(".re-DetailMosaicPhotoWrapper img")
-        fotos_total = len(visibles) or None
-        if fotos_total is not None and extra_fotos:
-            fotos_total += extra_fotos
-
-        next_a = soup.find("a", class_=re.compile("re-DetailPagination-action--next"))
-        link_inmueble_siguiente = (
-            canonicalize_fotocasa_url(next_a.get("href"))
-            if next_a and next_a.get("href")
-            else ""
+        # ---------- SCROLL A FONDO ANTES DE PARSEAR ----------
+        # Una sola llamada asíncrona; al terminar sube 200px para dejar en
+        # viewport algunos bloques clave
+        scroll_until_stable(
+            browser,
+            step_px=200,
+            pause_ms=45,
+            stability_rounds=3,
+            bottom_rounds=1,
+            max_steps=300,
+            shake_px=40,
+            back_up_px=200,
         )
 
-        anunciante = ""
-        try:
-            client_block = soup.select_one(".re-FormContactDetailDown-client h4")
-            if client_block:
-                anunciante = client_block.get_text(strip=True)
-        except Exception:
-            pass
-
-        # --- Zona ---
-        zone_el = soup.select_one("h2.re-DetailMap-address")
-        zona = None
-        if zone_el:
-            full_zone = zone_el.get_text(" ", strip=True)
-            partes = [p.strip() for p in full_zone.split(",")]
-            # Buscar el índice de la parte que contiene 'Alcoy / Alcoi'
-            for i, p in enumerate(partes):
-                if "Alcoy" in p:
-                    if i > 0:
-                        zona = partes[i - 1]  # la parte inmediatamente a la izquierda
-                    break
-            if not zona and partes:
-                zona = partes[0]  # fallback en caso de no encontrar "Alcoy"
-        print("Zona:", zona)
-        habs = _to_int(habs)
-        banos = _to_int(banos)
-        m2 = _to_int(m2)
-
-        casas = {
-            "id_inmueble": url,
-            "link_inmueble": url,
-            "link_inmueble_siguiente": link_inmueble_siguiente or "",
-            "titulo": titulo,
-            "localizacion": localizacion,
-            "municipio": municipio,
-            "precio": precio,
-            "precio_bajada": precio_bajada,
-            "metros_cuadrados": m2,
-            "habitaciones": habs,
-            "baños": banos,
-            "consumo_energia": consumo_energia,
-            "emisiones_energia": emisiones_energia,
-            "descripcion": descripcion,
-            "breadcrumb": " > ".join(breadcrumb) if breadcrumb else "",
-            "fotos_total": fotos_total,
-            "ref_catastral": ref_catastral,
-            "edificabilidad_m2techo": edificabilidad,
-            "parcela_m2": parcela_m2,
-            "parcela_min_m2": parcela_min_m2,
-            "fachada_min_m": fachada_min_m,
-            "altura_max_m": altura_max_m,
-            "sector_urbanistico": sector_urbanistico,
-            "anunciante": anunciante,
-            "zona": zona,
-            "fecha_inclusion": datetime.today().strftime("%Y-%m-%d"),
-        }
-        df_casas = pd.DataFrame([casas])
-        return df_casas, casas
+        return _parse_y_cachear(browser.page_source, url)
 
     except WebDriverException:
         return pd.DataFrame(), {}
@@ -1055,6 +690,41 @@ def parsear_inmueble(id_inmueble_url, browser, first_run):
         return pd.DataFrame(), {}
 
 
+# Marcadores mínimos de una ficha renderizada en servidor
+FICHA_MARKERS = (
+    "__INITIAL_PROPS__",
+    "__NEXT_DATA__",
+    "re-DetailHeader",
+    "application/ld+json",
+)
+
+
+def parsear_inmueble_http(id_inmueble_url, session, limiter):
+    """
+    Descarga la ficha por HTTP simple (cookies del navegador) respetando el
+    `limiter` por host y la espera de FICHA_PACER, y la parsea.
+    Devuelve df_row o None si la respuesta parece bloqueada o incompleta, en
+    cuyo caso la ficha se reintenta con Selenium.
+    """
+    url = canonicalize_fotocasa_url(str(id_inmueble_url))
+    FICHA_PACER.wait()
+    limiter.wait(url)
+    status, html = fetch_html(session, url, timeout=15)
+    if looks_blocked(status, html):
+        FICHA_PACER.penalize("bloqueo")
+        return None
+    if status != 200 or not looks_complete(html, FICHA_MARKERS):
+        FICHA_PACER.penalize("incompleta", soft=True)
+        return None
+    df_i, row = parse_ficha_html(html, url)
+    if df_i.empty or (not row.get("titulo") and row.get("precio") is None):
+        FICHA_PACER.penalize("vacia", soft=True)
+        return None
+    FICHA_PACER.ok()
+    FICHA_CACHE.put(url, html)
+    return df_i
+
+
 DEBUG = True
 
 
@@ -1115,65 +785,110 @@ def main(busqueda):
     ids_nuevos = [str(i) for i in ids_hoy if str(i) not in existing_ids_in_data]
     safe_write_ids_csv(ids_new_file, ids_nuevos)
 
-    # Nuevo navegador para parseo
-    browser = build_browser()
+    # Diario de fichas parseadas: si una ejecución anterior de hoy cayó a
+    # medias, lo ya parseado se recupera en lugar de volver a descargarlo
+    journal = ParseJournal.for_today(BASE_DIR)
+    if PARSE_RESUME:
+        previos = journal.load()
+    else:
+        journal.reset()
+        previos = {}
+    parsed_prev = {
+        u: pd.DataFrame([previos[u]]) for u in ids_nuevos if previos.get(u) is not None
+    }
+    ids_pendientes = [u for u in ids_nuevos if u not in previos]
+    if previos:
+        print(
+            f"[RESUME] {len(parsed_prev)} fichas recuperadas del diario; "
+            f"quedan {len(ids_pendientes)}"
+        )
 
-    # Parsear solo nuevos con reintentos y reciclado del driver
-    first_run = True
-    df_new_list = []
-    print(f"Parseando {len(ids_nuevos)} nuevos inmuebles Fotocasa...")
+    # HTTP primero: el navegador del listado solo aporta cookies y User-Agent
+    parsed_http = {}
+    if FOTOCASA_HTTP and ids_pendientes:
+        session = make_http_session_from_browser(
+            browser, "fotocasa.es", referer="https://www.fotocasa.es/"
+        )
+        mount_pool(session, FOTOCASA_HTTP_WORKERS, retries=FOTOCASA_HTTP_RETRIES)
+        limiter = HostRateLimiter(FOTOCASA_HTTP_MIN_INTERVAL)
+
+        def _http_task(u):
+            df_i = parsear_inmueble_http(u, session, limiter)
+            if df_i is not None:
+                journal.append_df(u, df_i)
+            return df_i
+
+        resultados = http_first_map(
+            ids_pendientes, _http_task, max_workers=FOTOCASA_HTTP_WORKERS
+        )
+        parsed_http = {
+            u: r for u, r in zip(ids_pendientes, resultados) if r is not None
+        }
+        print(
+            f"[HTTP] {len(parsed_http)}/{len(ids_pendientes)} fichas por HTTP; "
+            f"{len(ids_pendientes) - len(parsed_http)} pasan a Selenium"
+        )
+        FICHA_PACER.report("fotocasa fichas http")
+
+    # El navegador del listado ya no se usa: el parseo va en su propio pool
+    net_blocking.collect(browser)
+    try:
+        browser.quit()
+    except Exception:
+        pass
+    ids_selenium = [u for u in ids_pendientes if u not in parsed_http]
+
+    # Parsear con N navegadores en paralelo (cada uno con su ciclo de limpieza,
+    # reciclado y reintentos), limitado por la RAM disponible
+    n_workers = max_workers_for_memory(FOTOCASA_WORKERS, mb_per_worker=FOTOCASA_MB_PER_WORKER)
+    print(
+        f"Parseando {len(ids_selenium)} nuevos inmuebles Fotocasa con {n_workers} navegador(es)..."
+    )
 
     RECYCLE_EVERY = 30  # recicla el driver cada N fichas
     CLEAR_STATE_EVERY = 5  # limpia cache/cookies cada N fichas
     MAX_RETRIES_PER_URL = 2  # reintentos por ficha
 
-    for idx, url in enumerate(ids_nuevos, start=1):
-        # Limpieza periódica de estado para frenar el crecimiento de memoria
-        if idx % CLEAR_STATE_EVERY == 0:
-            clear_browser_state(browser, clear_cache=True, clear_cookies=True)
-
-        # Reciclado periódico del driver para cortar fugas
-        if idx % RECYCLE_EVERY == 0:
-            try:
-                browser.quit()
-            except Exception:
-                pass
-            browser = build_browser()
-            first_run = True  # tras reciclar, volvemos a aceptar cookies si salen
-
-        success = False
-        for attempt in range(1, MAX_RETRIES_PER_URL + 1):
-            try:
-                df_i, _ = parsear_inmueble(url, browser, first_run)
-                if not df_i.empty:
-                    df_new_list.append(df_i)
-                    success = True
-                    break
-            except WebDriverException:
-                # Driver en estado malo: reciclar y reintentar
-                try:
-                    browser.quit()
-                except Exception:
-                    pass
-                browser = build_browser()
-                first_run = True
-            except Exception:
-                # Fallo blando; reintento
-                pass
-            # backoff simple
-            time.sleep(0.8 * attempt)
+    def _parse_task(browser, url, first_run):
+        df_i, _ = parsear_inmueble(url, browser, first_run)
+        return df_i
 
-        first_run = False
+    def _clear_state(b):
+        net_blocking.collect(b)
+        clear_browser_state(b, clear_cache=True, clear_cookies=True)
 
-        if not success:
+    def _on_result(pos, url, df_i):
+        if df_i is None:
             # Registro mínimo en consola, no se escribe fila vacía
             print(f"[WARN] No se pudo parsear: {url}")
+        else:
+            journal.append_df(url, df_i)
+
+    pool = BrowserWorkerPool(
+        build_browser,
+        n_workers,
+        recycle_every=RECYCLE_EVERY,
+        clear_state_every=CLEAR_STATE_EVERY,
+        max_retries=MAX_RETRIES_PER_URL,
+        clear_state=_clear_state,
+        reset_on=(WebDriverException,),
+        is_ok=lambda df_i: df_i is not None and not df_i.empty,
+        on_result=_on_result,
+        on_quit=net_blocking.collect,
+    )
+    parsed_selenium = dict(zip(ids_selenium, pool.map(_parse_task, ids_selenium)))
+    net_blocking.run_stats.report("fotocasa")
 
-    # Cierre del navegador
-    try:
-        browser.quit()
-    except Exception:
-        pass
+    # Resultados en el orden original de ids_nuevos
+    df_new_list = []
+    for url in ids_nuevos:
+        df_i = parsed_prev.get(url)
+        if df_i is None:
+            df_i = parsed_http.get(url)
+        if df_i is None:
+            df_i = parsed_selenium.get(url)
+        if df_i is not None:
+            df_new_list.append(df_i)
 
     # Consolidación y escritura segura
     df_new = (
@@ -1213,22 +928,40 @@ def main(busqueda):
     safe_write_df_csv(data_new_file, df_new)
 
     # today consistente
-    if not df_today_prev.empty:
-        df_today_kept = df_today_prev[
-            df_today_prev["id_inmueble"].astype(str).isin(set(map(str, ids_hoy)))
-        ].copy()
-    else:
-        df_today_kept = pd.DataFrame(columns=df_new.columns)
-
-    df_today = pd.concat([df_today_kept, df_new], ignore_index=True)
-    if not df_today.empty:
-        df_today = df_today.drop_duplicates(subset=["id_inmueble"], keep="last")
+    # (lo previo que sigue en ids_hoy + lo nuevo; a igual id gana lo nuevo)
+    df_today = keyed_upsert(df_today_prev, df_new, key="id_inmueble", keep_keys=ids_hoy)
 
     safe_write_df_csv(data_today_file, df_today)
+    # Ya compactado en los CSV: el diario sobra
+    journal.discard()
+    FICHA_CACHE.report("fotocasa")
+    FICHA_CACHE.evict()
     print(
         f"Escritos: {data_new_file} ({len(df_new)} filas) y {data_today_file} ({len(df_today)} filas)."
     )
 
 
+def reparse_from_cache():
+    """
+    Modo offline: vuelve a parsear las fichas de ids_today desde la caché de
+    HTML (sin navegador ni red) y reescribe inmuebles_today. Las fichas sin
+    caché conservan su fila.
+    """
+    ids_today_file, _, _, data_today_file, _ = paths_for()
+    ids_hoy = safe_read_ids_csv(ids_today_file)
+
+    def _cached(u):
+        r = parsear_desde_cache(canonicalize_fotocasa_url(u))
+        return None if r is None else r[0]
+
+    df_today, n = rebuild_today_from_cache(ids_hoy, _cached, safe_read_df_csv(data_today_file))
+    safe_write_df_csv(data_today_file, df_today)
+    FICHA_CACHE.report("fotocasa")
+    print(f"[OFFLINE] {n}/{len(ids_hoy)} fichas reparseadas desde caché -> {data_today_file}")
+
+
 if __name__ == "__main__":
-    main(busqueda)
+    if FICHA_CACHE.offline:
+        reparse_from_cache()
+    else:
+        main(busqueda)
@@ -0,0 +1,315 @@
+"""
+Parseo puro de fichas de Idealista: HTML -> dict de la fila, sin navegador,
+red ni pandas. Lo usan idealista_scrapper.py y los benchmarks de benchmarks/.
+"""
+
+import json
+import re
+import unicodedata
+from datetime import datetime
+
+from bs4 import BeautifulSoup as bs
+
+ANUNCIANTES_EXCLUIDOS = ["PICÓ BLANES", "JBC", "J.B.C"]
+
+
+def ficha_url(id_inmueble):
+    return f"https://www.idealista.com/inmueble/{id_inmueble}/"
+
+
+def parse_ficha(html, id_inmueble):
+    """
+    Parsea el HTML de una ficha de Idealista (del navegador, de HTTP o de la
+    caché) y devuelve el dict de la fila.
+    - Parsea también las secciones 'Características básicas' y 'Edificio'
+      del bloque .details-property-feature-one / .details-property_features
+    - Si el anunciante está excluido devuelve {"excluido": anunciante}; si el
+      HTML no se puede parsear, {}.
+    """
+    try:
+        url = ficha_url(id_inmueble)
+        soup = bs(html, "lxml")
+
+        adv_el = soup.find("a", {"class": "about-advertiser-name"})
+        anunciante = adv_el.text.strip() if adv_el else ""
+        anunciante_link = (
+            "https://www.idealista.com" + adv_el.get("href").strip()
+            if adv_el and adv_el.get("href")
+            else ""
+        )
+        if any(bloq in anunciante.upper() for bloq in ANUNCIANTES_EXCLUIDOS):
+            return {"excluido": anunciante}
+
+        titulo_el = soup.find("span", {"class": "main-info__title-main"})
+        titulo = titulo_el.text.strip() if titulo_el else ""
+
+        loc_el = soup.find("span", {"class": "main-info__title-minor"})
+        localizacion = loc_el.text.split(",")[0].strip() if loc_el else ""
+
+        # --- helpers robustos ---
+        num_regex = re.compile(r"(\d+(?:[\.,]\d+)?)")
+
+        def strip_accents(s):
+            if not s:
+                return ""
+            return "".join(
+                c
+                for c in unicodedata.normalize("NFD", s)
+                if unicodedata.category(c) != "Mn"
+            )
+
+        def to_int_any(texto):
+            if not texto:
+                return None
+            m = num_regex.search(texto.replace("\xa0", " "))
+            if not m:
+                return None
+            n = m.group(1).replace(".", "").replace(",", ".")
+            try:
+                return int(float(n))
+            except Exception:
+                return None
+
+        def find_first(patterns, text_norm):
+            for pat in patterns:
+                m = re.search(pat, text_norm)
+                if m:
+                    try:
+                        return int(m.group(1))
+                    except Exception:
+                        continue
+            return None
+
+        def limpiar_precio(txt):
+            if not txt:
+                return None
+            m = num_regex.search(txt.replace("\xa0", " "))
+            if not m:
+                return None
+            return to_int_any(m.group(1))
+
+        def parse_from_ldjson(soup):
+            rooms = baths = area = None
+            for sc in soup.find_all("script", {"type": "application/ld+json"}):
+                try:
+                    data = json.loads(sc.string or "")
+                except Exception:
+                    continue
+                candidates = data if isinstance(data, list) else [data]
+                for d in candidates:
+                    if not isinstance(d, dict):
+                        continue
+                    if rooms is None:
+                        r = d.get("numberOfRooms") or d.get("numberOfRooms", None)
+                        if isinstance(r, (int, float, str)):
+                            try:
+                                rooms = int(float(r))
+                            except:
+                                pass
+                    if baths is None:
+                        b = (
+                            d.get("numberOfBathroomsTotal")
+                            or d.get("numberOfBathrooms")
+                            or d.get("bathroomCount")
+                        )
+                        if isinstance(b, (int, float, str)):
+                            try:
+                                baths = int(float(b))
+                            except:
+                                pass
+                    if area is None:
+                        fs = d.get("floorSize") or {}
+                        if isinstance(fs, dict):
+                            v = fs.get("value") or fs.get("valueReference")
+                            if isinstance(v, (int, float, str)):
+                                try:
+                                    area = int(float(str(v).replace(",", ".")))
+                                except:
+                                    pass
+                if rooms is not None and baths is not None and area is not None:
+                    break
+            return rooms, baths, area
+
+        def parse_m2_from_any(text_norm):
+            m = re.search(r"(\d+(?:[\.,]\d+)?)\s*m(?:²|2)\b", text_norm)
+            if not m:
+                m = re.search(r"(\d+(?:[\.,]\d+)?)\s*(?:metros|mtrs|mtr)\b", text_norm)
+            if m:
+                try:
+                    return int(float(m.group(1).replace(".", "").replace(",", ".")))
+                except:
+                    return None
+            return None
+
+        precio_el = soup.find("span", {"class": "txt-bold"})
+        precio = limpiar_precio(precio_el.text) if precio_el else None
+
+        # ========= NUEVO: parseo específico del contenedor de características =========
+        # Mapeamos cada <h2> de la sección a su lista <ul> inmediatamente siguiente.
+        secciones_raw = {}
+        for h2 in soup.find_all("h2", {"class": "details-property-h2"}):
+            titulo_sec = (h2.get_text() or "").strip()
+            # El contenedor con la lista está en el siguiente hermano con class 'details-property_features'
+            cont = h2.find_next_sibling("div", {"class": "details-property_features"})
+            if cont:
+                items = [li.get_text(" ").strip() for li in cont.find_all("li")]
+                secciones_raw[titulo_sec.lower()] = items
+
+        caracteristicas = [
+            *secciones_raw.get("características básicas", []),
+            *secciones_raw.get("caracteristicas basicas", []),
+        ]
+        edificio = secciones_raw.get("edificio", [])
+
+        # Normalización para regex
+        def norm_list(lst):
+            return [strip_accents(x.lower()) for x in lst]
+
+        car_norm = norm_list(caracteristicas)
+        edi_norm = norm_list(edificio)
+
+        m2_construidos = None
+        m2_utiles = None
+        habitaciones_list = None
+        banos_list = None
+        terraza = None
+        estado = None
+
+        # Reglas sobre 'Características básicas'
+        for raw, norm in zip(caracteristicas, car_norm):
+            # 180 m² construidos, 170 m² útiles
+            m = re.search(r"(\d+(?:[\.,]\d+)?)\s*m(?:²|2)\s*constru", norm)
+            if m:
+                try:
+                    m2_construidos = int(
+                        float(m.group(1).replace(".", "").replace(",", "."))
+                    )
+                except:
+                    pass
+            m = re.search(r"(\d+(?:[\.,]\d+)?)\s*m(?:²|2)\s*u(?:tiles|tiles)", norm)
+            if m:
+                try:
+                    m2_utiles = int(
+                        float(m.group(1).replace(".", "").replace(",", "."))
+                    )
+                except:
+                    pass
+
+            # habitaciones
+            if "sin habitacion" in norm or "sin habitaciones" in norm:
+                habitaciones_list = 0
+            else:
+                m = re.search(
+                    r"(\d+)\s*(?:hab(?:\.|itaciones?)|dorm(?:\.|itorios?))", norm
+                )
+                if m:
+                    habitaciones_list = int(m.group(1))
+
+            # baños
+            m = re.search(r"(\d+)\s*bano?s?", norm)
+            if m:
+                banos_list = int(m.group(1))
+
+            # terraza
+            if "terraza" in norm:
+                terraza = True
+
+            # estado
+            if "segunda mano" in norm or "buen estado" in norm or "reformado" in norm:
+                # Guarda el texto completo tal cual aparece
+                estado = raw
+
+        # Reglas sobre 'Edificio'
+        planta = None
+        exterior = None
+        ascensor = None
+        for raw, norm in zip(edificio, edi_norm):
+            # planta / entreplanta / bajo / etc.
+            # guardamos el literal original para mayor fidelidad
+            if any(
+                k in norm
+                for k in ["planta", "entreplanta", "bajo", "atico", "principal"]
+            ):
+                planta = raw
+
+            # exterior / interior
+            if "exterior" in norm:
+                exterior = True
+            if "interior" in norm:
+                exterior = False
+
+            # ascensor
+            if "sin ascensor" in norm:
+                ascensor = False
+            elif "ascensor" in norm:
+                ascensor = True
+
+        # ===========================================================================
+        # Texto completo normalizado (para fallbacks ya existentes)
+        full_text_norm = strip_accents(soup.get_text(" ").lower())
+
+        # 1) JSON-LD
+        habitaciones, banos, metros_cuadrados = parse_from_ldjson(soup)
+
+        # 2) Fallback regex global
+        if habitaciones is None:
+            habitaciones = find_first(
+                [r"(\d+)\s*hab(?:\.|itaciones?)\b", r"(\d+)\s*dorm(?:\.|itorios?)\b"],
+                full_text_norm,
+            )
+        if banos is None:
+            cand = []
+            for pat in [
+                r"(\d+)\s*bano?s?\b",
+                r"(\d+)\s*bano?s?\.",
+                r"(\d+)\s*aseos?\b",
+                r"(\d+)\s*wc\b",
+            ]:
+                v = find_first([pat], full_text_norm)
+                if v is not None:
+                    cand.append(v)
+            banos = max(cand) if cand else None
+        if metros_cuadrados is None:
+            metros_cuadrados = parse_m2_from_any(full_text_norm)
+
+        # 3) Si el contenedor específico aportó datos, los priorizamos
+        if m2_construidos is not None:
+            # opcionalmente puedes guardar ambos (construidos y útiles)
+            metros_cuadrados = m2_construidos
+        if m2_utiles is not None:
+            # añadimos campo separado para útiles
+            pass
+        if habitaciones_list is not None:
+            habitaciones = habitaciones_list
+        if banos_list is not None:
+            banos = banos_list
+        if terraza is None:
+            # si no se mencionó, dejamos None; si prefieres False por defecto, cambia aquí
+            pass
+
+        # Construye dict final
+        casas = {
+            "id_inmueble": str(id_inmueble),
+            "titulo": titulo,
+            "localizacion": localizacion,
+            "precio": precio,
+            "metros_cuadrados": metros_cuadrados,  # por defecto: construidos si están disponibles
+            "m2_construidos": m2_construidos,
+            "m2_utiles": m2_utiles,
+            "habitaciones": habitaciones,
+            "baños": banos,
+            "terraza": bool(terraza) if terraza is not None else None,
+            "estado": estado,  # p.ej. "Segunda mano/buen estado"
+            "planta": planta,  # p.ej. "Entreplanta exterior"
+            "exterior": exterior,  # True / False / None
+            "ascensor": ascensor,  # True / False / None
+            "anunciante": anunciante,
+            "anunciante_link": anunciante_link,
+            "link_inmueble": url,
+            "fecha_inclusion": datetime.today().strftime("%Y-%m-%d"),
+        }
+
+        return casas
+
+    except Exception:
+        return {}
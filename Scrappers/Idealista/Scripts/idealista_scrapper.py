@@ -1,24 +1,41 @@
 import os
+import sys
 import csv
-import time
-import random
 import shutil
 import pandas as pd
 from bs4 import BeautifulSoup as bs
-import re
-import unicodedata
-import json
 from pathlib import Path
-from datetime import datetime
 
 
 # Selenium / undetected-chromedriver
 import undetected_chromedriver as uc
 from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 
 # -------- Configuración --------
 busqueda = "alcoy-alcoi-alicante"
 SCRIPT_DIR = Path(__file__).resolve().parent
+# Raíz del repo (para importar utils/ al lanzar el script directamente)
+REPO_ROOT = SCRIPT_DIR.parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from idealista_parser import ficha_url, parse_ficha
+from utils import net_blocking
+from utils.journal import PARSE_RESUME, ParseJournal
+from utils.page_cache import PageCache
+from utils.upsert import keyed_upsert, rebuild_today_from_cache
+from utils.rate_limit import AdaptivePacer, HostRateLimiter
+from utils.http_session import (
+    fetch_html,
+    http_first_map,
+    looks_blocked,
+    looks_complete,
+    make_http_session_from_browser,
+)
+
 PROJECT_ROOT = (
     SCRIPT_DIR.parent.parent
 )  # .../Scrappers/Idealista/Scripts -> sube dos niveles
@@ -28,6 +45,38 @@ min_wait = 10
 max_wait = 12
 max_page = 999_999_999
 
+# Ritmo adaptativo (AIMD): arranca en las esperas de siempre, acelera mientras
+# las páginas llegan completas y frena en seco ante captcha/bloqueo
+IDEALISTA_LIST_MIN_DELAY = float(os.getenv("IDEALISTA_LIST_MIN_DELAY") or "4")
+IDEALISTA_FICHA_MIN_DELAY = float(os.getenv("IDEALISTA_FICHA_MIN_DELAY") or "2")
+LISTING_PACER = AdaptivePacer(
+    initial=(min_wait + max_wait) / 2, min_delay=IDEALISTA_LIST_MIN_DELAY, max_delay=90
+)
+FICHA_PACER = AdaptivePacer(initial=6, min_delay=IDEALISTA_FICHA_MIN_DELAY, max_delay=60)
+
+# Fichas por HTTP (cookies del navegador) antes de recurrir a Selenium
+IDEALISTA_HTTP = (os.getenv("IDEALISTA_HTTP") or "true").lower() in ("1", "true", "yes")
+# Idealista está tras DataDome: por defecto un único flujo HTTP y, si se suben
+# los workers, un intervalo mínimo entre peticiones compartido por todos
+IDEALISTA_HTTP_WORKERS = int(os.getenv("IDEALISTA_HTTP_WORKERS") or "1")
+IDEALISTA_HTTP_MIN_INTERVAL = float(os.getenv("IDEALISTA_HTTP_MIN_INTERVAL") or "2")
+# HTML de fichas en caché comprimida (clave: URL de la ficha por id); con
+# PAGE_CACHE_OFFLINE=true se reparsea el día desde ella sin navegador ni red
+FICHA_CACHE = PageCache.for_portal(REPO_ROOT, "idealista")
+
+
+# -------- Navegador --------
+def build_browser():
+    """
+    Chrome por defecto (Idealista es sensible a flags poco habituales) con el
+    bloqueo de anuncios, analítica, vídeo y mapas de utils.net_blocking.
+    """
+    opts = uc.ChromeOptions()
+    net_blocking.configure_options(opts)
+    browser = uc.Chrome(options=opts)
+    net_blocking.apply_blocking(browser, "idealista")
+    return browser
+
 
 # -------- Helpers de rutas por 'busqueda' --------
 def paths_for():
@@ -136,7 +185,7 @@ def scrape_idealista_ids(busqueda, browser, tipo="venta", max_page=10000000):
             except WebDriverException:
                 break
 
-            time.sleep(random.randint(min_wait, max_wait))
+            LISTING_PACER.wait()
 
             if first_run:
                 try:
@@ -154,6 +203,16 @@ def scrape_idealista_ids(busqueda, browser, tipo="venta", max_page=10000000):
                 intentos += 1
 
                 html = browser.page_source
+                if looks_blocked(200, html):
+                    # Captcha/bloqueo: frenar y volver a intentarlo con más espera
+                    LISTING_PACER.penalize("bloqueo")
+                    LISTING_PACER.wait()
+                    try:
+                        browser.get(url)
+                    except WebDriverException:
+                        break
+                    LISTING_PACER.wait()
+                    continue
                 soup = bs(html, "lxml")
 
                 main = soup.find("main", {"class": "listing-items"})
@@ -174,7 +233,12 @@ def scrape_idealista_ids(busqueda, browser, tipo="venta", max_page=10000000):
 
                 articles = main.find_all("article")
                 if not articles:
+                    # Página sin tarjetas (vacía o a medio cargar): señal leve
+                    LISTING_PACER.penalize("vacia", soft=True)
                     return ids
+                # Página sana, aporte o no IDs nuevos (última página, recarga
+                # de una ya vista): la espera puede bajar
+                LISTING_PACER.ok()
 
                 antes = len(ids)
                 for article in articles:
@@ -201,7 +265,7 @@ def scrape_idealista_ids(busqueda, browser, tipo="venta", max_page=10000000):
                     except WebDriverException:
                         break
 
-                time.sleep(random.randint(min_wait, max_wait))
+                LISTING_PACER.wait()
 
             if nuevos_total_pagina == 0:
                 break
@@ -233,313 +297,111 @@ def merge_unique_ordered(list_a, list_b):
 
 
 # -------- Parser de ficha --------
-def parsear_inmueble(id_inmueble, browser, first_run):
+# El parseo puro (HTML -> dict) está en idealista_parser.py
+def parse_ficha_html(html, id_inmueble):
     """
-    Devuelve (df_casa: DataFrame con una fila, dict_casa: dict)
-    - Ahora también parsea las secciones 'Características básicas' y 'Edificio'
-      del bloque .details-property-feature-one / .details-property_features
+    Parsea el HTML de una ficha con idealista_parser.parse_ficha.
+    Devuelve (df_casa: DataFrame con una fila, dict_casa: dict); si el
+    anunciante está excluido, (DataFrame vacío, {"excluido": anunciante}).
     """
-    try:
-        url = f"https://www.idealista.com/inmueble/{id_inmueble}/"
-        browser.get(url)
-        time.sleep(random.randint(4, 8))
+    row = parse_ficha(html, id_inmueble)
+    if not row or row.get("excluido"):
+        return pd.DataFrame(), row
+    return pd.DataFrame([row]), row
 
-        if first_run:
-            time.sleep(random.randint(3, 5))
-            try:
-                browser.find_element(
-                    "xpath", '//*[@id="didomi-notice-agree-button"]'
-                ).click()
-            except Exception:
-                pass
-
-        html = browser.page_source
-        soup = bs(html, "lxml")
-
-        adv_el = soup.find("a", {"class": "about-advertiser-name"})
-        anunciante = adv_el.text.strip() if adv_el else ""
-        anunciante_link = (
-            "https://www.idealista.com" + adv_el.get("href").strip()
-            if adv_el and adv_el.get("href")
-            else ""
-        )
-        if any(bloq in anunciante.upper() for bloq in ["PICÓ BLANES", "JBC", "J.B.C"]):
-            return pd.DataFrame(), {}
 
-        titulo_el = soup.find("span", {"class": "main-info__title-main"})
-        titulo = titulo_el.text.strip() if titulo_el else ""
+def parsear_desde_cache(id_inmueble):
+    """
+    (df_casa, dict_casa) de la ficha cacheada (df vacío si el anunciante está
+    excluido) o None si no hay entrada vigente.
+    """
+    html = FICHA_CACHE.get(ficha_url(id_inmueble))
+    if html is None:
+        return None
+    df_casa, dict_casa = parse_ficha_html(html, id_inmueble)
+    if df_casa.empty and not dict_casa.get("excluido"):
+        return None
+    return df_casa, dict_casa
 
-        loc_el = soup.find("span", {"class": "main-info__title-minor"})
-        localizacion = loc_el.text.split(",")[0].strip() if loc_el else ""
 
-        # --- helpers robustos ---
-        num_regex = re.compile(r"(\d+(?:[\.,]\d+)?)")
+# Marcadores mínimos de una ficha completa (navegador o HTTP)
+FICHA_MARKERS = ("main-info__title-main", "details-property")
 
-        def strip_accents(s):
-            if not s:
-                return ""
-            return "".join(
-                c
-                for c in unicodedata.normalize("NFD", s)
-                if unicodedata.category(c) != "Mn"
-            )
 
-        def to_int_any(texto):
-            if not texto:
-                return None
-            m = num_regex.search(texto.replace("\xa0", " "))
-            if not m:
-                return None
-            n = m.group(1).replace(".", "").replace(",", ".")
-            try:
-                return int(float(n))
-            except Exception:
-                return None
-
-        def find_first(patterns, text_norm):
-            for pat in patterns:
-                m = re.search(pat, text_norm)
-                if m:
-                    try:
-                        return int(m.group(1))
-                    except Exception:
-                        continue
-            return None
+def parsear_inmueble(id_inmueble, browser, first_run, max_attempts=2):
+    """
+    Carga la ficha en el navegador y la parsea con parse_ficha_html (en
+    offline, solo desde la caché de HTML).
+    La espera entre fichas la marca FICHA_PACER según cómo responde el portal:
+    un captcha/bloqueo la dispara y se reintenta; una ficha sin los marcadores
+    de contenido (a medio cargar) la sube algo y también se reintenta.
+    Devuelve (df_casa: DataFrame con una fila, dict_casa: dict)
+    """
+    if FICHA_CACHE.offline:
+        cached = parsear_desde_cache(id_inmueble)
+        return cached if cached is not None else (pd.DataFrame(), {})
+    url = ficha_url(id_inmueble)
+    for intento in range(1, max_attempts + 1):
+        try:
+            browser.get(url)
+            FICHA_PACER.wait()
 
-        def limpiar_precio(txt):
-            if not txt:
-                return None
-            m = num_regex.search(txt.replace("\xa0", " "))
-            if not m:
-                return None
-            return to_int_any(m.group(1))
-
-        def parse_from_ldjson(soup):
-            rooms = baths = area = None
-            for sc in soup.find_all("script", {"type": "application/ld+json"}):
+            if first_run:
+                # Banner de cookies: esperar a que aparezca en lugar de dormir fijo
                 try:
-                    data = json.loads(sc.string or "")
-                except Exception:
-                    continue
-                candidates = data if isinstance(data, list) else [data]
-                for d in candidates:
-                    if not isinstance(d, dict):
-                        continue
-                    if rooms is None:
-                        r = d.get("numberOfRooms") or d.get("numberOfRooms", None)
-                        if isinstance(r, (int, float, str)):
-                            try:
-                                rooms = int(float(r))
-                            except:
-                                pass
-                    if baths is None:
-                        b = (
-                            d.get("numberOfBathroomsTotal")
-                            or d.get("numberOfBathrooms")
-                            or d.get("bathroomCount")
+                    WebDriverWait(browser, 5).until(
+                        EC.element_to_be_clickable(
+                            (By.ID, "didomi-notice-agree-button")
                         )
-                        if isinstance(b, (int, float, str)):
-                            try:
-                                baths = int(float(b))
-                            except:
-                                pass
-                    if area is None:
-                        fs = d.get("floorSize") or {}
-                        if isinstance(fs, dict):
-                            v = fs.get("value") or fs.get("valueReference")
-                            if isinstance(v, (int, float, str)):
-                                try:
-                                    area = int(float(str(v).replace(",", ".")))
-                                except:
-                                    pass
-                if rooms is not None and baths is not None and area is not None:
-                    break
-            return rooms, baths, area
-
-        def parse_m2_from_any(text_norm):
-            m = re.search(r"(\d+(?:[\.,]\d+)?)\s*m(?:²|2)\b", text_norm)
-            if not m:
-                m = re.search(r"(\d+(?:[\.,]\d+)?)\s*(?:metros|mtrs|mtr)\b", text_norm)
-            if m:
-                try:
-                    return int(float(m.group(1).replace(".", "").replace(",", ".")))
-                except:
-                    return None
-            return None
-
-        precio_el = soup.find("span", {"class": "txt-bold"})
-        precio = limpiar_precio(precio_el.text) if precio_el else None
-
-        # ========= NUEVO: parseo específico del contenedor de características =========
-        # Mapeamos cada <h2> de la sección a su lista <ul> inmediatamente siguiente.
-        secciones_raw = {}
-        for h2 in soup.find_all("h2", {"class": "details-property-h2"}):
-            titulo_sec = (h2.get_text() or "").strip()
-            # El contenedor con la lista está en el siguiente hermano con class 'details-property_features'
-            cont = h2.find_next_sibling("div", {"class": "details-property_features"})
-            if cont:
-                items = [li.get_text(" ").strip() for li in cont.find_all("li")]
-                secciones_raw[titulo_sec.lower()] = items
-
-        caracteristicas = [
-            *secciones_raw.get("características básicas", []),
-            *secciones_raw.get("caracteristicas basicas", []),
-        ]
-        edificio = secciones_raw.get("edificio", [])
-
-        # Normalización para regex
-        def norm_list(lst):
-            return [strip_accents(x.lower()) for x in lst]
-
-        car_norm = norm_list(caracteristicas)
-        edi_norm = norm_list(edificio)
-
-        m2_construidos = None
-        m2_utiles = None
-        habitaciones_list = None
-        banos_list = None
-        terraza = None
-        estado = None
-
-        # Reglas sobre 'Características básicas'
-        for raw, norm in zip(caracteristicas, car_norm):
-            # 180 m² construidos, 170 m² útiles
-            m = re.search(r"(\d+(?:[\.,]\d+)?)\s*m(?:²|2)\s*constru", norm)
-            if m:
-                try:
-                    m2_construidos = int(
-                        float(m.group(1).replace(".", "").replace(",", "."))
-                    )
-                except:
-                    pass
-            m = re.search(r"(\d+(?:[\.,]\d+)?)\s*m(?:²|2)\s*u(?:tiles|tiles)", norm)
-            if m:
-                try:
-                    m2_utiles = int(
-                        float(m.group(1).replace(".", "").replace(",", "."))
-                    )
-                except:
+                    ).click()
+                except Exception:
                     pass
-
-            # habitaciones
-            if "sin habitacion" in norm or "sin habitaciones" in norm:
-                habitaciones_list = 0
+                first_run = False
+
+            html = browser.page_source
+            if looks_blocked(200, html):
+                FICHA_PACER.penalize("bloqueo")
+                continue
+            if not looks_complete(html, FICHA_MARKERS):
+                FICHA_PACER.penalize("incompleta", soft=True)
+                if intento < max_attempts:
+                    continue
             else:
-                m = re.search(
-                    r"(\d+)\s*(?:hab(?:\.|itaciones?)|dorm(?:\.|itorios?))", norm
-                )
-                if m:
-                    habitaciones_list = int(m.group(1))
-
-            # baños
-            m = re.search(r"(\d+)\s*bano?s?", norm)
-            if m:
-                banos_list = int(m.group(1))
-
-            # terraza
-            if "terraza" in norm:
-                terraza = True
-
-            # estado
-            if "segunda mano" in norm or "buen estado" in norm or "reformado" in norm:
-                # Guarda el texto completo tal cual aparece
-                estado = raw
-
-        # Reglas sobre 'Edificio'
-        planta = None
-        exterior = None
-        ascensor = None
-        for raw, norm in zip(edificio, edi_norm):
-            # planta / entreplanta / bajo / etc.
-            # guardamos el literal original para mayor fidelidad
-            if any(
-                k in norm
-                for k in ["planta", "entreplanta", "bajo", "atico", "principal"]
-            ):
-                planta = raw
-
-            # exterior / interior
-            if "exterior" in norm:
-                exterior = True
-            if "interior" in norm:
-                exterior = False
-
-            # ascensor
-            if "sin ascensor" in norm:
-                ascensor = False
-            elif "ascensor" in norm:
-                ascensor = True
-
-        # ===========================================================================
-        # Texto completo normalizado (para fallbacks ya existentes)
-        full_text_norm = strip_accents(soup.get_text(" ").lower())
-
-        # 1) JSON-LD
-        habitaciones, banos, metros_cuadrados = parse_from_ldjson(soup)
-
-        # 2) Fallback regex global
-        if habitaciones is None:
-            habitaciones = find_first(
-                [r"(\d+)\s*hab(?:\.|itaciones?)\b", r"(\d+)\s*dorm(?:\.|itorios?)\b"],
-                full_text_norm,
-            )
-        if banos is None:
-            cand = []
-            for pat in [
-                r"(\d+)\s*bano?s?\b",
-                r"(\d+)\s*bano?s?\.",
-                r"(\d+)\s*aseos?\b",
-                r"(\d+)\s*wc\b",
-            ]:
-                v = find_first([pat], full_text_norm)
-                if v is not None:
-                    cand.append(v)
-            banos = max(cand) if cand else None
-        if metros_cuadrados is None:
-            metros_cuadrados = parse_m2_from_any(full_text_norm)
-
-        # 3) Si el contenedor específico aportó datos, los priorizamos
-        if m2_construidos is not None:
-            # opcionalmente puedes guardar ambos (construidos y útiles)
-            metros_cuadrados = m2_construidos
-        if m2_utiles is not None:
-            # añadimos campo separado para útiles
-            pass
-        if habitaciones_list is not None:
-            habitaciones = habitaciones_list
-        if banos_list is not None:
-            banos = banos_list
-        if terraza is None:
-            # si no se mencionó, dejamos None; si prefieres False por defecto, cambia aquí
-            pass
-
-        # Construye dict final
-        casas = {
-            "id_inmueble": str(id_inmueble),
-            "titulo": titulo,
-            "localizacion": localizacion,
-            "precio": precio,
-            "metros_cuadrados": metros_cuadrados,  # por defecto: construidos si están disponibles
-            "m2_construidos": m2_construidos,
-            "m2_utiles": m2_utiles,
-            "habitaciones": habitaciones,
-            "baños": banos,
-            "terraza": bool(terraza) if terraza is not None else None,
-            "estado": estado,  # p.ej. "Segunda mano/buen estado"
-            "planta": planta,  # p.ej. "Entreplanta exterior"
-            "exterior": exterior,  # True / False / None
-            "ascensor": ascensor,  # True / False / None
-            "anunciante": anunciante,
-            "anunciante_link": anunciante_link,
-            "link_inmueble": url,
-            "fecha_inclusion": datetime.today().strftime("%Y-%m-%d"),
-        }
+                FICHA_PACER.ok()
+            df_casa, dict_casa = parse_ficha_html(html, id_inmueble)
+            if not df_casa.empty or dict_casa.get("excluido"):
+                FICHA_CACHE.put(url, html)
+            return df_casa, dict_casa
 
-        df_casas = pd.DataFrame([casas])
-        return df_casas, casas
+        except Exception:
+            return pd.DataFrame(), {}
+    return pd.DataFrame(), {}
 
-    except Exception:
-        return pd.DataFrame(), {}
+
+def parsear_inmueble_http(id_inmueble, session, limiter):
+    """
+    Descarga la ficha por HTTP simple (cookies del navegador) respetando el
+    `limiter` por host y la espera de FICHA_PACER (el mismo que Selenium, así
+    un bloqueo por HTTP también frena al navegador), y la parsea.
+    Devuelve df_casa (vacío si el anunciante está excluido) o None si la
+    respuesta parece bloqueada o incompleta y hay que usar Selenium.
+    """
+    url = ficha_url(id_inmueble)
+    FICHA_PACER.wait()
+    limiter.wait(url)
+    status, html = fetch_html(session, url, timeout=15)
+    if looks_blocked(status, html):
+        FICHA_PACER.penalize("bloqueo")
+        return None
+    if status != 200 or not looks_complete(html, FICHA_MARKERS):
+        FICHA_PACER.penalize("incompleta", soft=True)
+        return None
+    FICHA_PACER.ok()
+    df_i, row = parse_ficha_html(html, id_inmueble)
+    if df_i.empty and not row.get("excluido"):
+        return None
+    FICHA_CACHE.put(url, html)
+    return df_i
 
 
 # -------- Flujo principal --------
@@ -588,12 +450,13 @@ def main(busqueda):
             )
 
     # 2) Navegador y scrape
-    browser = uc.Chrome()
+    browser = build_browser()
     ids_venta = scrape_idealista_ids(busqueda, browser, tipo="venta", max_page=max_page)
     ids_alquiler = scrape_idealista_ids(
         busqueda, browser, tipo="alquiler", max_page=max_page
     )
     dprint(f"[SCRAPE] venta={len(ids_venta)} alquiler={len(ids_alquiler)}")
+    net_blocking.collect(browser)
 
     # 3) Unir
     ids_hoy = merge_unique_ordered(ids_venta, ids_alquiler)
@@ -606,18 +469,74 @@ def main(busqueda):
     ids_nuevos = [str(i) for i in ids_hoy if str(i) not in existing_ids_in_data]
     safe_write_ids_csv(ids_new_file, ids_nuevos)
 
-    # 6) Parsear solo nuevos
+    # Diario de fichas parseadas: si una ejecución anterior de hoy cayó a
+    # medias, lo ya parseado (o excluido) se recupera en lugar de repetirlo
+    journal = ParseJournal.for_today(BASE_DIR)
+    if PARSE_RESUME:
+        previos = journal.load()
+    else:
+        journal.reset()
+        previos = {}
+    ids_pendientes = [_id for _id in ids_nuevos if _id not in previos]
+    if previos:
+        print(
+            f"[RESUME] {len(ids_nuevos) - len(ids_pendientes)} fichas recuperadas "
+            f"del diario; quedan {len(ids_pendientes)}"
+        )
+
+    # 6) Parsear solo nuevos: HTTP primero con las cookies del navegador y
+    # Selenium solo para las fichas bloqueadas o incompletas
+    parsed_http = {}
+    if IDEALISTA_HTTP and ids_pendientes:
+        session = make_http_session_from_browser(
+            browser, "idealista.com", referer="https://www.idealista.com/"
+        )
+
+        limiter = HostRateLimiter(IDEALISTA_HTTP_MIN_INTERVAL)
+
+        def _http_task(_id):
+            df_i = parsear_inmueble_http(_id, session, limiter)
+            # Vacío = anunciante excluido: también se registra para no repetirlo
+            journal.append_df(_id, df_i)
+            return df_i
+
+        resultados = http_first_map(
+            ids_pendientes, _http_task, max_workers=IDEALISTA_HTTP_WORKERS
+        )
+        parsed_http = {
+            _id: r for _id, r in zip(ids_pendientes, resultados) if r is not None
+        }
+        print(
+            f"[HTTP] {len(parsed_http)}/{len(ids_pendientes)} fichas por HTTP; "
+            f"{len(ids_pendientes) - len(parsed_http)} pasan a Selenium"
+        )
+
     first_run = True  # primera ficha: aceptar cookies
     df_new_list = []
     print(
         f"Parseando {len(ids_nuevos)} nuevos inmuebles (venta+alquiler combinados)..."
     )
-    for _id in ids_nuevos:
-        df_i, _ = parsear_inmueble(_id, browser, first_run)
-        first_run = False
+    for n, _id in enumerate(ids_nuevos, start=1):
+        if _id in previos:
+            if previos[_id] is not None:
+                df_new_list.append(pd.DataFrame([previos[_id]]))
+            continue
+        df_i = parsed_http.get(_id)
+        if df_i is None:
+            df_i, row = parsear_inmueble(_id, browser, first_run)
+            first_run = False
+            if not df_i.empty or row.get("excluido"):
+                journal.append_df(_id, df_i)
         if not df_i.empty:
             df_new_list.append(df_i)
-
+        if n % 25 == 0:
+            # vaciar el log de rendimiento para que no crezca en memoria
+            net_blocking.collect(browser)
+
+    net_blocking.collect(browser)
+    net_blocking.run_stats.report("idealista")
+    LISTING_PACER.report("idealista listado")
+    FICHA_PACER.report("idealista fichas")
     try:
         browser.quit()
     except Exception:
@@ -646,23 +565,49 @@ def main(busqueda):
     safe_write_df_csv(data_new_file, df_new)
 
     # 7) Construir today consistente con ids_hoy
-    if not df_today_prev.empty:
-        df_today_kept = df_today_prev[
-            df_today_prev["id_inmueble"].astype(str).isin(set(map(str, ids_hoy)))
-        ].copy()
-    else:
-        df_today_kept = pd.DataFrame(columns=df_new.columns)
-
-    df_today = pd.concat([df_today_kept, df_new], ignore_index=True)
-    if not df_today.empty:
-        df_today = df_today.drop_duplicates(subset=["id_inmueble"], keep="last")
+    # (lo previo que sigue en ids_hoy + lo nuevo; a igual id gana lo nuevo)
+    df_today = keyed_upsert(df_today_prev, df_new, key="id_inmueble", keep_keys=ids_hoy)
 
     safe_write_df_csv(data_today_file, df_today)
+    # Ya compactado en los CSV: el diario sobra
+    journal.discard()
+    FICHA_CACHE.report("idealista")
+    FICHA_CACHE.evict()
 
     print(
         f"Escritos: {data_new_file} ({len(df_new)} filas) y {data_today_file} ({len(df_today)} filas)."
     )
 
 
+def reparse_from_cache():
+    """
+    Modo offline: vuelve a parsear las fichas de ids_today desde la caché de
+    HTML (sin navegador ni red) y reescribe inmuebles_today. Las fichas sin
+    caché conservan su fila; las de anunciantes excluidos se descartan.
+    """
+    ids_today_file, _, _, data_today_file, _ = paths_for()
+    ids_hoy = safe_read_ids_csv(ids_today_file)
+    excluidas = set()
+
+    def _cached(_id):
+        r = parsear_desde_cache(_id)
+        if r is None:
+            return None
+        if r[0].empty:
+            excluidas.add(str(_id))
+            return None
+        return r[0]
+
+    df_today, n = rebuild_today_from_cache(ids_hoy, _cached, safe_read_df_csv(data_today_file))
+    if excluidas and not df_today.empty:
+        df_today = df_today[~df_today["id_inmueble"].astype(str).isin(excluidas)]
+    safe_write_df_csv(data_today_file, df_today)
+    FICHA_CACHE.report("idealista")
+    print(f"[OFFLINE] {n}/{len(ids_hoy)} fichas reparseadas desde caché -> {data_today_file}")
+
+
 if __name__ == "__main__":
-    main(busqueda)
+    if FICHA_CACHE.offline:
+        reparse_from_cache()
+    else:
+        main(busqueda)
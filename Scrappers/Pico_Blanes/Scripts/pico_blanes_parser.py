@@ -0,0 +1,199 @@
+"""
+Parseo puro de fichas de Picó Blanes: HTML -> dict, sin navegador, red ni
+pandas. Lo usan pico_blanes_scrapper.py y los benchmarks de benchmarks/.
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+
+# ---------- Utilidades de texto y limpieza ---------- #
+def _clean_num(value: str) -> Optional[float]:
+    """
+    Devuelve un float a partir de una cadena numérica con separadores o símbolos.
+    """
+    if not value:
+        return None
+    value = re.sub(r"[^\d,\.]", "", value)
+    value = value.replace(".", "").replace(",", ".")
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _get_li_value(li_elements: List, label: str) -> Optional[str]:
+    """
+    Busca el <li> cuyo <strong> empieza por `label` y devuelve su valor limpio.
+    """
+    for li in li_elements:
+        strong = li.find("strong")
+        if strong and label.lower() in strong.text.lower():
+            return li.get_text(" ", strip=True).replace(strong.text, "").strip()
+    return None
+
+
+_COORD_PATTERNS = [
+    re.compile(
+        r"data-lat\s*=\s*[\"']?(-?\d+\.\d+)[\"']?[^>]*?data-lng\s*=\s*[\"']?(-?\d+\.\d+)",
+        re.I | re.S,
+    ),
+    re.compile(r"LatLng\(\s*(-?\d+\.\d+)\s*,\s*(-?\d+\.\d+)\s*\)"),
+    re.compile(
+        r"[\"']?lat(?:itude)?[\"']?\s*[:=]\s*[\"']?(-?\d+\.\d+)[\"']?\s*[,;]\s*(?:(?:var|let|const)\s+)?"
+        r"[\"']?(?:lng|lon|longitude)[\"']?\s*[:=]\s*[\"']?(-?\d+\.\d+)",
+        re.I,
+    ),
+]
+
+
+def _coordinates_from_html(soup, html: str) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Coordenadas sin navegador: atributos data-lat/data-lng de #mapa y, si no
+    están, las llamadas de inicialización del mapa en el JS de la página.
+    """
+    mapa = soup.find(id="mapa")
+    if mapa is not None and mapa.get("data-lat") and mapa.get("data-lng"):
+        try:
+            return float(mapa["data-lat"]), float(mapa["data-lng"])
+        except ValueError:
+            pass
+    for pat in _COORD_PATTERNS:
+        m = pat.search(html or "")
+        if m:
+            try:
+                lat, lon = float(m.group(1)), float(m.group(2))
+            except ValueError:
+                continue
+            if -90 <= lat <= 90 and -180 <= lon <= 180:
+                return lat, lon
+    return None, None
+
+
+# ---------- Extracción principal de una propiedad ---------- #
+def parse_ficha_html(html: str, url: str) -> Optional[Dict[str, str]]:
+    """
+    Extrae los metadatos de una ficha a partir de su HTML (del navegador o de
+    una petición HTTP). Devuelve None si no es una ficha (sin article#detalle).
+    Si las coordenadas no se encuentran, ignora lat/lon en la salida.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    if soup.select_one("article#detalle") is None:
+        return None
+
+    header = soup.select_one("div.headerTitulo")
+    reference = header.select_one("p span").get_text(strip=True) if header else None
+    price_text = (
+        header.select_one("p.precio").get_text(strip=True).split(":")[-1]
+        if header
+        else None
+    )
+
+    description_block = soup.select_one("#descripcionFicha p")
+    description = (
+        description_block.get_text(" ", strip=True) if description_block else None
+    )
+
+    details_ul = soup.select_one("div.detallesFicha ul")
+    li_elements = details_ul.find_all("li") if details_ul else []
+
+    province = _get_li_value(li_elements, "Provincia")
+    city = _get_li_value(li_elements, "Población")
+    zone = _get_li_value(li_elements, "Zona")
+    property_type = _get_li_value(li_elements, "Tipo de propiedad")
+    operation_type = _get_li_value(li_elements, "Tipo de operación")
+    rooms = _get_li_value(li_elements, "Habitaciones")
+    baths = _get_li_value(li_elements, "Baños")
+    sup_usable = _get_li_value(li_elements, "Sup. Útil")
+    sup_built = _get_li_value(li_elements, "Sup. Construida")
+
+    # Conversión numérica
+    price_eur = _clean_num(price_text)
+    rooms_num = _clean_num(rooms)
+    baths_num = _clean_num(baths)
+    sup_usable_m2 = _clean_num(sup_usable)
+    sup_built_m2 = _clean_num(sup_built)
+
+    data = {
+        "reference": reference,
+        "precio_eur": price_eur,
+        "provincia": province,
+        "ciudad": city,
+        "zona": zone,
+        "tipo_de_propiedad": property_type,
+        "tipo_de_operacion": operation_type,
+        "habitaciones": rooms_num,
+        "baños": baths_num,
+        "superficie_usable_m2": sup_usable_m2,
+        "superficie_construida_m2": sup_built_m2,
+        "descripcion": description,
+        "url": url,
+        "fecha_inclusion": datetime.today().strftime("%Y-%m-%d"),
+    }
+
+    # Sólo añadimos coordenadas si existen
+    lat, lon = _coordinates_from_html(soup, html)
+    if lat is not None and lon is not None:
+        data["lat"] = lat
+        data["lon"] = lon
+
+    return data
+
+
+def fila_desde_ficha(data: Dict[str, str]) -> Dict:
+    """
+    Mapea el dict de parse_ficha_html/process_property al esquema de salida.
+    """
+    url = data.get("url")
+
+    # Construimos campos compuestos
+    localizacion = ", ".join(
+        [
+            p
+            for p in [data.get("zona"), data.get("ciudad"), data.get("provincia")]
+            if p
+        ]
+    )
+    metros_cuadrados = (
+        data.get("superficie_construida_m2")
+        if data.get("superficie_construida_m2") is not None
+        else data.get("superficie_usable_m2")
+    )
+
+    # Mapeo al esquema original
+    casas = {
+        "id_inmueble": url,
+        "link_inmueble": url,
+        "titulo": (
+            data.get("reference")
+            or (
+                f"{data.get('tipo_de_propiedad') or ''} en {data.get('zona') or data.get('ciudad') or ''}".strip()
+            )
+        ),
+        "localizacion": localizacion,
+        "precio": data.get("precio_eur"),
+        "metros_cuadrados": metros_cuadrados,
+        "habitaciones": data.get("habitaciones"),
+        "baños": data.get("baños"),
+        "zona": data.get("zona"),
+        "tipo_de_operacion": data.get("tipo_de_operacion"),
+        "fecha_inclusion": data.get("fecha_inclusion")
+        or datetime.today().strftime("%Y-%m-%d"),
+    }
+
+    # Si hay coordenadas, las conservamos
+    if "lat" in data and data["lat"] is not None:
+        casas["lat"] = data["lat"]
+    if "lon" in data and data["lon"] is not None:
+        casas["lon"] = data["lon"]
+
+    return casas
+
+
+def parse_ficha(html: str, url: str) -> Dict:
+    """HTML de una ficha -> dict de la fila de salida ({} si no es una ficha)."""
+    data = parse_ficha_html(html, url)
+    return fila_desde_ficha(data) if data else {}
@@ -1,13 +1,11 @@
 import os
 import json
-import re
 import time
 import pandas as pd
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
-from bs4 import BeautifulSoup as bs
 from typing import Optional, Tuple, Dict, List
 from datetime import datetime
 import os
@@ -54,6 +52,28 @@ PROJECT_ROOT = (
 )  # .../Scrappers/Idealista/Scripts -> sube dos niveles
 BASE_DIR = str((PROJECT_ROOT / "Pico_Blanes" / "Data").resolve())
 
+# Raíz del repo (para importar utils/ al lanzar el script directamente)
+REPO_ROOT = SCRIPT_DIR.parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pico_blanes_parser import fila_desde_ficha, parse_ficha_html
+from utils import http_session, net_blocking
+from utils.journal import PARSE_RESUME, ParseJournal
+from utils.page_cache import PageCache
+from utils.upsert import keyed_upsert, rebuild_today_from_cache
+from utils.rate_limit import HostRateLimiter
+
+# Fichas por HTTP: hilos concurrentes y separación mínima entre peticiones al host
+PICO_HTTP = (os.getenv("PICO_HTTP") or "true").lower() in ("1", "true", "yes")
+PICO_HTTP_WORKERS = int(os.getenv("PICO_HTTP_WORKERS") or "4")
+PICO_MIN_INTERVAL = float(os.getenv("PICO_MIN_INTERVAL") or "0.5")
+# Fichas HTTP sin coordenadas en #mapa: pasan a Selenium para abrir el mapa
+SIN_COORDS_HTTP: List[str] = []
+# HTML de fichas en caché comprimida; con PAGE_CACHE_OFFLINE=true se reparsea
+# el día desde ella sin navegador ni red
+FICHA_CACHE = PageCache.for_portal(REPO_ROOT, "pico_blanes")
+
 
 def clear_browser_state(browser, *, clear_cache=True, clear_cookies=True):
     """
@@ -161,32 +181,6 @@ def safe_write_df_csv(ruta, df):
         pass
 
 
-# ---------- Utilidades de texto y limpieza ---------- #
-def _clean_num(value: str) -> Optional[float]:
-    """
-    Devuelve un float a partir de una cadena numérica con separadores o símbolos.
-    """
-    if not value:
-        return None
-    value = re.sub(r"[^\d,\.]", "", value)
-    value = value.replace(".", "").replace(",", ".")
-    try:
-        return float(value)
-    except ValueError:
-        return None
-
-
-def _get_li_value(li_elements: List, label: str) -> Optional[str]:
-    """
-    Busca el <li> cuyo <strong> empieza por `label` y devuelve su valor limpio.
-    """
-    for li in li_elements:
-        strong = li.find("strong")
-        if strong and label.lower() in strong.text.lower():
-            return li.get_text(" ", strip=True).replace(strong.text, "").strip()
-    return None
-
-
 # ---------- Lectura de enlaces ---------- #
 def read_links_from_csv(csv_path: str) -> list:
     """
@@ -251,11 +245,10 @@ def _get_coordinates(driver) -> Tuple[Optional[float], Optional[float]]:
     return None, None
 
 
-# ---------- Extracción principal de una propiedad ---------- #
 def process_property(driver, url: str) -> Optional[Dict[str, str]]:
     """
-    Extrae metadatos de una página de propiedad.
-    Si las coordenadas no se obtienen, ignora lat/lon en la salida.
+    Extrae metadatos de una página de propiedad con Selenium (fallback del
+    camino HTTP). Si las coordenadas no están en el HTML, abre la pestaña Mapa.
     """
     try:
         driver.get(url)
@@ -267,144 +260,94 @@ def process_property(driver, url: str) -> Optional[Dict[str, str]]:
             EC.presence_of_element_located((By.CSS_SELECTOR, "article#detalle"))
         )
 
-        # ---------- Coordenadas (pueden ser None, None) ----------
-        lat, lon = _get_coordinates(driver)
-
-        # ---------- Parseo con BeautifulSoup ----------
-        soup = BeautifulSoup(driver.page_source, "html.parser")
+        data = parse_ficha_html(driver.page_source, url)
+        if data is None:
+            return None
 
-        header = soup.select_one("div.headerTitulo")
-        reference = header.select_one("p span").get_text(strip=True) if header else None
-        price_text = (
-            header.select_one("p.precio").get_text(strip=True).split(":")[-1]
-            if header
-            else None
-        )
+        # ---------- Coordenadas (pueden ser None, None) ----------
+        if "lat" not in data:
+            lat, lon = _get_coordinates(driver)
+            if lat is not None and lon is not None:
+                data["lat"] = lat
+                data["lon"] = lon
+
+        # Tras abrir el mapa el DOM ya lleva data-lat/data-lng en #mapa
+        FICHA_CACHE.put(url, driver.page_source)
+        return data
 
-        description_block = soup.select_one("#descripcionFicha p")
-        description = (
-            description_block.get_text(" ", strip=True) if description_block else None
-        )
+    except Exception as exc:
+        print(json.dumps({"message": f"Property scraping error: {exc}"}))
+        return None
 
-        details_ul = soup.select_one("div.detallesFicha ul")
-        li_elements = details_ul.find_all("li") if details_ul else []
-
-        province = _get_li_value(li_elements, "Provincia")
-        city = _get_li_value(li_elements, "Población")
-        zone = _get_li_value(li_elements, "Zona")
-        property_type = _get_li_value(li_elements, "Tipo de propiedad")
-        operation_type = _get_li_value(li_elements, "Tipo de operación")
-        rooms = _get_li_value(li_elements, "Habitaciones")
-        baths = _get_li_value(li_elements, "Baños")
-        sup_usable = _get_li_value(li_elements, "Sup. Útil")
-        sup_built = _get_li_value(li_elements, "Sup. Construida")
-
-        # Conversión numérica
-        price_eur = _clean_num(price_text)
-        rooms_num = _clean_num(rooms)
-        baths_num = _clean_num(baths)
-        sup_usable_m2 = _clean_num(sup_usable)
-        sup_built_m2 = _clean_num(sup_built)
-
-        data = {
-            "reference": reference,
-            "precio_eur": price_eur,
-            "provincia": province,
-            "ciudad": city,
-            "zona": zone,
-            "tipo_de_propiedad": property_type,
-            "tipo_de_operacion": operation_type,
-            "habitaciones": rooms_num,
-            "baños": baths_num,
-            "superficie_usable_m2": sup_usable_m2,
-            "superficie_construida_m2": sup_built_m2,
-            "descripcion": description,
-            "url": url,
-            "fecha_inclusion": datetime.today().strftime("%Y-%m-%d"),
-        }
 
-        # Sólo añadimos coordenadas si existen
-        if lat is not None and lon is not None:
-            data["lat"] = lat
-            data["lon"] = lon
+def ficha_a_fila(data: Dict[str, str]):
+    """
+    Mapea el dict de parse_ficha_html/process_property al esquema de salida
+    (pico_blanes_parser.fila_desde_ficha). Devuelve (df_row, dict_row).
+    """
+    casas = fila_desde_ficha(data)
+    return pd.DataFrame([casas]), casas
 
-        return data
 
-    except Exception as exc:
-        print(json.dumps({"message": f"Property scraping error: {exc}"}))
+def parsear_desde_cache(url):
+    """(df_row, dict_row) de la ficha cacheada de `url` o None si no hay entrada vigente."""
+    html = FICHA_CACHE.get(url)
+    if html is None:
         return None
+    data = parse_ficha_html(html, url)
+    return ficha_a_fila(data) if data else None
 
 
 def parsear_inmueble(id_inmueble_url, browser, first_run):
     """
-    Toma la URL canónica y usa process_property(browser, url) para extraer datos.
+    Toma la URL canónica y usa process_property(browser, url) para extraer datos
+    (en offline, solo desde la caché de HTML).
     Devuelve (df_row, dict_row) con el mismo esquema que antes.
     """
-    import pandas as pd
-    from datetime import datetime
-
     try:
         url = str(id_inmueble_url).strip()
+        if FICHA_CACHE.offline:
+            cached = parsear_desde_cache(url)
+            return cached if cached is not None else (pd.DataFrame(), {})
         data = process_property(browser, url)  # <- fuente única de verdad
 
         if not data:
             return pd.DataFrame(), {}
 
-        # Construimos campos compuestos
-        localizacion = ", ".join(
-            [
-                p
-                for p in [data.get("zona"), data.get("ciudad"), data.get("provincia")]
-                if p
-            ]
-        )
-        html = browser.page_source
-        soup = bs(html, "lxml")
-        details_ul = soup.select_one("div.detallesFicha ul")
-        li_elements = details_ul.find_all("li") if details_ul else []
-
-        operation_type = _get_li_value(li_elements, "Tipo de operación")
-        metros_cuadrados = (
-            data.get("superficie_construida_m2")
-            if data.get("superficie_construida_m2") is not None
-            else data.get("superficie_usable_m2")
-        )
+        return ficha_a_fila(data)
 
-        # Mapeo al esquema original
-        casas = {
-            "id_inmueble": url,
-            "link_inmueble": url,
-            "titulo": (
-                data.get("reference")
-                or (
-                    f"{data.get('tipo_de_propiedad') or ''} en {data.get('zona') or data.get('ciudad') or ''}".strip()
-                )
-            ),
-            "localizacion": localizacion,
-            "precio": data.get("precio_eur"),
-            "metros_cuadrados": metros_cuadrados,
-            "habitaciones": data.get("habitaciones"),
-            "baños": data.get("baños"),
-            "zona": data.get("zona"),
-            "tipo_de_operacion": operation_type,
-            "fecha_inclusion": data.get("fecha_inclusion")
-            or datetime.today().strftime("%Y-%m-%d"),
-        }
+    except Exception:
+        # Mantenemos un fallback silencioso como antes
+        return pd.DataFrame(), {}
 
-        # Si process_property añadió coordenadas, las conservamos
-        if "lat" in data and data["lat"] is not None:
-            casas["lat"] = data["lat"]
-        if "lon" in data and data["lon"] is not None:
-            casas["lon"] = data["lon"]
 
-        df_casas = pd.DataFrame([casas])
-        return df_casas, casas
+# Marcadores mínimos de una ficha completa servida por HTTP
+FICHA_MARKERS = ("detallesFicha", "headerTitulo")
 
-    except Exception:
-        # Mantenemos un fallback silencioso como antes
-        import pandas as pd
 
-        return pd.DataFrame(), {}
+def parsear_inmueble_http(id_inmueble_url, session, limiter):
+    """
+    Ficha sin navegador: GET con `session` respetando el `limiter` por host.
+    Devuelve df_row o None si la respuesta parece bloqueada o incompleta, o
+    si le faltan las coordenadas (la ficha pasa entonces al fallback con
+    Selenium, que abre la pestaña Mapa).
+    """
+    url = str(id_inmueble_url).strip()
+    limiter.wait(url)
+    status, html = http_session.fetch_html(session, url, timeout=15)
+    if status != 200 or http_session.looks_blocked(status, html):
+        return None
+    if not http_session.looks_complete(html, FICHA_MARKERS):
+        return None
+    data = parse_ficha_html(html, url)
+    if not data:
+        return None
+    if "lat" not in data:
+        SIN_COORDS_HTTP.append(url)
+        return None
+    FICHA_CACHE.put(url, html)
+    df_i, _ = ficha_a_fila(data)
+    return df_i
 
 
 def build_browser():
@@ -412,6 +355,7 @@ def build_browser():
     Crea un Chrome endurecido para scraping:
       - pageLoadStrategy 'eager' para cortar carga de recursos tardíos
       - Imágenes y fuentes desactivadas
+      - Anuncios, analítica, vídeo y mapas bloqueados por CDP (utils.net_blocking)
       - Memoria compartida y GPU desactivadas
       - Timeouts base configurados
     """
@@ -436,8 +380,10 @@ def build_browser():
         "profile.managed_default_content_settings.stylesheets": 1,
     }
     opts.add_experimental_option("prefs", prefs)
+    net_blocking.configure_options(opts)
 
     browser = uc.Chrome(options=opts)
+    net_blocking.apply_blocking(browser, "pico_blanes")
     browser.set_page_load_timeout(25)
     browser.set_script_timeout(20)
     return browser
@@ -869,25 +815,72 @@ def main():
     ids_nuevos = [str(i) for i in ids_hoy if str(i) not in existing_ids_in_data]
     safe_write_ids_csv(ids_new_file, ids_nuevos)
 
-    # Nuevo navegador para parseo
-    browser = build_browser()
+    # Diario de fichas parseadas: si una ejecución anterior de hoy cayó a
+    # medias, lo ya parseado se recupera en lugar de volver a descargarlo
+    journal = ParseJournal.for_today(BASE_DIR)
+    if PARSE_RESUME:
+        previos = journal.load()
+    else:
+        journal.reset()
+        previos = {}
+    parsed_prev = {
+        u: pd.DataFrame([previos[u]]) for u in ids_nuevos if previos.get(u) is not None
+    }
+    ids_pendientes = [u for u in ids_nuevos if u not in previos]
+    if previos:
+        print(
+            f"[RESUME] {len(parsed_prev)} fichas recuperadas del diario; "
+            f"quedan {len(ids_pendientes)}"
+        )
+
+    # Fichas por HTTP con un pool acotado y límite de ritmo por host; Selenium
+    # solo para las que fallen
+    parsed_http = {}
+    if PICO_HTTP and ids_pendientes:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        limiter = HostRateLimiter(PICO_MIN_INTERVAL)
+
+        def _http_task(u):
+            df_i = parsear_inmueble_http(u, session, limiter)
+            if df_i is not None:
+                journal.append_df(u, df_i)
+            return df_i
+
+        resultados = http_session.http_first_map(
+            ids_pendientes, _http_task, max_workers=PICO_HTTP_WORKERS
+        )
+        parsed_http = {
+            u: r for u, r in zip(ids_pendientes, resultados) if r is not None
+        }
+        print(
+            f"[HTTP] {len(parsed_http)}/{len(ids_pendientes)} fichas por HTTP; "
+            f"{len(ids_pendientes) - len(parsed_http)} pasan a Selenium "
+            f"({len(SIN_COORDS_HTTP)} por no traer coordenadas)"
+        )
+    ids_selenium = [u for u in ids_pendientes if u not in parsed_http]
 
-    # Parsear solo nuevos con reintentos y reciclado del driver
+    # Parsear el resto con reintentos y reciclado del driver
     first_run = True
-    df_new_list = []
-    print(f"Parseando {len(ids_nuevos)} nuevos inmuebles Fotocasa...")
+    parsed_selenium = {}
+    print(f"Parseando {len(ids_selenium)} nuevos inmuebles Picó Blanes con Selenium...")
 
     RECYCLE_EVERY = 100  # recicla el driver cada N fichas
     CLEAR_STATE_EVERY = 5  # limpia cache/cookies cada N fichas
     MAX_RETRIES_PER_URL = 2  # reintentos por ficha
 
-    for idx, url in enumerate(ids_nuevos, start=1):
+    # Navegador solo si hay fichas que lo necesiten
+    browser = build_browser() if ids_selenium else None
+
+    for idx, url in enumerate(ids_selenium, start=1):
         # Limpieza periódica de estado para frenar el crecimiento de memoria
         if idx % CLEAR_STATE_EVERY == 0:
+            net_blocking.collect(browser)
             clear_browser_state(browser, clear_cache=True, clear_cookies=True)
 
         # Reciclado periódico del driver para cortar fugas
         if idx % RECYCLE_EVERY == 0:
+            net_blocking.collect(browser)
             try:
                 browser.quit()
             except Exception:
@@ -900,11 +893,13 @@ def main():
             try:
                 df_i, _ = parsear_inmueble(url, browser, first_run)
                 if not df_i.empty:
-                    df_new_list.append(df_i)
+                    parsed_selenium[url] = df_i
+                    journal.append_df(url, df_i)
                     success = True
                     break
             except WebDriverException:
                 # Driver en estado malo: reciclar y reintentar
+                net_blocking.collect(browser)
                 try:
                     browser.quit()
                 except Exception:
@@ -923,10 +918,24 @@ def main():
             print(f"[WARN] No se pudo parsear: {url}")
 
     # Cierre del navegador
-    try:
-        browser.quit()
-    except Exception:
-        pass
+    if browser is not None:
+        net_blocking.collect(browser)
+        try:
+            browser.quit()
+        except Exception:
+            pass
+        net_blocking.run_stats.report("pico_blanes")
+
+    # Resultados en el orden original de ids_nuevos
+    df_new_list = []
+    for url in ids_nuevos:
+        df_i = parsed_prev.get(url)
+        if df_i is None:
+            df_i = parsed_http.get(url)
+        if df_i is None:
+            df_i = parsed_selenium.get(url)
+        if df_i is not None:
+            df_new_list.append(df_i)
 
     # Consolidación y escritura segura
     df_new = (
@@ -967,22 +976,40 @@ def main():
     safe_write_df_csv(data_new_file, df_new)
 
     # today consistente
-    if not df_today_prev.empty:
-        df_today_kept = df_today_prev[
-            df_today_prev["id_inmueble"].astype(str).isin(set(map(str, ids_hoy)))
-        ].copy()
-    else:
-        df_today_kept = pd.DataFrame(columns=df_new.columns)
-
-    df_today = pd.concat([df_today_kept, df_new], ignore_index=True)
-    if not df_today.empty:
-        df_today = df_today.drop_duplicates(subset=["id_inmueble"], keep="last")
+    # (lo previo que sigue en ids_hoy + lo nuevo; a igual id gana lo nuevo)
+    df_today = keyed_upsert(df_today_prev, df_new, key="id_inmueble", keep_keys=ids_hoy)
 
     safe_write_df_csv(data_today_file, df_today)
+    # Ya compactado en los CSV: el diario sobra
+    journal.discard()
+    FICHA_CACHE.report("pico_blanes")
+    FICHA_CACHE.evict()
     print(
         f"Escritos: {data_new_file} ({len(df_new)} filas) y {data_today_file} ({len(df_today)} filas)."
     )
 
 
+def reparse_from_cache():
+    """
+    Modo offline: vuelve a parsear las fichas de ids_today desde la caché de
+    HTML (sin navegador ni red) y reescribe inmuebles_today. Las fichas sin
+    caché conservan su fila.
+    """
+    ids_today_file, _, _, data_today_file, _ = paths_for()
+    ids_hoy = safe_read_ids_csv(ids_today_file)
+
+    def _cached(u):
+        r = parsear_desde_cache(str(u).strip())
+        return None if r is None else r[0]
+
+    df_today, n = rebuild_today_from_cache(ids_hoy, _cached, safe_read_df_csv(data_today_file))
+    safe_write_df_csv(data_today_file, df_today)
+    FICHA_CACHE.report("pico_blanes")
+    print(f"[OFFLINE] {n}/{len(ids_hoy)} fichas reparseadas desde caché -> {data_today_file}")
+
+
 if __name__ == "__main__":
-    main()
+    if FICHA_CACHE.offline:
+        reparse_from_cache()
+    else:
+        main()
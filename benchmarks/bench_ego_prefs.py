@@ -0,0 +1,118 @@
+"""
+Benchmark de la extracción de preferencias de las fichas de contacto de Ego.
+
+    python benchmarks/bench_ego_prefs.py
+    python benchmarks/bench_ego_prefs.py --html-dir /tmp/fichas_ego --workers 16
+
+Compara el camino completo (árbol lxml de toda la página) con el extractor
+dirigido de ego_parser, ambos en un pool de hilos como el de main_contacts,
+y el completo también en un pool de procesos. Informa páginas/s y cuántas
+páginas dan el mismo fragmento por los dos caminos.
+
+Corpus: fixtures en benchmarks/fixtures/ego/ (mismo formato que el resto),
+ficheros .html de --html-dir o, si no hay ninguno, páginas sintéticas.
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from common import REPO_ROOT, load_fixtures
+
+_EGO_SCRIPTS = REPO_ROOT / "Scrappers" / "Ego" / "Scripts"
+if str(_EGO_SCRIPTS) not in sys.path:
+    sys.path.insert(0, str(_EGO_SCRIPTS))
+
+from ego_parser import extract_preference_html, extract_preference_html_full  # noqa: E402
+
+
+def _synthetic_pages(n: int) -> list:
+    """Páginas del tamaño de una ficha real (~300 KB) con el bloque a mitad."""
+    relleno = "".join(
+        f'<div class="detailRow"><span class="lbl">Campo {i}</span>'
+        f'<span class="val">Valor {i} <a href="/x/{i}">enlace</a></span></div>'
+        for i in range(1500)
+    )
+    pages = []
+    for k in range(n):
+        pref = (
+            f'<div class="contactCard contactCardPreference" data-id="{k}">'
+            f"<span>Piso</span> <span>Alcoy</span> <span>hasta {100 + k}.000 €</span>"
+            "<div><span>3 hab.</span></div></div>"
+        )
+        pages.append(
+            f"<html><head><title>Contacto {k}</title></head><body>"
+            f"{relleno}{pref}{relleno}</body></html>"
+        )
+    return pages
+
+
+def load_pages(html_dir=None, synthetic=40) -> tuple:
+    if html_dir:
+        pages = [
+            p.read_text(encoding="utf-8", errors="replace")
+            for p in sorted(Path(html_dir).glob("*.html"))
+        ]
+        if pages:
+            return pages, f"{html_dir}"
+    pages = [html for _, html in load_fixtures("ego")]
+    if pages:
+        return pages, "fixtures/ego"
+    return _synthetic_pages(synthetic), "sintéticas"
+
+
+def _run(executor_cls, workers: int, fn, pages: list, repeat: int) -> float:
+    """Páginas/s de `fn` sobre `pages` repartidas en el pool indicado."""
+    with executor_cls(max_workers=workers) as ex:
+        list(ex.map(fn, pages[:workers]))  # calentamiento (arranque del pool)
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            list(ex.map(fn, pages, chunksize=1))
+        total = time.perf_counter() - t0
+    return len(pages) * repeat / total
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--html-dir", help="carpeta con fichas de contacto guardadas (.html)")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", help="guardar los resultados en este fichero")
+    args = ap.parse_args()
+
+    pages, origen = load_pages(args.html_dir)
+    workers = max(1, args.workers)
+    repeat = max(1, args.repeat)
+    mb = sum(len(p.encode("utf-8")) for p in pages) / 1_048_576
+    iguales = sum(
+        1 for p in pages if extract_preference_html(p) == extract_preference_html_full(p)
+    )
+
+    resultados = {
+        "origen": origen,
+        "paginas": len(pages),
+        "mb": round(mb, 2),
+        "iguales_pct": round(iguales / len(pages) * 100, 1),
+        "workers": workers,
+        "completo_hilos": _run(ThreadPoolExecutor, workers, extract_preference_html_full, pages, repeat),
+        "completo_procesos": _run(ProcessPoolExecutor, workers, extract_preference_html_full, pages, repeat),
+        "dirigido_hilos": _run(ThreadPoolExecutor, workers, extract_preference_html, pages, repeat),
+    }
+    print(
+        f"[BENCH] ego prefs: {len(pages)} páginas {origen} ({mb:.1f} MB), "
+        f"{resultados['iguales_pct']}% idénticas entre caminos, workers={workers}"
+    )
+    for clave in ("completo_hilos", "completo_procesos", "dirigido_hilos"):
+        resultados[clave] = round(resultados[clave], 1)
+        print(f"[BENCH]   {clave}: {resultados[clave]} páginas/s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
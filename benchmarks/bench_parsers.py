@@ -0,0 +1,95 @@
+"""
+Benchmark de los parsers puros de fichas (HTML -> dict) sobre las fixtures.
+
+    python benchmarks/bench_parsers.py
+    python benchmarks/bench_parsers.py --portal fotocasa --repeat 5 --json out.json
+
+Por portal informa fichas/s, MB/s, latencia p50/p95, pico de memoria
+(tracemalloc, en una pasada aparte para no distorsionar los tiempos) y la
+proporción de fichas que producen fila.
+"""
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+from common import PORTALS, load_fixtures, load_parser
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def bench_portal(portal: str, repeat: int = 3) -> dict:
+    fixtures = load_fixtures(portal)
+    if not fixtures:
+        return {"portal": portal, "fichas": 0}
+    parse = load_parser(portal).parse_ficha
+    total_bytes = sum(len(html.encode("utf-8")) for _, html in fixtures)
+
+    # Calentamiento (regex compiladas, imports perezosos de bs4/lxml)
+    ok = sum(1 for key, html in fixtures if parse(html, key))
+
+    tiempos = []
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for key, html in fixtures:
+            t = time.perf_counter()
+            parse(html, key)
+            tiempos.append(time.perf_counter() - t)
+    total = time.perf_counter() - t0
+
+    tracemalloc.start()
+    for key, html in fixtures:
+        parse(html, key)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n = len(fixtures) * repeat
+    return {
+        "portal": portal,
+        "fichas": len(fixtures),
+        "con_fila_pct": round(ok / len(fixtures) * 100, 1),
+        "fichas_s": round(n / total, 1),
+        "mb_s": round(total_bytes * repeat / total / 1_048_576, 2),
+        "ms_media": round(statistics.mean(tiempos) * 1000, 2),
+        "ms_p50": round(_percentile(tiempos, 50) * 1000, 2),
+        "ms_p95": round(_percentile(tiempos, 95) * 1000, 2),
+        "pico_mb": round(peak / 1_048_576, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--portal", choices=sorted(PORTALS), action="append")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", help="guardar los resultados en este fichero")
+    args = ap.parse_args()
+
+    resultados = []
+    for portal in args.portal or sorted(PORTALS):
+        r = bench_portal(portal, max(1, args.repeat))
+        resultados.append(r)
+        if not r["fichas"]:
+            print(f"[BENCH] {portal}: sin fixtures (python benchmarks/seed_fixtures.py)")
+            continue
+        print(
+            f"[BENCH] {portal}: {r['fichas']} fichas ({r['con_fila_pct']}% con fila) "
+            f"{r['fichas_s']} fichas/s {r['mb_s']} MB/s "
+            f"media={r['ms_media']}ms p50={r['ms_p50']}ms p95={r['ms_p95']}ms "
+            f"pico={r['pico_mb']} MB"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
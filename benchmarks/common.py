@@ -0,0 +1,65 @@
+"""
+Utilidades compartidas por los benchmarks: portales, carga de los parsers
+puros (<portal>_parser.py junto a cada scraper) y lectura de fixtures.
+
+Fixtures: benchmarks/fixtures/<portal>/<hash>.html.gz más un index.json
+{fichero: {"url": ..., "key": ...}}; `key` es el segundo argumento de
+parse_ficha (URL canónica o id de Idealista).
+"""
+
+import gzip
+import importlib
+import json
+import re
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+FIXTURES_DIR = BENCH_DIR / "fixtures"
+
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+_IDEALISTA_ID = re.compile(r"/inmueble/(\d+)")
+
+# portal -> (carpeta del scraper, módulo del parser, url -> clave de parse_ficha)
+PORTALS = {
+    "fotocasa": ("Fotocasa", "fotocasa_parser", lambda url: url),
+    "idealista": (
+        "Idealista",
+        "idealista_parser",
+        lambda url: (_IDEALISTA_ID.search(url) or [None, url])[1],
+    ),
+    "pico_blanes": ("Pico_Blanes", "pico_blanes_parser", lambda url: url),
+}
+
+
+def load_parser(portal: str):
+    """Importa el módulo <portal>_parser desde Scrappers/<Portal>/Scripts."""
+    folder, module, _ = PORTALS[portal]
+    scripts = REPO_ROOT / "Scrappers" / folder / "Scripts"
+    if str(scripts) not in sys.path:
+        sys.path.insert(0, str(scripts))
+    return importlib.import_module(module)
+
+
+def key_for(portal: str, url: str) -> str:
+    return PORTALS[portal][2](url)
+
+
+def load_fixtures(portal: str) -> list:
+    """Lista de (key, html) de las fixtures del portal (vacía si no hay)."""
+    folder = FIXTURES_DIR / portal
+    index_path = folder / "index.json"
+    if not index_path.exists():
+        return []
+    index = json.loads(index_path.read_text(encoding="utf-8"))
+    out = []
+    for name, meta in sorted(index.items()):
+        path = folder / name
+        if not path.exists():
+            continue
+        html = gzip.decompress(path.read_bytes()).decode("utf-8", errors="replace")
+        out.append((meta.get("key") or meta.get("url"), html))
+    return out
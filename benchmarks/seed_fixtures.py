@@ -0,0 +1,54 @@
+"""
+Copia fichas de la caché de HTML (utils.page_cache) a benchmarks/fixtures/
+para tener un corpus estable con el que medir los parsers.
+
+    python benchmarks/seed_fixtures.py                 # todos los portales
+    python benchmarks/seed_fixtures.py --portal idealista --max 100
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+
+from common import FIXTURES_DIR, PORTALS, REPO_ROOT, key_for
+
+from utils.page_cache import PageCache
+
+
+def seed(portal: str, max_pages: int) -> int:
+    folder = FIXTURES_DIR / portal
+    folder.mkdir(parents=True, exist_ok=True)
+    index_path = folder / "index.json"
+    index = json.loads(index_path.read_text(encoding="utf-8")) if index_path.exists() else {}
+
+    cache = PageCache.for_portal(REPO_ROOT, portal, enabled=True)
+    added = 0
+    for url, html in cache.iter_entries():
+        if len(index) >= max_pages:
+            break
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16] + ".html.gz"
+        if name in index:
+            continue
+        (folder / name).write_bytes(gzip.compress(html.encode("utf-8"), compresslevel=9))
+        index[name] = {"url": url, "key": key_for(portal, url)}
+        added += 1
+
+    index_path.write_text(
+        json.dumps(index, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8"
+    )
+    return added
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--portal", choices=sorted(PORTALS), action="append")
+    ap.add_argument("--max", type=int, default=200, help="fixtures máximas por portal")
+    args = ap.parse_args()
+    for portal in args.portal or sorted(PORTALS):
+        n = seed(portal, args.max)
+        print(f"[FIXTURES] {portal}: +{n} fichas")
+
+
+if __name__ == "__main__":
+    main()
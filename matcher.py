@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import ast
 import csv
 import os
 import sys
@@ -11,6 +10,8 @@ import unicodedata
 import pandas as pd
 from datetime import datetime
 
+from utils.literal_parser import parse_literal
+
 # ----------------------------
 # Utilidades básicas
 # ----------------------------
@@ -119,10 +120,7 @@ def safe_literal_eval(value):
     s = to_str(value)
     if not s:
         return None
-    try:
-        return ast.literal_eval(s)
-    except Exception:
-        return None
+    return parse_literal(s)
 
 
 def iter_string_like(value):
@@ -481,6 +479,27 @@ def collect_preference_tokens(value):
 # ----------------------------
 
 
+def numeric_column(series, conv):
+    """
+    Columnas ya numéricas (Parquet tipado) se convierten en bloque a float64;
+    el resto (CSV con "A consultar"/"Desconocido") pasa por `conv` fila a fila.
+    """
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return pd.Series(
+            series.to_numpy(dtype="float64", na_value=float("nan")),
+            index=series.index,
+        )
+    return series.apply(conv)
+
+
+def text_column(series):
+    """normalize_text aplicado una vez por categoría si la columna es categórica."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        mapping = {c: normalize_text(c) for c in series.cat.categories}
+        return series.astype(object).map(mapping).fillna("")
+    return series.apply(normalize_text)
+
+
 def normalize_inmuebles(df):
     rename_map = {
         "habitaciones": "habitaciones",
@@ -513,16 +532,16 @@ def normalize_inmuebles(df):
         if col not in df.columns:
             df[col] = default
 
-    df["habitaciones"] = df["habitaciones"].apply(to_int)
-    df["banos"] = df["banos"].apply(to_int)
-    df["precio"] = df["precio"].apply(to_float)
-    df["m2"] = df["m2"].apply(to_float)
+    df["habitaciones"] = numeric_column(df["habitaciones"], to_int)
+    df["banos"] = numeric_column(df["banos"], to_int)
+    df["precio"] = numeric_column(df["precio"], to_float)
+    df["m2"] = numeric_column(df["m2"], to_float)
     df["zona_norm"] = df["zona"].apply(normalize_text)
     df["zona_tokens"] = df["zona"].apply(collect_location_tokens)
-    df["operacion"] = df["operacion"].apply(normalize_text)
-    df["tipo"] = df["tipo"].apply(normalize_text)
-    df["web"] = df["web"].apply(normalize_text)
-    df["anunciante"] = df["anunciante"].apply(normalize_text)
+    df["operacion"] = text_column(df["operacion"])
+    df["tipo"] = text_column(df["tipo"])
+    df["web"] = text_column(df["web"])
+    df["anunciante"] = text_column(df["anunciante"])
     if "id_inmueble" not in df.columns:
         df["id_inmueble"] = df.apply(
             lambda r: hash((to_str(r.get("link_inmueble")), to_str(r.get("web")))),
@@ -1511,6 +1530,26 @@ def load_csv(path):
         raise RuntimeError(f"Failed to read CSV: {path}. Error: {e}")
 
 
+def load_inmuebles(csv_path):
+    """
+    Carga inmuebles priorizando la copia Parquet tipada que genera merge_csv
+    (misma ruta con extensión .parquet) si existe y no es más antigua que el
+    CSV. Si no está disponible, se usa el CSV como siempre.
+    """
+    parquet_path = os.path.splitext(csv_path)[0] + ".parquet"
+    if os.path.exists(parquet_path) and (
+        not os.path.exists(csv_path)
+        or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+    ):
+        try:
+            df = pd.read_parquet(parquet_path)
+            log(f"Inmuebles cargados desde {parquet_path}")
+            return df
+        except Exception as e:
+            log(f"WARN: no se pudo leer {parquet_path} ({e}); se usa el CSV")
+    return load_csv(csv_path)
+
+
 # ----------------------------
 # Main sin CLI. Config por variables.
 # ----------------------------
@@ -1553,7 +1592,7 @@ def main():
 
     try:
         log("Loading CSVs")
-        df_props_raw = load_csv(inmuebles_csv)
+        df_props_raw = load_inmuebles(inmuebles_csv)
         df_cli_raw = load_csv(clientes_csv)
         log(f"Inmuebles: {len(df_props_raw)} filas. Clientes: {len(df_cli_raw)} filas.")
     except Exception as e:
@@ -4,9 +4,19 @@
 # In[366]:
 
 
+import hashlib
+import json
+import os
+import sys
+from datetime import date
+
 import pandas as pd
 import numpy as np
 
+from utils.history_store import HistoryStore
+from utils.quality_report import run_quality_report
+from utils.stage_cache import StageCache, file_sha256
+
 
 # In[367]:
 
@@ -19,23 +29,38 @@ csv1 = "Scrappers/Fotocasa/Data/inmuebles_today.csv"
 csv2 = "Scrappers/Idealista/Data/inmuebles_today.csv"
 csv3 = "Scrappers/Pico_Blanes/Data/inmuebles_today.csv"
 csv4 = "Scrappers/Ego/Data/contacts_today_parsed.csv"
-# Cargar cada CSV en un DataFrame
-df1 = pd.read_csv(csv1)
-df2 = pd.read_csv(csv2)
-df3 = pd.read_csv(csv3)
-df4 = pd.read_csv(csv4)
-# Mostrar las primeras filas de cada uno
-print("Primeras filas de archivo1.csv:")
-print(df1.columns, "\n")
 
-print("Primeras filas de archivo2.csv:")
-print(df2.columns, "\n")
+# Caché de intermedios normalizados por portal. La versión incluye el hash de
+# este script y de los módulos de utils/ (la normalización usa p. ej.
+# utils.literal_parser): cualquier cambio en ellos invalida la caché.
+MERGE_CACHE_DIR = os.getenv("MERGE_CACHE_DIR") or ".cache/merge"
+MERGE_CACHE = (os.getenv("MERGE_CACHE") or "true").lower() in ("1", "true", "yes")
 
-print("Primeras filas de archivo3.csv:")
-print(df3.columns, "\n")
 
-print("Primeras filas de archivo4.csv:")
-print(df4.columns, "\n")
+def _cache_version() -> str:
+    here = os.path.dirname(os.path.abspath(__file__))
+    utils_dir = os.path.join(here, "utils")
+    fuentes = [os.path.abspath(__file__)] + sorted(
+        os.path.join(utils_dir, f) for f in os.listdir(utils_dir) if f.endswith(".py")
+    )
+    return hashlib.sha256("".join(file_sha256(f) for f in fuentes).encode()).hexdigest()
+
+
+stage_cache = StageCache(
+    MERGE_CACHE_DIR,
+    version=_cache_version(),
+    enabled=MERGE_CACHE,
+)
+
+# Volcados de recuentos por columna (depuración) e informe de calidad.
+MERGE_VERBOSE = (os.getenv("MERGE_VERBOSE") or "false").lower() in ("1", "true", "yes")
+QUALITY_DIR = os.getenv("QUALITY_DIR") or "quality"
+QUALITY_FAIL = (os.getenv("QUALITY_FAIL") or "true").lower() in ("1", "true", "yes")
+# Umbrales opcionales en JSON (se mezclan con DEFAULT_THRESHOLDS)
+QUALITY_THRESHOLDS = None
+if os.getenv("QUALITY_THRESHOLDS"):
+    with open(os.getenv("QUALITY_THRESHOLDS"), "r", encoding="utf-8") as f:
+        QUALITY_THRESHOLDS = json.load(f)
 
 
 # In[368]:
@@ -43,27 +68,38 @@ print(df4.columns, "\n")
 
 import numpy as np
 
+
 # df1 a partir del link
-df1["tipo_de_operacion"] = np.where(
-    df1["link_inmueble"].str.contains("/comprar/"),
-    "Venta",
-    np.where(df1["link_inmueble"].str.contains("/alquiler/"), "Alquiler", "Otro"),
-)
+def tipo_operacion_fotocasa(df):
+    df["tipo_de_operacion"] = np.where(
+        df["link_inmueble"].str.contains("/comprar/"),
+        "Venta",
+        np.where(df["link_inmueble"].str.contains("/alquiler/"), "Alquiler", "Otro"),
+    )
+    return df
+
 
 # df3 corrigiendo alquiler opción a compra
-df3["tipo_de_operacion"] = df3["tipo_de_operacion"].replace(
-    {"Alquiler opción a compra": "Alquiler"}
-)
-df3["tipo_de_operacion"] = df3["tipo_de_operacion"].fillna("Otro")
+def tipo_operacion_pico_blanes(df):
+    df["tipo_de_operacion"] = df["tipo_de_operacion"].replace(
+        {"Alquiler opción a compra": "Alquiler"}
+    )
+    df["tipo_de_operacion"] = df["tipo_de_operacion"].fillna("Otro")
+    return df
+
 
 # df2 a partir del título
-df2["tipo_de_operacion"] = np.where(
-    df2["titulo"].str.contains("venta", case=False, na=False),
-    "Venta",
-    np.where(
-        df2["titulo"].str.contains("alquiler", case=False, na=False), "Alquiler", "Otro"
-    ),
-)
+def tipo_operacion_idealista(df):
+    df["tipo_de_operacion"] = np.where(
+        df["titulo"].str.contains("venta", case=False, na=False),
+        "Venta",
+        np.where(
+            df["titulo"].str.contains("alquiler", case=False, na=False),
+            "Alquiler",
+            "Otro",
+        ),
+    )
+    return df
 
 
 
@@ -113,9 +149,6 @@ mapa_anunciantes = {
     "Maravillas International Realty Group": "International Realty",
 }
 
-# Normalizar los anunciantes en df1 y df2
-df1["anunciante"] = df1["anunciante"].replace(mapa_anunciantes)
-df2["anunciante"] = df2["anunciante"].replace(mapa_anunciantes)
 
 
 # In[ ]:
@@ -591,7 +624,7 @@ import pandas as pd
 
 
 import pandas as pd
-import ast
+from utils.literal_parser import parse_literal, parse_list_literal
 
 
 def standardize_zona(df, colname):
@@ -604,17 +637,15 @@ def standardize_zona(df, colname):
 
     def apply_item(x):
         if isinstance(x, str):
-            # intentar parsear strings que parezcan listas
-            try:
-                parsed = ast.literal_eval(x)
-                if isinstance(parsed, (list, tuple)):
-                    return [
-                        normalize_location(xx) for xx in parsed if isinstance(xx, str)
-                    ]
-                # si no era lista, tratarlo como string normal
-                return normalize_location(x)
-            except (ValueError, SyntaxError):
-                return normalize_location(x)
+            # intentar parsear strings que parezcan listas (parser cacheado;
+            # el texto plano se descarta sin parsear)
+            parsed = parse_list_literal(x)
+            if parsed is not None:
+                return [
+                    normalize_location(xx) for xx in parsed if isinstance(xx, str)
+                ]
+            # si no era lista, tratarlo como string normal
+            return normalize_location(x)
 
         if isinstance(x, (list, tuple)):
             return [normalize_location(xx) for xx in x if isinstance(xx, str)]
@@ -626,17 +657,67 @@ def standardize_zona(df, colname):
     return df
 
 
-df1 = standardize_zona(df1, "zona")
-df2 = standardize_zona(df2, "localizacion")
-df3 = standardize_zona(df3, "zona")
-df4 = standardize_zona(df4, "locations")
+def preparar_fotocasa(df):
+    df = tipo_operacion_fotocasa(df)
+    df["anunciante"] = df["anunciante"].replace(mapa_anunciantes)
+    return standardize_zona(df, "zona")
+
+
+def preparar_idealista(df):
+    df = tipo_operacion_idealista(df)
+    df["anunciante"] = df["anunciante"].replace(mapa_anunciantes)
+    return standardize_zona(df, "localizacion")
+
+
+def preparar_pico_blanes(df):
+    df = tipo_operacion_pico_blanes(df)
+    return standardize_zona(df, "zona")
+
+
+def preparar_contactos(df):
+    return standardize_zona(df, "locations")
+
+
+def cargar_portal(nombre, ruta, preparar):
+    """
+    Lee y normaliza un CSV de entrada reutilizando el intermedio cacheado si
+    el fichero no ha cambiado (mismo contenido que en la ejecución anterior).
+    """
+    fp = stage_cache.fingerprint(ruta)
+    df = stage_cache.load(nombre, fp)
+    if df is not None:
+        print(f"[CACHE] {nombre}: sin cambios ({fp['sha256'][:12]}), se reutiliza")
+        return df
+    df = preparar(pd.read_csv(ruta))
+    stage_cache.store(nombre, fp, df)
+    print(f"[CACHE] {nombre}: entrada nueva o modificada, normalizada de nuevo")
+    return df
+
+
+df1 = cargar_portal("fotocasa", csv1, preparar_fotocasa)
+df2 = cargar_portal("idealista", csv2, preparar_idealista)
+df3 = cargar_portal("pico_blanes", csv3, preparar_pico_blanes)
+df4 = cargar_portal("contactos", csv4, preparar_contactos)
+stage_cache.save_manifest()
+
+# Mostrar las columnas de cada uno
+print("Primeras filas de archivo1.csv:")
+print(df1.columns, "\n")
+
+print("Primeras filas de archivo2.csv:")
+print(df2.columns, "\n")
+
+print("Primeras filas de archivo3.csv:")
+print(df3.columns, "\n")
+
+print("Primeras filas de archivo4.csv:")
+print(df4.columns, "\n")
 
 
 # In[372]:
 
 
 import pandas as pd
-import ast
 
 def count_column_values(df, column):
     try:
@@ -649,10 +730,7 @@ def count_column_values(df, column):
                 and x.strip().startswith("[")
                 and x.strip().endswith("]")
             ):
-                try:
-                    return ast.literal_eval(x)
-                except Exception:
-                    return x
+                return parse_literal(x, default=x)
             return x
 
         col = col.apply(parse)
@@ -674,19 +752,23 @@ def count_column_values(df, column):
         return None
 
 
-count_column_values(df1, "zona")
-count_column_values(df2, "localizacion")
-count_column_values(df3, "zona")
-count_column_values(df4, "locations")
+# Volcados de recuentos solo bajo demanda: el control de calidad lo hace el
+# informe de utils.quality_report sobre la tabla unificada.
+if MERGE_VERBOSE:
+    count_column_values(df1, "zona")
+    count_column_values(df2, "localizacion")
+    count_column_values(df3, "zona")
+    count_column_values(df4, "locations")
 
 
 # In[373]:
 
 
-count_column_values(df1, "zona_std")
-count_column_values(df2, "zona_std")
-count_column_values(df3, "zona_std")
-count_column_values(df4, "zona_std")
+if MERGE_VERBOSE:
+    count_column_values(df1, "zona_std")
+    count_column_values(df2, "zona_std")
+    count_column_values(df3, "zona_std")
+    count_column_values(df4, "zona_std")
 
 
 # In[374]:
@@ -798,12 +880,124 @@ df_final = df_final.rename(columns={"zona_std": "zona"})
 # Reemplazar NaN y "-" por "Desconocido"
 df_final["zona"] = df_final["zona"].replace("-", "Desconocido").fillna("Desconocido")
 
-display(df_final.columns)
+print(df_final.columns)
+
+# Informe de calidad (JSON + HTML). Con anomalías por encima de los umbrales
+# se corta el pipeline antes de sobrescribir la salida, salvo QUALITY_FAIL=false.
+informe = run_quality_report(df_final, QUALITY_DIR, QUALITY_THRESHOLDS)
+print(
+    f"[CALIDAD] {informe['filas']} filas | por portal: {informe['filas_por_portal']} "
+    f"| informe en {QUALITY_DIR}"
+)
+if informe["anomalias"]:
+    for anomalia in informe["anomalias"]:
+        print(f"[CALIDAD] ANOMALÍA: {anomalia}")
+    if QUALITY_FAIL:
+        sys.exit(2)
+
 df_final.to_csv("inmuebles_unificado.csv", index=False, encoding="utf-8-sig")
 
 print("CSV guardado como inmuebles_unificado.csv")
 
 
+# In[375]:
+
+
+def _zona_detalle(valor):
+    """
+    Convierte la zona normalizada (tupla (texto, dict) o lista de tuplas) en
+    una lista de dicts planos {texto, municipio, barrio, subzona, extras}.
+    """
+    items = valor if isinstance(valor, list) else [valor]
+    out = []
+    for item in items:
+        if not (isinstance(item, tuple) and len(item) == 2):
+            continue
+        texto, meta = item
+        meta = meta if isinstance(meta, dict) else {}
+        out.append(
+            {
+                "texto": texto or None,
+                "municipio": meta.get("municipio"),
+                "barrio": meta.get("barrio"),
+                "subzona": meta.get("subzona"),
+                "extras": [str(x) for x in (meta.get("extras") or [])],
+            }
+        )
+    return out
+
+
+def tipar_unificado(df):
+    """
+    Copia tipada de la tabla unificada:
+      - numéricos como columnas anulables (Int64/Float64) en vez de
+        "A consultar"/"Desconocido"
+      - web/anunciante/tipo_de_operacion como categóricas
+      - zona estructurada (zona_detalle) además del texto original (zona),
+        que se mantiene idéntico al del CSV
+    """
+    detalle = df["zona"].apply(_zona_detalle)
+    return pd.DataFrame(
+        {
+            "habitaciones": pd.to_numeric(df["habitaciones"], errors="coerce").astype(
+                "Int64"
+            ),
+            "baños": pd.to_numeric(df["baños"], errors="coerce").astype("Int64"),
+            "precio": pd.to_numeric(df["precio"], errors="coerce").astype("Float64"),
+            "link_inmueble": df["link_inmueble"].astype("string"),
+            "metros_cuadrados": pd.to_numeric(
+                df["metros_cuadrados"], errors="coerce"
+            ).astype("Float64"),
+            "anunciante": df["anunciante"].astype("category"),
+            "zona": df["zona"].astype(str).astype("string"),
+            "zona_municipio": detalle.apply(
+                lambda d: d[0]["municipio"] if d else None
+            ).astype("string"),
+            "zona_detalle": detalle,
+            "tipo_de_operacion": df["tipo_de_operacion"].astype("category"),
+            "web": df["web"].astype("category"),
+        }
+    )
+
+
+def exportar_parquet_tipado(typed, ruta):
+    """
+    Escribe la copia tipada en Parquet. El CSV sigue siendo la salida de
+    referencia; si pyarrow no está instalado solo se avisa.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("pyarrow no disponible: se omite", ruta)
+        return
+
+    tmp = f"{ruta}.tmp"
+    typed.to_parquet(tmp, index=False, engine="pyarrow", compression="zstd")
+    os.replace(tmp, ruta)
+    print(f"Parquet tipado guardado como {ruta}")
+
+
+df_tipado = tipar_unificado(df_final)
+exportar_parquet_tipado(df_tipado, "inmuebles_unificado.parquet")
+
+
+# In[376]:
+
+
+# Histórico diario (Parquet particionado por fecha). Relanzar el mismo día
+# sustituye la foto de ese día.
+HISTORY_DIR = os.getenv("HISTORY_DIR") or "history"
+historico = HistoryStore(HISTORY_DIR)
+ruta_foto = historico.append_snapshot(df_tipado.drop(columns=["zona_detalle"]))
+if ruta_foto:
+    indice = historico.load_index()
+    print(
+        f"[HIST] foto guardada en {ruta_foto} | anuncios indexados: {len(indice)} | "
+        f"bajadas hoy: {len(historico.price_drops(desde=date.today()))} | "
+        f"relistados hoy: {len(historico.relists(desde=date.today()))}"
+    )
+
+
 # In[ ]:
 
 
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Raíz del repo en sys.path para importar utils/ y matcher
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
@@ -0,0 +1,39 @@
+from utils.browser_pool import BrowserWorkerPool
+
+
+class FakeBrowser:
+    def __init__(self, n):
+        self.n = n
+        self.quit_calls = 0
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+def test_fallo_en_clear_state_recrea_el_navegador():
+    creados = []
+
+    def build():
+        b = FakeBrowser(len(creados))
+        creados.append(b)
+        return b
+
+    def clear_state(b):
+        raise RuntimeError("sesión muerta")
+
+    vistos = []
+    pool = BrowserWorkerPool(
+        build,
+        1,
+        clear_state_every=2,
+        clear_state=clear_state,
+        backoff=0,
+        on_result=lambda pos, item, r: vistos.append(item),
+    )
+    out = pool.map(lambda b, item, first: (b.n, item), range(4))
+
+    assert [item for _, item in out] == [0, 1, 2, 3]
+    assert vistos == [0, 1, 2, 3]
+    # Los items 2 y 4 provocan la limpieza fallida -> navegador nuevo
+    assert len(creados) == 3
+    assert all(b.quit_calls == 1 for b in creados)
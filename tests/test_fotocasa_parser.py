@@ -0,0 +1,63 @@
+import json
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT
+
+pytest.importorskip("bs4")
+pytest.importorskip("lxml")
+
+_FOTOCASA_SCRIPTS = REPO_ROOT / "Scrappers" / "Fotocasa" / "Scripts"
+if str(_FOTOCASA_SCRIPTS) not in sys.path:
+    sys.path.insert(0, str(_FOTOCASA_SCRIPTS))
+
+from fotocasa_parser import extract_state_blob, parse_ficha  # noqa: E402
+
+URL = "https://www.fotocasa.es/es/comprar/vivienda/alcoy-alcoi/123456/d"
+
+
+def _ficha(real_estate, dom=""):
+    estado = {"props": {"pageProps": {"realEstate": real_estate}}}
+    return (
+        "<html><head>"
+        f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(estado)}</script>'
+        f"</head><body>{dom}</body></html>"
+    )
+
+
+ESTADO = {
+    "rawPrice": 150000.0,
+    "reducedPrice": 9100,
+    "title": "Piso en venta",
+    "address": {"municipality": "Alcoy / Alcoi", "neighbourhood": "Centro"},
+    "features": [
+        {"key": "rooms", "value": 3.0},
+        {"key": "bathrooms", "value": 2},
+        {"key": "surface", "value": 85.5},
+    ],
+}
+
+
+def test_extrae_estado_next_data():
+    assert extract_state_blob(_ficha(ESTADO))["props"]["pageProps"]["realEstate"] == ESTADO
+
+
+def test_numeros_del_estado_no_pierden_la_escala():
+    fila = parse_ficha(_ficha(ESTADO), URL)
+    assert fila["precio"] == 150000
+    assert fila["precio_bajada"] == 9100
+    assert fila["habitaciones"] == 3
+    assert fila["baños"] == 2
+    assert fila["metros_cuadrados"] == 86
+    assert fila["municipio"] == "Alcoy / Alcoi"
+    assert fila["zona"] == "Centro"
+
+
+def test_texto_del_dom_sigue_con_separador_de_miles():
+    estado = {k: v for k, v in ESTADO.items() if k not in ("rawPrice", "reducedPrice")}
+    estado["price"] = "150.000 €"
+    dom = '<div class="re-DetailHeader-reducedPrice">Ha bajado 9.100€</div>'
+    fila = parse_ficha(_ficha(estado, dom), URL)
+    assert fila["precio"] == 150000
+    assert fila["precio_bajada"] == 9100
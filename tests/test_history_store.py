@@ -0,0 +1,101 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from utils.history_store import HistoryStore  # noqa: E402
+
+A = "https://www.fotocasa.es/es/comprar/vivienda/alcoy-alcoi/1/d"
+B = "https://www.idealista.com/inmueble/2/"
+C = "https://www.picoblanes.com/inmueble/3"
+
+
+def _foto(*filas):
+    return pd.DataFrame(filas, columns=["link_inmueble", "web", "precio"])
+
+
+def _fila(index, link):
+    return index.set_index("link_inmueble").loc[link]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path / "history"))
+
+
+def test_fotos_de_varios_dias(store):
+    store.append_snapshot(_foto((A, "fotocasa", 100000), (B, "idealista", 200000)), "2024-03-01")
+    store.append_snapshot(_foto((A, "fotocasa", 100000)), "2024-03-02")
+    store.append_snapshot(_foto((A, "fotocasa", 100000), (C, "pico", 50000)), "2024-03-03")
+
+    assert store.fechas() == ["2024-03-01", "2024-03-02", "2024-03-03"]
+    fotos = store.load_snapshots(desde="2024-03-02")
+    assert sorted(fotos["fecha"].dt.strftime("%Y-%m-%d").unique()) == ["2024-03-02", "2024-03-03"]
+
+    index = store.load_index()
+    assert sorted(index["link_inmueble"]) == [A, B, C]
+    a = _fila(index, A)
+    assert a["dias_visto"] == 3 and a["relistados"] == 0
+    assert a["first_seen"] == pd.Timestamp("2024-03-01")
+    assert a["last_seen"] == pd.Timestamp("2024-03-03")
+    assert _fila(index, B)["last_seen"] == pd.Timestamp("2024-03-01")
+
+    activos = store.days_on_market()
+    assert set(activos["link_inmueble"]) == {A, C}
+    assert _fila(activos, A)["dias_mercado"] == 3
+    assert _fila(activos, C)["dias_mercado"] == 1
+    assert set(store.days_on_market(solo_activos=False)["link_inmueble"]) == {A, B, C}
+
+
+def test_relanzar_el_mismo_dia_sustituye_su_particion(store):
+    store.append_snapshot(_foto((A, "fotocasa", 100000)), "2024-03-01")
+    store.append_snapshot(_foto((A, "fotocasa", 100000), (B, "idealista", 1)), "2024-03-02")
+    store.append_snapshot(_foto((A, "fotocasa", 95000), (C, "pico", 50000)), "2024-03-02")
+
+    assert store.fechas() == ["2024-03-01", "2024-03-02"]
+    dia = store.load_snapshots(desde="2024-03-02")
+    assert sorted(dia["link_inmueble"]) == [A, C]
+
+    index = store.load_index()
+    assert sorted(index["link_inmueble"]) == [A, C]
+    a = _fila(index, A)
+    assert a["dias_visto"] == 2
+    assert a["last_price"] == 95000 and a["prev_price"] == 100000
+
+
+def test_reaparece_tras_un_hueco(store):
+    store.append_snapshot(_foto((A, "fotocasa", 100000), (B, "idealista", 1)), "2024-03-01")
+    store.append_snapshot(_foto((B, "idealista", 1)), "2024-03-02")
+    store.append_snapshot(_foto((A, "fotocasa", 100000), (B, "idealista", 1)), "2024-03-03")
+
+    relist = store.relists()
+    assert relist["link_inmueble"].tolist() == [A]
+    a = relist.iloc[0]
+    assert a["relistados"] == 1 and a["last_relist"] == pd.Timestamp("2024-03-03")
+    assert a["dias_visto"] == 2
+    assert store.relists(desde="2024-03-04").empty
+
+
+def test_bajada_de_precio(store):
+    store.append_snapshot(_foto((A, "fotocasa", 100000), (B, "idealista", 200000)), "2024-03-01")
+    store.append_snapshot(_foto((A, "fotocasa", 90000), (B, "idealista", 210000)), "2024-03-02")
+    store.append_snapshot(_foto((A, "fotocasa", 90000), (B, "idealista", 210000)), "2024-03-03")
+
+    bajadas = store.price_drops()
+    assert bajadas["link_inmueble"].tolist() == [A]
+    a = bajadas.iloc[0]
+    assert a["prev_price"] == 100000 and a["last_price"] == 90000
+    assert a["min_price"] == 90000 and a["first_price"] == 100000
+    assert a["price_changed_at"] == pd.Timestamp("2024-03-02")
+    assert a["bajada_pct"] == pytest.approx(10)
+    assert store.price_drops(min_pct=15).empty
+    assert store.price_drops(desde="2024-03-03").empty
+
+
+def test_indice_incremental_igual_al_reconstruido(store):
+    store.append_snapshot(_foto((A, "fotocasa", 100000), (B, "idealista", 1)), "2024-03-01")
+    store.append_snapshot(_foto((B, "idealista", 1)), "2024-03-02")
+    store.append_snapshot(_foto((A, "fotocasa", 90000), (C, "pico", None)), "2024-03-03")
+    incremental = store.load_index().sort_values("link_inmueble").reset_index(drop=True)
+    reconstruido = store.rebuild_index().sort_values("link_inmueble").reset_index(drop=True)
+    pd.testing.assert_frame_equal(incremental, reconstruido, check_dtype=False)
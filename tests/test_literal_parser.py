@@ -0,0 +1,58 @@
+import ast
+
+import pytest
+
+from utils.literal_parser import parse_list_literal, parse_literal
+
+CASOS = [
+    "['Alcoi', 'Alicante']",
+    "('Alcoi',)",
+    "('Alcoi')",
+    "{'municipio': 'Alcoi', 'cp': '03801'}",
+    "[1, 2.5, -3, 1e3, None, True, False]",
+    "[]",
+    "()",
+    "0",
+    "00",
+    "0_0",
+    "01.5",
+    "'con \\\\ escape'",
+    "[1, 2,]",
+]
+
+
+def _literal_eval(s, default="DEFAULT"):
+    try:
+        return ast.literal_eval(s.strip())
+    except Exception:
+        return default
+
+
+@pytest.mark.parametrize("s", CASOS)
+def test_equivale_a_literal_eval(s):
+    assert parse_literal(s, default="DEFAULT") == _literal_eval(s)
+
+
+@pytest.mark.parametrize("s", ["01", "03801", "-01", "[03801]", "(0, 01)"])
+def test_enteros_con_ceros_a_la_izquierda_no_son_literales(s):
+    assert _literal_eval(s) == "DEFAULT"
+    assert parse_literal(s, default="DEFAULT") == "DEFAULT"
+
+
+def test_codigo_postal_se_conserva_como_texto():
+    assert parse_literal("03801", default="03801") == "03801"
+    assert parse_list_literal("['03801', 'Alcoi']") == ["03801", "Alcoi"]
+
+
+def test_texto_plano_y_no_str():
+    assert parse_literal("Alcoi", default=None) is None
+    assert parse_literal(3801, default="x") == "x"
+    assert parse_list_literal("Alcoi") is None
+    assert parse_list_literal("{'a': 1}") is None
+
+
+def test_matcher_conserva_codigo_postal():
+    pytest.importorskip("pandas")
+    import matcher
+
+    assert matcher.collect_location_tokens("03801") == ["03801"]
@@ -0,0 +1,64 @@
+import json
+import os
+import time
+
+from utils import page_cache
+from utils.page_cache import PageCache
+
+URL = "https://www.fotocasa.es/es/comprar/vivienda/alcoy-alcoi/123456/d"
+HTML = "<html><body>Piso en Alcoy · 150.000 €</body></html>"
+
+
+def _envejecer(cache, url, horas):
+    """Retrasa la fecha de descarga guardada en la cabecera de la entrada."""
+    path = cache._find(url)
+    ext = "".join(path.suffixes[-2:])
+    _, _, body = page_cache._decompress(path.read_bytes(), ext).partition(b"\n")
+    header = json.dumps({"url": url, "ts": time.time() - horas * 3600}).encode("utf-8")
+    data, _ = page_cache._compress(header + b"\n" + body)
+    path.write_bytes(data)
+
+
+def test_ida_y_vuelta(tmp_path):
+    cache = PageCache(tmp_path, offline=False, enabled=True)
+    assert cache.get(URL) is None
+    cache.put(URL, HTML)
+    assert cache.get(URL) == HTML
+    assert (cache.hits, cache.misses, cache.stores) == (1, 1, 1)
+    assert list(cache.iter_entries()) == [(URL, HTML)]
+
+
+def test_offline_sirve_entradas_antiguas(tmp_path):
+    PageCache(tmp_path, enabled=True).put(URL, HTML)
+    cache = PageCache(tmp_path, offline=True, enabled=False)
+    _envejecer(cache, URL, horas=24 * 30)
+    assert cache.enabled
+    assert cache.get(URL) == HTML
+
+
+def test_put_sustituye_la_entrada(tmp_path):
+    cache = PageCache(tmp_path, offline=False, enabled=True)
+    cache.put(URL, HTML)
+    cache.put(URL, HTML.replace("150.000", "140.000"))
+    assert "140.000" in cache.get(URL)
+    assert len(list(cache.iter_entries())) == 1
+
+
+def test_desactivada_no_lee_ni_escribe(tmp_path):
+    cache = PageCache(tmp_path, offline=False, enabled=False)
+    cache.put(URL, HTML)
+    assert cache.get(URL) is None
+    assert not any(tmp_path.rglob("*.html.*"))
+
+
+def test_evict_borra_primero_las_mas_antiguas(tmp_path):
+    cache = PageCache(tmp_path, max_mb=0, offline=False, enabled=True)
+    urls = [f"{URL}?n={i}" for i in range(3)]
+    for i, url in enumerate(urls):
+        cache.put(url, HTML * 50)
+        os.utime(cache._find(url), (1000 + i, 1000 + i))
+    # Margen para las dos entradas más recientes
+    cache.max_bytes = sum(cache._find(u).stat().st_size for u in urls[1:])
+    assert cache.evict() == 1
+    assert cache.get(urls[0]) is None
+    assert cache.get(urls[2]) == HTML * 50
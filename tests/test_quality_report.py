@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from utils.quality_report import (  # noqa: E402
+    add_deltas,
+    evaluate,
+    load_previous,
+    profile_unificado,
+    run_quality_report,
+)
+
+ALCOI = [("Alcoi", {"municipio": "Alcoi"})]
+DESCONOCIDA = [("Sitio raro", {})]
+
+
+def _unificado(n_foto=4, n_idea=4, precio_nulo=0, zona_desconocida=0, link_nulo=0):
+    filas = []
+    for i in range(n_foto + n_idea):
+        filas.append(
+            {
+                "link_inmueble": f"https://x/{i}",
+                "web": "fotocasa" if i < n_foto else "idealista",
+                "precio": 100000 + i,
+                "metros_cuadrados": 80,
+                "habitaciones": 3,
+                "baños": 1,
+                "zona": ALCOI,
+            }
+        )
+    for i in range(precio_nulo):
+        filas[i]["precio"] = "A consultar"
+    for i in range(zona_desconocida):
+        filas[-1 - i]["zona"] = DESCONOCIDA
+    for i in range(link_nulo):
+        filas[i]["link_inmueble"] = None
+    return pd.DataFrame(filas)
+
+
+def _informe(df, previo=None, thresholds=None):
+    report = add_deltas(profile_unificado(df), previo)
+    return report, evaluate(report, thresholds)
+
+
+def test_tabla_sana_sin_anomalias_y_sin_informe_anterior():
+    report, issues = _informe(_unificado())
+    assert issues == []
+    assert report["informe_anterior"] is None
+    assert report["deltas_por_portal"]["fotocasa"] == {"hoy": 4, "anterior": None, "delta_pct": None}
+    assert report["nulos"]["total"]["precio"] == 0
+    assert report["zona_desconocida"]["total"]["zona"] == 0
+
+
+def test_nulos_de_precio_cuentan_el_relleno():
+    report, issues = _informe(_unificado(precio_nulo=4))
+    assert report["nulos"]["total"]["precio"] == 0.5
+    assert report["nulos"]["por_portal"]["fotocasa"]["precio"] == 1.0
+    # "A consultar" es relleno, no un fallo de conversión
+    assert report["conversion"]["total"]["precio"] == 0
+    assert issues == []  # 50% no supera el límite de 0.5
+
+    _, issues = _informe(_unificado(precio_nulo=5))
+    assert issues == ["nulos en precio: 62.50% > 50.00%"]
+
+
+def test_link_y_web_no_admiten_nulos():
+    _, issues = _informe(_unificado(link_nulo=1))
+    assert issues == ["nulos en link_inmueble: 12.50% > 0.00%"]
+
+    df = _unificado()
+    df.loc[0, "web"] = "Desconocido"
+    _, issues = _informe(df)
+    assert any(i.startswith("nulos en web") for i in issues)
+
+
+def test_umbral_parcial_de_nulos_conserva_los_demas():
+    _, issues = _informe(_unificado(link_nulo=1), thresholds={"max_null_rate": {"precio": 0.9}})
+    assert issues == ["nulos en link_inmueble: 12.50% > 0.00%"]
+
+
+def test_zonas_desconocidas():
+    report, issues = _informe(_unificado(zona_desconocida=2))
+    assert report["zona_desconocida"]["total"]["zona"] == 0.25
+    assert report["zona_desconocida"]["por_portal"]["idealista"]["zona"] == 0.5
+    assert issues == []
+
+    _, issues = _informe(_unificado(zona_desconocida=3))
+    assert issues == ["zonas desconocidas: 37.50% > 35.00%"]
+
+
+def test_caida_de_filas_respecto_al_informe_anterior():
+    previo = {"fecha": "2024-03-01", "filas_por_portal": {"fotocasa": 10, "idealista": 4, "pico": 3}}
+    report, issues = _informe(_unificado(n_foto=4, n_idea=4), previo)
+    d = report["deltas_por_portal"]
+    assert d["fotocasa"] == {"hoy": 4, "anterior": 10, "delta_pct": -60.0}
+    assert d["idealista"]["delta_pct"] == 0.0
+    assert d["pico"] == {"hoy": 0, "anterior": 3, "delta_pct": -100.0}
+    assert report["informe_anterior"] == "2024-03-01"
+    assert issues == ["fotocasa: 4 filas vs 10 (-60.0%)", "pico: 0 filas (mínimo 1)"]
+
+    # Una caída justo en el límite no es anomalía; una subida tampoco
+    previo = {"fecha": "2024-03-01", "filas_por_portal": {"fotocasa": 8, "idealista": 2}}
+    _, issues = _informe(_unificado(), previo)
+    assert issues == []
+
+
+def test_run_quality_report_usa_el_ultimo_informe_anterior(tmp_path):
+    for fecha, filas in (("2000-01-01", 100), ("2000-01-02", 4)):
+        (tmp_path / f"quality_{fecha}.json").write_text(
+            json.dumps({"fecha": fecha, "filas_por_portal": {"fotocasa": filas, "idealista": 4}})
+        )
+    assert load_previous(str(tmp_path), "2000-01-02")["fecha"] == "2000-01-01"
+
+    report = run_quality_report(_unificado(), str(tmp_path))
+    assert report["informe_anterior"] == "2000-01-02"
+    assert report["anomalias"] == []
+    assert (tmp_path / f"quality_{report['fecha']}.json").exists()
+    assert (tmp_path / "quality_report.html").exists()
+
+
+def test_sin_informe_anterior_en_disco(tmp_path):
+    assert load_previous(str(tmp_path)) is None
+    report = run_quality_report(_unificado(), str(tmp_path))
+    assert report["informe_anterior"] is None
+    assert report["anomalias"] == []
@@ -0,0 +1,80 @@
+import pytest
+
+from utils import rate_limit
+from utils.rate_limit import AdaptivePacer, HostRateLimiter
+
+
+@pytest.fixture
+def dormido(monkeypatch):
+    """Sustituye time.sleep del módulo y apunta lo que se habría dormido."""
+    esperas = []
+    monkeypatch.setattr(rate_limit.time, "sleep", esperas.append)
+    return esperas
+
+
+def _pacer(**kw):
+    kw.setdefault("jitter", 0)
+    return AdaptivePacer(initial=10, min_delay=1, max_delay=60, **kw)
+
+
+def test_respuestas_sanas_bajan_la_espera_poco_a_poco():
+    p = _pacer(increase=0.02)
+    p.ok()
+    assert p.delay == pytest.approx(1 / 0.12)
+    for _ in range(1000):
+        p.ok()
+    assert p.delay == 1  # nunca por debajo de min_delay
+
+
+def test_bloqueo_dobla_la_espera_y_congela_las_subidas():
+    p = _pacer(decrease=0.5, hold=3)
+    p.penalize("bloqueo")
+    assert p.delay == pytest.approx(20)
+    for _ in range(3):
+        p.ok()
+    assert p.delay == pytest.approx(20)
+    p.ok()
+    assert p.delay < 20
+    assert p.stats()["penalizaciones"] == {"bloqueo": 1}
+
+
+def test_senal_leve_sube_algo_sin_congelar():
+    p = _pacer(soft_decrease=0.85, hold=3)
+    p.penalize("vacia", soft=True)
+    assert p.delay == pytest.approx(10 / 0.85)
+    antes = p.delay
+    p.ok()
+    assert p.delay < antes
+
+
+def test_espera_acotada_por_max_delay():
+    p = _pacer()
+    for _ in range(10):
+        p.penalize()
+    assert p.delay == 60
+    assert p.stats()["espera_max_s"] == 60
+
+
+def test_wait_duerme_la_espera_actual(dormido):
+    p = _pacer()
+    assert p.wait() == 10
+    assert dormido == [10]
+    s = p.stats()
+    assert (s["esperas"], s["dormido_s"], s["peticiones_min"]) == (1, 10, 6.0)
+
+
+def test_jitter_dentro_del_margen(dormido):
+    p = AdaptivePacer(initial=10, min_delay=1, max_delay=60, jitter=0.2)
+    for _ in range(50):
+        p.wait()
+    assert all(8 <= d <= 12 for d in dormido)
+
+
+def test_limitador_separa_peticiones_al_mismo_host(monkeypatch, dormido):
+    reloj = iter([100.0, 100.0, 100.0])
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: next(reloj))
+    lim = HostRateLimiter(min_interval=0.5)
+    assert lim.wait("https://www.idealista.com/a") == 0
+    assert lim.wait("https://www.idealista.com/b") == pytest.approx(0.5)
+    assert lim.wait("https://www.fotocasa.es/c") == 0
+    assert dormido == [pytest.approx(0.5)]
@@ -0,0 +1,86 @@
+import math
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from utils.upsert import keyed_upsert, rebuild_today_from_cache  # noqa: E402
+
+
+def _por_id(df):
+    return {r["id"]: r for r in df.to_dict("records")}
+
+
+def test_claves_int_str_y_float_son_la_misma():
+    existentes = pd.DataFrame({"id": [1, 2, 3], "precio": [100, 200, 300]})
+    nuevos = pd.DataFrame({"id": ["2", 3.0], "precio": [250, 350]})
+    out = keyed_upsert(existentes, nuevos)
+    assert out["id"].tolist() == ["1", "2", "3"]
+    assert out["precio"].tolist() == [100, 250, 350]
+
+
+def test_float_no_entero_conserva_decimales():
+    out = keyed_upsert(pd.DataFrame({"id": [2.5]}), pd.DataFrame({"id": [2]}))
+    assert out["id"].tolist() == ["2.5", "2"]
+
+
+def test_claves_nulas_se_descartan_y_no_coinciden_entre_si():
+    existentes = pd.DataFrame({"id": [1.0, math.nan], "precio": [100, 1]})
+    nuevos = pd.DataFrame({"id": [math.nan, None, "  ", 1], "precio": [2, 3, 4, 110]})
+    out = keyed_upsert(existentes, nuevos)
+    assert out["id"].tolist() == ["1"]
+    assert out["precio"].tolist() == [110]
+
+
+def test_keep_keys_con_tipos_mezclados():
+    existentes = pd.DataFrame({"id": ["1", "2", "3"], "precio": [100, 200, 300]})
+    out = keyed_upsert(existentes, None, keep_keys=[1, 3.0, None])
+    assert out["id"].tolist() == ["1", "3"]
+
+
+def test_reglas_de_conflicto():
+    existentes = pd.DataFrame(
+        {"id": [1, 2], "precio": [100, 200], "fecha": ["2024-01-01", "2024-01-02"]}
+    )
+    nuevos = pd.DataFrame({"id": [2, 4], "precio": [None, 400], "fecha": ["hoy", "hoy"]})
+
+    replace = _por_id(keyed_upsert(existentes, nuevos))
+    assert math.isnan(replace["2"]["precio"]) and replace["2"]["fecha"] == "hoy"
+
+    update = _por_id(keyed_upsert(existentes, nuevos, on_conflict="update"))
+    assert update["2"]["precio"] == 200 and update["2"]["fecha"] == "hoy"
+
+    keep = _por_id(keyed_upsert(existentes, nuevos, on_conflict="keep"))
+    assert keep["2"]["fecha"] == "2024-01-02" and keep["4"]["precio"] == 400
+
+    preserve = _por_id(keyed_upsert(existentes, nuevos, preserve=("fecha",)))
+    assert preserve["2"]["fecha"] == "2024-01-02" and preserve["4"]["fecha"] == "hoy"
+
+    with pytest.raises(ValueError):
+        keyed_upsert(existentes, nuevos, on_conflict="merge")
+
+
+def test_duplicados_gana_la_ultima_aparicion():
+    nuevos = pd.DataFrame({"id": [5, "5", 5.0], "precio": [1, 2, 3]})
+    out = keyed_upsert(None, nuevos)
+    assert out["id"].tolist() == ["5"]
+    assert out["precio"].tolist() == [3]
+
+
+def test_rebuild_today_desde_cache():
+    previo = pd.DataFrame(
+        {
+            "id_inmueble": [1.0, 2.0, 3.0],
+            "precio": [100, 200, 300],
+            "fecha_inclusion": ["2024-01-01", "2024-01-02", "2024-01-03"],
+        }
+    )
+    cacheadas = {
+        "1": pd.DataFrame({"id_inmueble": ["1"], "precio": [90], "fecha_inclusion": ["hoy"]}),
+    }
+    out, n = rebuild_today_from_cache([1, "2", 4], cacheadas.get, previo)
+    assert n == 1
+    # Reparseada con la fecha de entrada previa; sin caché, la fila previa; 3 ya no está hoy
+    assert out["id_inmueble"].tolist() == ["1", "2"]
+    assert out["precio"].tolist() == [90, 200]
+    assert out["fecha_inclusion"].tolist() == ["2024-01-01", "2024-01-02"]
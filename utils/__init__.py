@@ -0,0 +1 @@
+"""Utilidades compartidas por merge_csv, matcher y los scrapers."""
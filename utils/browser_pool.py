@@ -0,0 +1,197 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Optional, Sequence
+
+
+def available_memory_mb() -> Optional[int]:
+    """Memoria disponible en MB (psutil si está instalado; si no, /proc/meminfo o sysconf)."""
+    try:
+        import psutil
+
+        return int(psutil.virtual_memory().available // (1024 * 1024))
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        pages = os.sysconf("SC_AVPHYS_PAGES")
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        return int(pages * page_size // (1024 * 1024))
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def max_workers_for_memory(
+    requested: int, mb_per_worker: int = 700, reserve_mb: int = 1024
+) -> int:
+    """
+    Limita `requested` a los Chrome que caben en la RAM disponible, dejando
+    `reserve_mb` libres. Nunca devuelve menos de 1.
+    """
+    requested = max(1, int(requested))
+    avail = available_memory_mb()
+    if avail is None:
+        return requested
+    cap = (avail - reserve_mb) // max(1, mb_per_worker)
+    return max(1, min(requested, int(cap)))
+
+
+def _quit(browser) -> None:
+    try:
+        browser.quit()
+    except Exception:
+        pass
+
+
+class BrowserWorkerPool:
+    """
+    Pool de N navegadores aislados que consumen una cola compartida.
+
+    Cada worker es un hilo dueño de su propio navegador (creado con
+    `build_browser`) y mantiene el mismo ciclo de vida que el bucle secuencial
+    de los scrapers:
+      - limpia caché/cookies cada `clear_state_every` items
+      - recicla el navegador cada `recycle_every` items
+      - reintenta cada item hasta `max_retries` veces; si salta una de
+        `reset_on` (driver en mal estado) se recrea el navegador antes del
+        siguiente intento
+
+    `on_quit(browser)`, si se indica, se llama justo antes de cerrar cada
+    navegador (p. ej. para recoger sus estadísticas de red).
+
+    `task(browser, item, first_run)` procesa un item; `first_run` es True en el
+    primer item tras crear o reciclar el navegador. `is_ok(resultado)` decide si
+    el resultado vale o hay que reintentar.
+
+    La construcción de navegadores se serializa con un lock (undetected
+    chromedriver parchea el binario al arrancar y no tolera arranques
+    simultáneos). `map` devuelve los resultados en el orden de entrada, con
+    None en los items que fallaron.
+    """
+
+    def __init__(
+        self,
+        build_browser: Callable,
+        n_workers: int = 1,
+        *,
+        recycle_every: int = 30,
+        clear_state_every: int = 5,
+        max_retries: int = 2,
+        clear_state: Optional[Callable] = None,
+        reset_on: Sequence[type] = (),
+        is_ok: Callable = lambda r: r is not None,
+        backoff: float = 0.8,
+        on_result: Optional[Callable] = None,
+        on_quit: Optional[Callable] = None,
+    ):
+        self.build_browser = build_browser
+        self.n_workers = max(1, int(n_workers))
+        self.recycle_every = recycle_every
+        self.clear_state_every = clear_state_every
+        self.max_retries = max_retries
+        self.clear_state = clear_state
+        self.reset_on = tuple(reset_on)
+        self.is_ok = is_ok
+        self.backoff = backoff
+        self.on_result = on_result
+        self.on_quit = on_quit
+        self._build_lock = threading.Lock()
+
+    def _new_browser(self):
+        with self._build_lock:
+            return self.build_browser()
+
+    def _release(self, browser) -> None:
+        if self.on_quit is not None:
+            try:
+                self.on_quit(browser)
+            except Exception:
+                pass
+        _quit(browser)
+
+    def _worker(self, task, jobs: "queue.Queue", results: list) -> None:
+        browser = None
+        first_run = True
+        done = 0
+        try:
+            while True:
+                try:
+                    pos, item = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                done += 1
+
+                if browser is not None and self.clear_state and done % self.clear_state_every == 0:
+                    try:
+                        self.clear_state(browser)
+                    except Exception:
+                        # Sesión muerta: se recrea el navegador para este item
+                        self._release(browser)
+                        browser = None
+                if browser is not None and done % self.recycle_every == 0:
+                    self._release(browser)
+                    browser = None
+
+                result = None
+                for attempt in range(1, self.max_retries + 1):
+                    if browser is None:
+                        try:
+                            browser = self._new_browser()
+                        except Exception:
+                            time.sleep(self.backoff * attempt)
+                            continue
+                        first_run = True
+                    try:
+                        r = task(browser, item, first_run)
+                        if self.is_ok(r):
+                            result = r
+                            break
+                    except self.reset_on:
+                        self._release(browser)
+                        browser = None
+                    except Exception:
+                        pass
+                    time.sleep(self.backoff * attempt)
+
+                first_run = False
+                results[pos] = result
+                if self.on_result is not None:
+                    try:
+                        self.on_result(pos, item, result)
+                    except Exception:
+                        pass
+        finally:
+            if browser is not None:
+                self._release(browser)
+
+    def map(self, task: Callable, items: Iterable) -> list:
+        items = list(items)
+        results = [None] * len(items)
+        if not items:
+            return results
+        jobs = queue.Queue()
+        for pos, item in enumerate(items):
+            jobs.put((pos, item))
+
+        n = min(self.n_workers, len(items))
+        threads = [
+            threading.Thread(
+                target=self._worker,
+                args=(task, jobs, results),
+                name=f"browser-worker-{i}",
+                daemon=True,
+            )
+            for i in range(n)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
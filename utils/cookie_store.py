@@ -0,0 +1,130 @@
+"""
+Persistencia cifrada de las cookies de una sesión autenticada, para no
+repetir el login en el navegador en cada ejecución.
+
+Las cookies se guardan cifradas con Fernet (paquete opcional `cryptography`)
+con una clave que llega por variable de entorno. Sin el paquete o sin clave
+no se persiste nada: nunca se escriben cookies de sesión en claro.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # pragma: no cover - cryptography es opcional
+    Fernet = None
+    InvalidToken = ValueError
+
+
+def cookies_from_session(sess) -> list:
+    """Cookies de un requests.Session en el formato de Selenium (get_cookies)."""
+    out = []
+    for c in sess.cookies:
+        ck = {
+            "name": c.name,
+            "value": c.value,
+            "domain": c.domain,
+            "path": c.path or "/",
+            "secure": bool(c.secure),
+        }
+        if c.expires:
+            ck["expiry"] = int(c.expires)
+        out.append(ck)
+    return out
+
+
+def apply_to_session(sess, cookies: list, domain: str = "") -> int:
+    """Copia cookies (formato Selenium) a un requests.Session. Devuelve cuántas."""
+    n = 0
+    for c in cookies or []:
+        if domain and domain not in (c.get("domain") or ""):
+            continue
+        try:
+            sess.cookies.set(
+                c.get("name"),
+                c.get("value"),
+                domain=c.get("domain"),
+                path=c.get("path", "/"),
+            )
+            n += 1
+        except Exception:
+            continue
+    return n
+
+
+def apply_to_browser(browser, cookies: list) -> int:
+    """
+    Inyecta cookies en Selenium. El navegador debe estar ya en una página del
+    dominio (add_cookie solo acepta cookies del dominio actual).
+    """
+    n = 0
+    for c in cookies or []:
+        ck = {k: c[k] for k in ("name", "value", "domain", "path", "secure", "expiry") if k in c}
+        try:
+            browser.add_cookie(ck)
+            n += 1
+        except Exception:
+            continue
+    return n
+
+
+class CookieStore:
+    def __init__(self, path, key: Optional[str], max_age_h: float = 72.0):
+        self.path = Path(path)
+        self.max_age_s = float(max_age_h) * 3600
+        self._fernet = None
+        self._lock = threading.Lock()
+        if Fernet is not None and key:
+            try:
+                self._fernet = Fernet(key.encode("ascii") if isinstance(key, str) else key)
+            except (ValueError, TypeError):
+                self._fernet = None
+
+    @property
+    def available(self) -> bool:
+        return self._fernet is not None
+
+    def load(self) -> Optional[dict]:
+        """
+        {"cookies": [...], "user_agent": ..., "ts": ...} o None si no hay
+        sesión guardada, no se puede descifrar o es más antigua que max_age_h.
+        """
+        if not self.available or not self.path.exists():
+            return None
+        try:
+            data = json.loads(self._fernet.decrypt(self.path.read_bytes()))
+        except (OSError, InvalidToken, ValueError):
+            return None
+        if time.time() - float(data.get("ts") or 0) > self.max_age_s:
+            return None
+        return data if data.get("cookies") else None
+
+    def save(self, cookies: list, user_agent: Optional[str] = None) -> bool:
+        """Guarda las cookies cifradas (escritura atómica, permisos 0600)."""
+        if not self.available or not cookies:
+            return False
+        payload = json.dumps(
+            {"cookies": cookies, "user_agent": user_agent, "ts": time.time()}
+        ).encode("utf-8")
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(self._fernet.encrypt(payload))
+                os.replace(tmp, self.path)
+                return True
+            except OSError:
+                return False
+
+    def clear(self) -> None:
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,295 @@
+import os
+import shutil
+from datetime import date, datetime
+from typing import Optional
+
+import pandas as pd
+
+
+def _fecha_str(fecha=None) -> str:
+    if fecha is None:
+        return date.today().isoformat()
+    if isinstance(fecha, (date, datetime, pd.Timestamp)):
+        return pd.Timestamp(fecha).date().isoformat()
+    return pd.Timestamp(str(fecha)).date().isoformat()
+
+
+class HistoryStore:
+    """
+    Histórico diario de la tabla unificada en Parquet particionado por fecha.
+
+    Estructura en disco:
+        <root>/snapshots/fecha=YYYY-MM-DD/part.parquet   (una foto por día)
+        <root>/listings.parquet                          (índice por anuncio)
+
+    - Solo se añade: cada ejecución escribe la partición de su fecha. Relanzar
+      el mismo día sustituye esa partición (y reconstruye el índice) en vez de
+      duplicar filas.
+    - La clave estable es `link_inmueble` (ya canonicalizado y deduplicado en
+      el merge).
+    - El índice guarda por anuncio first_seen/last_seen, precios (primero,
+      último, anterior, mínimo), número de días visto y reapariciones, de modo
+      que las consultas de bajadas de precio, relistados y días en mercado no
+      necesitan leer todas las particiones.
+    - Requiere pyarrow; si no está instalado `available` es False y las
+      escrituras se omiten.
+    """
+
+    KEY = "link_inmueble"
+    SNAPSHOTS = "snapshots"
+    INDEX = "listings.parquet"
+    INDEX_COLS = [
+        "link_inmueble",
+        "web",
+        "first_seen",
+        "last_seen",
+        "dias_visto",
+        "first_price",
+        "last_price",
+        "prev_price",
+        "min_price",
+        "price_changed_at",
+        "relistados",
+        "last_relist",
+    ]
+
+    def __init__(self, root: str = "history"):
+        self.root = root
+        try:
+            import pyarrow  # noqa: F401
+
+            self.available = True
+        except ImportError:
+            self.available = False
+
+    # ---------- rutas ----------
+    def _snapshots_dir(self) -> str:
+        return os.path.join(self.root, self.SNAPSHOTS)
+
+    def _partition_dir(self, fecha: str) -> str:
+        return os.path.join(self._snapshots_dir(), f"fecha={fecha}")
+
+    def _index_path(self) -> str:
+        return os.path.join(self.root, self.INDEX)
+
+    def fechas(self) -> list:
+        """Fechas (YYYY-MM-DD) con partición escrita, ordenadas."""
+        base = self._snapshots_dir()
+        if not os.path.isdir(base):
+            return []
+        out = []
+        for name in os.listdir(base):
+            part = os.path.join(base, name, "part.parquet")
+            if name.startswith("fecha=") and os.path.exists(part):
+                out.append(name[len("fecha="):])
+        return sorted(out)
+
+    # ---------- escritura ----------
+    def append_snapshot(self, df: pd.DataFrame, fecha=None) -> Optional[str]:
+        """
+        Guarda `df` como la foto del día `fecha` (hoy por defecto) y actualiza
+        el índice. Devuelve la ruta de la partición o None si no hay pyarrow.
+        """
+        if not self.available:
+            print("pyarrow no disponible: se omite el histórico")
+            return None
+        fecha = _fecha_str(fecha)
+        previas = self.fechas()
+
+        snap = df.copy()
+        snap[self.KEY] = snap[self.KEY].astype("string").str.strip()
+        snap = snap[snap[self.KEY].notna() & (snap[self.KEY] != "")]
+        snap = snap.drop_duplicates(subset=[self.KEY], keep="last")
+        snap = snap.reset_index(drop=True)
+
+        part_dir = self._partition_dir(fecha)
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, "part.parquet")
+        tmp = f"{path}.tmp"
+        snap.to_parquet(tmp, index=False, engine="pyarrow", compression="zstd")
+        os.replace(tmp, path)
+
+        if previas and (fecha <= previas[-1] or not os.path.exists(self._index_path())):
+            # Relanzamiento del mismo día, relleno de una fecha antigua o
+            # índice perdido: el incremental ya no vale, se reconstruye.
+            self.rebuild_index()
+        else:
+            index = self.load_index()
+            ultima = pd.Timestamp(previas[-1]) if previas else None
+            index = self._update_index(index, snap, pd.Timestamp(fecha), ultima)
+            self._write_index(index)
+        return path
+
+    def _write_index(self, index: pd.DataFrame) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self._index_path()
+        tmp = f"{path}.tmp"
+        index.to_parquet(tmp, index=False, engine="pyarrow", compression="zstd")
+        os.replace(tmp, path)
+
+    def rebuild_index(self) -> pd.DataFrame:
+        """Reconstruye el índice leyendo solo clave/web/precio de cada partición."""
+        index = self._empty_index()
+        ultima = None
+        for fecha in self.fechas():
+            snap = pd.read_parquet(
+                os.path.join(self._partition_dir(fecha), "part.parquet"),
+                columns=[self.KEY, "web", "precio"],
+            )
+            ts = pd.Timestamp(fecha)
+            index = self._update_index(index, snap, ts, ultima)
+            ultima = ts
+        self._write_index(index)
+        return index
+
+    def _empty_index(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "link_inmueble": pd.Series(dtype="string"),
+                "web": pd.Series(dtype="string"),
+                "first_seen": pd.Series(dtype="datetime64[ns]"),
+                "last_seen": pd.Series(dtype="datetime64[ns]"),
+                "dias_visto": pd.Series(dtype="Int64"),
+                "first_price": pd.Series(dtype="Float64"),
+                "last_price": pd.Series(dtype="Float64"),
+                "prev_price": pd.Series(dtype="Float64"),
+                "min_price": pd.Series(dtype="Float64"),
+                "price_changed_at": pd.Series(dtype="datetime64[ns]"),
+                "relistados": pd.Series(dtype="Int64"),
+                "last_relist": pd.Series(dtype="datetime64[ns]"),
+            }
+        )
+
+    def _update_index(
+        self,
+        index: pd.DataFrame,
+        snap: pd.DataFrame,
+        fecha: pd.Timestamp,
+        ultima: Optional[pd.Timestamp],
+    ) -> pd.DataFrame:
+        """Aplica la foto `snap` del día `fecha` al índice (vectorizado)."""
+        hoy = pd.DataFrame(
+            {
+                self.KEY: snap[self.KEY].astype("string"),
+                "web_hoy": snap["web"].astype("string")
+                if "web" in snap
+                else pd.Series(pd.NA, index=snap.index, dtype="string"),
+                "precio_hoy": pd.to_numeric(snap["precio"], errors="coerce").astype(
+                    "Float64"
+                ),
+            }
+        ).drop_duplicates(subset=[self.KEY], keep="last")
+
+        idx = index.set_index(self.KEY)
+        hoy = hoy.set_index(self.KEY)
+        idx = idx.join(hoy, how="outer")
+
+        visto = pd.Series(idx.index.isin(hoy.index), index=idx.index)
+        nuevo = visto & idx["first_seen"].isna()
+        previo = visto & ~nuevo
+        precio = idx["precio_hoy"]
+
+        # Reaparece: existía pero no estaba en la ejecución anterior
+        if ultima is not None:
+            relist = previo & (idx["last_seen"] < ultima)
+        else:
+            relist = pd.Series(False, index=idx.index)
+
+        cambio = (
+            previo
+            & precio.notna()
+            & idx["last_price"].notna()
+            & (precio != idx["last_price"]).fillna(False)
+        )
+
+        idx.loc[nuevo, "first_seen"] = fecha
+        idx.loc[nuevo, "first_price"] = precio[nuevo]
+        idx.loc[nuevo, "dias_visto"] = 0
+        idx.loc[nuevo, "relistados"] = 0
+
+        idx.loc[cambio, "prev_price"] = idx.loc[cambio, "last_price"]
+        idx.loc[cambio, "price_changed_at"] = fecha
+        idx.loc[visto & precio.notna(), "last_price"] = precio[visto & precio.notna()]
+        idx["min_price"] = idx[["min_price", "last_price"]].min(axis=1).astype("Float64")
+
+        idx.loc[relist, "relistados"] = idx.loc[relist, "relistados"] + 1
+        idx.loc[relist, "last_relist"] = fecha
+
+        idx.loc[visto, "last_seen"] = fecha
+        idx.loc[visto, "dias_visto"] = idx.loc[visto, "dias_visto"] + 1
+        idx["web"] = idx["web"].fillna(idx["web_hoy"])
+
+        idx = idx.drop(columns=["web_hoy", "precio_hoy"])
+        idx.index.name = self.KEY
+        idx = idx.reset_index()
+        return idx[self.INDEX_COLS]
+
+    # ---------- lectura ----------
+    def load_index(self) -> pd.DataFrame:
+        path = self._index_path()
+        if not (self.available and os.path.exists(path)):
+            return self._empty_index()
+        return pd.read_parquet(path)
+
+    def load_snapshots(self, desde=None, hasta=None, columns=None) -> pd.DataFrame:
+        """Lee las fotos entre `desde` y `hasta` (incluidas) añadiendo la columna fecha."""
+        fechas = self.fechas()
+        if desde is not None:
+            fechas = [f for f in fechas if f >= _fecha_str(desde)]
+        if hasta is not None:
+            fechas = [f for f in fechas if f <= _fecha_str(hasta)]
+        frames = []
+        for fecha in fechas:
+            part = pd.read_parquet(
+                os.path.join(self._partition_dir(fecha), "part.parquet"),
+                columns=columns,
+            )
+            part["fecha"] = pd.Timestamp(fecha)
+            frames.append(part)
+        if not frames:
+            return pd.DataFrame(columns=list(columns or []) + ["fecha"])
+        return pd.concat(frames, ignore_index=True)
+
+    def price_drops(self, desde=None, min_pct: float = 0.0) -> pd.DataFrame:
+        """Anuncios cuyo último cambio de precio fue una bajada (opcionalmente desde una fecha)."""
+        idx = self.load_index()
+        drop = idx["last_price"] < idx["prev_price"]
+        mask = drop.fillna(False)
+        if desde is not None:
+            mask &= (idx["price_changed_at"] >= pd.Timestamp(_fecha_str(desde))).fillna(
+                False
+            )
+        out = idx[mask].copy()
+        out["bajada_pct"] = (
+            (out["prev_price"] - out["last_price"]) / out["prev_price"] * 100
+        ).astype("Float64")
+        out = out[out["bajada_pct"] >= min_pct]
+        return out.sort_values("bajada_pct", ascending=False).reset_index(drop=True)
+
+    def relists(self, desde=None) -> pd.DataFrame:
+        """Anuncios que desaparecieron en alguna ejecución y volvieron a publicarse."""
+        idx = self.load_index()
+        mask = (idx["relistados"] > 0).fillna(False)
+        if desde is not None:
+            mask &= (idx["last_relist"] >= pd.Timestamp(_fecha_str(desde))).fillna(False)
+        return idx[mask].sort_values("last_relist", ascending=False).reset_index(
+            drop=True
+        )
+
+    def days_on_market(self, solo_activos: bool = True) -> pd.DataFrame:
+        """
+        Días entre la primera y la última vez que se vio cada anuncio
+        (`dias_mercado`) y número de ejecuciones en que apareció (`dias_visto`).
+        Con `solo_activos` se limita a los presentes en la última foto.
+        """
+        idx = self.load_index()
+        idx["dias_mercado"] = (idx["last_seen"] - idx["first_seen"]).dt.days + 1
+        if solo_activos and len(idx):
+            idx = idx[idx["last_seen"] == idx["last_seen"].max()]
+        return idx.sort_values("dias_mercado", ascending=False).reset_index(drop=True)
+
+    def drop_partition(self, fecha) -> None:
+        """Elimina la foto de una fecha y reconstruye el índice."""
+        shutil.rmtree(self._partition_dir(_fecha_str(fecha)), ignore_errors=True)
+        if self.available:
+            self.rebuild_index()
@@ -0,0 +1,251 @@
+import bisect
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Huellas de páginas de bloqueo/anti-bot (DataDome, PerimeterX, Cloudflare,
+# Incapsula...). Se buscan en minúsculas.
+BLOCK_MARKERS = (
+    "captcha-delivery.com",
+    "geo.captcha-delivery",
+    "px-captcha",
+    "_incapsula_",
+    "cf-chl-",
+    "access denied",
+    "acceso denegado",
+    "uso indebido",
+)
+
+BLOCK_STATUS = {401, 403, 405, 429, 503}
+
+
+def make_http_session_from_browser(
+    browser,
+    domain: str,
+    referer: Optional[str] = None,
+    extra_headers: Optional[dict] = None,
+) -> requests.Session:
+    """
+    Sesión HTTP con el User-Agent y las cookies del navegador para `domain`
+    (p. ej. "fotocasa.es"). El navegador solo sirve para obtener cookies válidas.
+    """
+    sess = requests.Session()
+    try:
+        ua = browser.execute_script("return navigator.userAgent") or None
+    except Exception:
+        ua = None
+    if ua:
+        sess.headers.update({"User-Agent": ua})
+    sess.headers.update(
+        {
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
+        }
+    )
+    if referer:
+        sess.headers["Referer"] = referer
+    if extra_headers:
+        sess.headers.update(extra_headers)
+    try:
+        for c in browser.get_cookies():
+            try:
+                if domain in (c.get("domain") or ""):
+                    sess.cookies.set(
+                        c.get("name"),
+                        c.get("value"),
+                        domain=c.get("domain"),
+                        path=c.get("path", "/"),
+                    )
+            except Exception:
+                continue
+    except Exception:
+        pass
+    return sess
+
+
+# Límites superiores (segundos) de los tramos del histograma de latencia
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+class HttpStats:
+    """
+    Histogramas de latencia y de códigos de estado de una sesión (seguro entre
+    hilos). Los fallos de conexión cuentan con estado 0.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.latency = [0] * (len(self.buckets) + 1)
+        self.status = Counter()
+        self.total_s = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, status: int, elapsed: float) -> None:
+        with self._lock:
+            self.latency[bisect.bisect_left(self.buckets, elapsed)] += 1
+            self.status[int(status)] += 1
+            self.total_s += elapsed
+
+    @property
+    def requests(self) -> int:
+        return sum(self.status.values())
+
+    def _labels(self) -> list:
+        return [f"<={b}s" for b in self.buckets] + [f">{self.buckets[-1]}s"]
+
+    def _percentile(self, pct: float) -> str:
+        # Aproximado: tramo del histograma donde cae el percentil
+        n = sum(self.latency)
+        acc = 0
+        for label, c in zip(self._labels(), self.latency):
+            acc += c
+            if n and acc >= n * pct / 100:
+                return label
+        return "-"
+
+    def summary(self) -> str:
+        n = self.requests
+        if not n:
+            return "sin peticiones"
+        estados = " ".join(f"{k}:{v}" for k, v in sorted(self.status.items()))
+        tramos = " ".join(
+            f"{label}:{c}" for label, c in zip(self._labels(), self.latency) if c
+        )
+        return (
+            f"n={n} media={self.total_s / n:.3f}s p50{self._percentile(50)} "
+            f"p95{self._percentile(95)} estados=[{estados}] latencia=[{tramos}]"
+        )
+
+    def report(self, label: str = "") -> None:
+        print(f"[HTTP]{' ' + label if label else ''} {self.summary()}")
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter que anota en `stats` la latencia y el estado de cada petición."""
+
+    def __init__(self, *args, stats: Optional[HttpStats] = None, **kwargs):
+        self.stats = stats
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            resp = super().send(request, **kwargs)
+        except Exception:
+            if self.stats is not None:
+                self.stats.record(0, time.perf_counter() - t0)
+            raise
+        if self.stats is not None:
+            self.stats.record(resp.status_code, time.perf_counter() - t0)
+        return resp
+
+
+def mount_pool(
+    sess: requests.Session,
+    pool_size: int,
+    retries: int = 3,
+    backoff: float = 0.5,
+    status_forcelist: Sequence[int] = (429, 500, 502, 503, 504),
+    stats: Optional[HttpStats] = None,
+) -> requests.Session:
+    """
+    Monta en `sess` un adaptador con un pool de `pool_size` conexiones por
+    host (debe igualar el nº de hilos que comparten la sesión; el de requests
+    es de 10 y el resto de hilos abre y cierra conexiones) y reintentos con
+    backoff exponencial en 429/5xx respetando Retry-After. Solo para GET/HEAD.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=tuple(status_forcelist),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    size = max(1, int(pool_size))
+    adapter = InstrumentedAdapter(
+        pool_connections=size, pool_maxsize=size, max_retries=retry, stats=stats
+    )
+    sess.mount("https://", adapter)
+    sess.mount("http://", adapter)
+    return sess
+
+
+def looks_blocked(status: int, html: str) -> bool:
+    """True si la respuesta parece una página de bloqueo o captcha."""
+    if status in BLOCK_STATUS:
+        return True
+    head = (html or "")[:20000].lower()
+    return any(m in head for m in BLOCK_MARKERS)
+
+
+def looks_complete(html: str, required: Sequence[str]) -> bool:
+    """True si el HTML contiene al menos uno de los marcadores `required`."""
+    if not html:
+        return False
+    return any(m in html for m in required)
+
+
+def fetch_html(
+    session: requests.Session, url: str, timeout: float = 15.0
+) -> tuple:
+    """GET simple. Devuelve (status, html); (0, "") si falla la conexión."""
+    try:
+        r = session.get(url, timeout=timeout, allow_redirects=True)
+        return r.status_code, r.text or ""
+    except requests.RequestException:
+        return 0, ""
+
+
+def http_first_map(
+    items: Iterable,
+    task: Callable,
+    max_workers: int = 8,
+    max_consecutive_blocks: int = 5,
+) -> list:
+    """
+    Ejecuta `task(item)` en un pool de hilos y devuelve los resultados en el
+    orden de entrada. `task` devuelve el resultado o None si hay que caer al
+    navegador (bloqueo, HTML incompleto, error).
+
+    Si se encadenan `max_consecutive_blocks` fallos seguidos se asume que el
+    portal está bloqueando el HTTP y el resto de items se devuelve como None
+    sin pedirlos, para que vayan directamente al fallback con Selenium.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    if not items:
+        return results
+    lock = threading.Lock()
+    state = {"consecutive": 0}
+    tripped = threading.Event()
+
+    def _run(pos, item):
+        if tripped.is_set():
+            return
+        try:
+            r = task(item)
+        except Exception:
+            r = None
+        with lock:
+            if r is None:
+                state["consecutive"] += 1
+                if state["consecutive"] >= max_consecutive_blocks:
+                    tripped.set()
+            else:
+                state["consecutive"] = 0
+        results[pos] = r
+
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as ex:
+        for pos, item in enumerate(items):
+            ex.submit(_run, pos, item)
+    return results
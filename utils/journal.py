@@ -0,0 +1,139 @@
+"""
+Diario (journal) de fichas parseadas, de solo-añadir, para no perder horas de
+parseo si el proceso cae antes de escribir los CSV.
+
+Una línea JSON por ficha: {"key": url/id, "status": "ok"|"excluido", "row": {...}}.
+Cada línea se vuelca al sistema operativo al escribirse y se hace fsync por
+lotes (cada `fsync_every` líneas o `fsync_interval` segundos). Al relanzar el
+mismo día, `load()` devuelve lo ya parseado para saltarlo; al final el
+scraper compacta en inmuebles_new/today y llama a `discard()`.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from datetime import date
+from typing import Optional
+
+PARSE_RESUME = (os.getenv("PARSE_RESUME") or "true").lower() in ("1", "true", "yes")
+
+
+def _json_default(o):
+    # Escalares numpy/pandas -> Python; el resto como texto
+    try:
+        return o.item()
+    except Exception:
+        return str(o)
+
+
+class ParseJournal:
+    def __init__(self, path: str, fsync_every: int = 20, fsync_interval: float = 5.0):
+        self.path = path
+        self.fsync_every = max(1, int(fsync_every))
+        self.fsync_interval = float(fsync_interval)
+        self._lock = threading.Lock()
+        self._fh = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    @classmethod
+    def for_today(cls, base_dir: str, prefix: str = "parse", **kwargs) -> "ParseJournal":
+        """
+        Diario del día en <base_dir>/journal/<prefix>_<fecha>.jsonl. Borra los
+        diarios de días anteriores (ya no sirven para reanudar).
+        """
+        folder = os.path.join(base_dir, "journal")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{prefix}_{date.today().isoformat()}.jsonl")
+        for old in glob.glob(os.path.join(folder, f"{prefix}_*.jsonl")):
+            if old != path:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        return cls(path, **kwargs)
+
+    def load(self) -> dict:
+        """
+        {key: row} de lo ya registrado (row es None para fichas excluidas).
+        Ignora líneas corruptas, como una última línea a medio escribir.
+        """
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                key = rec.get("key")
+                if key is None:
+                    continue
+                done[str(key)] = rec.get("row") if rec.get("status") == "ok" else None
+        return done
+
+    def reset(self) -> None:
+        """Empieza un diario vacío (sin reanudación)."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def _open(self):
+        if self._fh is None:
+            # Si la última línea quedó cortada, empezar en línea nueva
+            needs_nl = False
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                with open(self.path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_nl = f.read(1) != b"\n"
+            self._fh = open(self.path, "a", encoding="utf-8")
+            if needs_nl:
+                self._fh.write("\n")
+        return self._fh
+
+    def append(self, key, row: Optional[dict], status: str = "ok") -> None:
+        """Registra una ficha (seguro entre hilos)."""
+        line = json.dumps(
+            {"key": str(key), "status": status, "row": row},
+            ensure_ascii=False,
+            default=_json_default,
+        )
+        with self._lock:
+            fh = self._open()
+            fh.write(line + "\n")
+            fh.flush()
+            self._pending += 1
+            now = time.monotonic()
+            if self._pending >= self.fsync_every or now - self._last_sync >= self.fsync_interval:
+                os.fsync(fh.fileno())
+                self._pending = 0
+                self._last_sync = now
+
+    def append_df(self, key, df) -> None:
+        """Registra un DataFrame de una fila (o una ficha excluida si viene vacío)."""
+        if df is None:
+            return
+        if df.empty:
+            self.append(key, None, status="excluido")
+        else:
+            self.append(key, df.iloc[0].to_dict())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                try:
+                    self._fh.flush()
+                    os.fsync(self._fh.fileno())
+                finally:
+                    self._fh.close()
+                    self._fh = None
+                    self._pending = 0
+
+    def discard(self) -> None:
+        """Cierra y borra el diario una vez compactado en los CSV."""
+        self.reset()
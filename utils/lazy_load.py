@@ -0,0 +1,166 @@
+"""
+Scroll hasta el fondo con una sola llamada a WebDriver.
+
+En lugar de un bucle Python con 3-4 execute_script por paso (scrollBy,
+scrollHeight, innerHeight, scrollY), se inyecta un script asíncrono que hace
+todo el bucle dentro de la página:
+  - MutationObserver cuenta los nodos nuevos que llegan por lazy-load
+  - IntersectionObserver sobre un centinela al final del body detecta el fondo
+  - se para cuando, estando en el fondo, ni las tarjetas ni la altura crecen
+    durante `stability_rounds` pasos seguidos
+y devuelve el recuento de tarjetas en el mismo execute_async_script.
+"""
+
+from typing import Optional
+
+# Recuento de tarjetas de resultados de Fotocasa (excluye recomendadores y
+# bloques de zonas adyacentes). Es el cuerpo de una función JS que devuelve un número.
+FOTOCASA_CARD_COUNT_JS = """
+  const isRealCard = (el) => (
+    !el.closest('.re-RecommenderSearch') &&
+    !el.closest('[class*="recommender-slider"]') &&
+    !el.closest('.re-SearchResultAdjacents') &&
+    !el.closest('[data-testid="recommender"]')
+  );
+  const sels = [
+    'article.container.w-full',
+    '[data-testid="re-Card"]',
+    'article[id^="re-Card"]',
+    'article[data-testid*="Card"]',
+    'article'
+  ];
+  for (const s of sels) {
+    const nodes = [...document.querySelectorAll(s)].filter(isRealCard);
+    if (nodes.length > 0) return nodes.length;
+  }
+  return 0;
+"""
+
+_SCROLL_JS = """
+const done = arguments[arguments.length - 1];
+const o = arguments[0];
+const countCards = o.countJs ? new Function(o.countJs) : () => 0;
+const safeCount = () => { try { return Number(countCards()) || 0; } catch (e) { return 0; } };
+const height = () => Math.max(
+  document.body ? document.body.scrollHeight : 0,
+  document.documentElement ? document.documentElement.scrollHeight : 0
+);
+const deadline = Date.now() + o.timeoutMs;
+
+// Nodos añadidos desde el último paso (carruseles/anuncios añaden pocos;
+// una página de resultados añade bloques enteros)
+let added = 0;
+const mo = new MutationObserver((muts) => {
+  for (const m of muts) added += m.addedNodes.length;
+});
+mo.observe(document.body, { childList: true, subtree: true });
+
+let sentinelVisible = false;
+const sentinel = document.createElement('div');
+sentinel.style.cssText = 'width:1px;height:1px;';
+document.body.appendChild(sentinel);
+const io = new IntersectionObserver((entries) => {
+  sentinelVisible = entries.some((e) => e.isIntersecting);
+});
+io.observe(sentinel);
+
+const atBottom = () => sentinelVisible ||
+  (window.scrollY + window.innerHeight) >= (height() - o.marginPx);
+
+let steps = 0, stable = 0, bottomHits = 0;
+let lastCount = safeCount(), lastHeight = height();
+
+const finish = (reason) => {
+  mo.disconnect();
+  io.disconnect();
+  sentinel.remove();
+  if (o.backUpPx) window.scrollBy(0, -o.backUpPx);
+  done({ cards: safeCount(), height: height(), steps: steps, reason: reason });
+};
+
+const tick = () => {
+  window.scrollBy(0, o.stepPx);
+  steps += 1;
+  setTimeout(() => {
+    const cnt = safeCount();
+    const h = height();
+    const grew = cnt > lastCount || h > lastHeight || added >= o.minAddedNodes;
+    added = 0;
+    stable = grew ? 0 : stable + 1;
+    lastCount = Math.max(lastCount, cnt);
+    lastHeight = Math.max(lastHeight, h);
+
+    if (atBottom() && stable >= o.stabilityRounds) {
+      bottomHits += 1;
+      // pequeño 'shake' para disparar los últimos observers de la página
+      window.scrollBy(0, -o.shakePx);
+      window.scrollBy(0, o.shakePx);
+      if (bottomHits >= o.bottomRounds) return finish('stable');
+    }
+    if (steps >= o.maxSteps) return finish('max_steps');
+    if (Date.now() > deadline) return finish('timeout');
+    tick();
+  }, o.pauseMs);
+};
+tick();
+"""
+
+
+def scroll_until_stable(
+    browser,
+    *,
+    count_js: Optional[str] = None,
+    step_px: int = 150,
+    pause_ms: int = 40,
+    stability_rounds: int = 4,
+    bottom_rounds: int = 2,
+    max_steps: int = 600,
+    margin_px: int = 64,
+    shake_px: int = 50,
+    back_up_px: int = 0,
+    min_added_nodes: int = 5,
+    timeout_s: float = 90.0,
+) -> dict:
+    """
+    Hace scroll hasta que la página deja de crecer estando en el fondo y
+    devuelve {cards, height, steps, reason}. `count_js` es el cuerpo de una
+    función JS que devuelve el número de tarjetas (0 si no se indica).
+
+    El timeout de scripts del navegador se amplía durante la llamada y se
+    restaura después. Si el script falla devuelve reason="error" y cards=0.
+    """
+    opts = {
+        "countJs": count_js or "",
+        "stepPx": int(step_px),
+        "pauseMs": int(pause_ms),
+        "stabilityRounds": int(stability_rounds),
+        "bottomRounds": int(bottom_rounds),
+        "maxSteps": int(max_steps),
+        "marginPx": int(margin_px),
+        "shakePx": int(shake_px),
+        "backUpPx": int(back_up_px),
+        "minAddedNodes": int(min_added_nodes),
+        "timeoutMs": int(timeout_s * 1000),
+    }
+    prev_timeout = None
+    try:
+        prev_timeout = browser.timeouts.script
+    except Exception:
+        pass
+    try:
+        browser.set_script_timeout(timeout_s + 10)
+        result = browser.execute_async_script(_SCROLL_JS, opts) or {}
+        return {
+            "cards": int(result.get("cards") or 0),
+            "height": int(result.get("height") or 0),
+            "steps": int(result.get("steps") or 0),
+            "reason": result.get("reason") or "",
+        }
+    except Exception:
+        return {"cards": 0, "height": 0, "steps": 0, "reason": "error"}
+    finally:
+        try:
+            if prev_timeout is not None:
+                browser.set_script_timeout(prev_timeout)
+        except Exception:
+            pass
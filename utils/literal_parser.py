@@ -0,0 +1,191 @@
+"""
+Parser rápido de literales Python (listas, tuplas, dicts, strings, números,
+None/True/False) para las celdas de zona/locations de los CSV.
+
+- Detección barata: si la cadena no empieza por un carácter que pueda abrir un
+  literal, se descarta sin intentar parsear (el caso habitual, texto plano).
+- Parser recursivo restringido para los literales que escribimos nosotros
+  (repr de listas/tuplas/dicts de strings). Ante cualquier construcción que no
+  reconozca delega en ast.literal_eval, así que el resultado es el mismo.
+- Resultados cacheados por valor. Los objetos devueltos se comparten entre
+  llamadas: no deben mutarse.
+"""
+
+import ast
+from functools import lru_cache
+
+_INVALID = object()
+_OPENERS = frozenset("[({'\"-+.0123456789")
+_KEYWORDS = {"None": None, "True": True, "False": False}
+_WS = " \t\r\n"
+
+
+class _Fallback(Exception):
+    """El parser restringido no cubre la entrada: usar ast.literal_eval."""
+
+
+def _skip_ws(s, i):
+    n = len(s)
+    while i < n and s[i] in _WS:
+        i += 1
+    return i
+
+
+def _parse_string(s, i):
+    quote = s[i]
+    end = s.find(quote, i + 1)
+    if end < 0:
+        raise _Fallback()
+    body = s[i + 1 : end]
+    if "\\" in body or "\n" in body:
+        # Escapes: que los resuelva ast
+        raise _Fallback()
+    return body, end + 1
+
+
+def _parse_number(s, i):
+    n = len(s)
+    j = i
+    if j < n and s[j] in "+-":
+        j += 1
+    while j < n and (s[j].isdigit() or s[j] in ".eE_+-"):
+        if s[j] in "+-" and s[j - 1] not in "eE":
+            break
+        j += 1
+    token = s[i:j]
+    if not any(c in token for c in ".eE"):
+        # Python no admite enteros con ceros a la izquierda ("01", "03801");
+        # int() sí, así que se dejan para ast (que los rechaza)
+        digits = token.lstrip("+-").replace("_", "")
+        if len(digits) > 1 and digits[0] == "0" and digits.strip("0"):
+            raise _Fallback()
+    try:
+        if any(c in token for c in ".eE"):
+            return float(token), j
+        return int(token), j
+    except ValueError:
+        raise _Fallback()
+
+
+def _parse_seq(s, i, close):
+    items = []
+    saw_comma = False
+    i = _skip_ws(s, i)
+    if i < len(s) and s[i] == close:
+        return items, saw_comma, i + 1
+    while True:
+        value, i = _parse_value(s, i)
+        items.append(value)
+        i = _skip_ws(s, i)
+        if i >= len(s):
+            raise _Fallback()
+        if s[i] == ",":
+            saw_comma = True
+            i = _skip_ws(s, i + 1)
+            if i < len(s) and s[i] == close:
+                return items, saw_comma, i + 1
+            continue
+        if s[i] == close:
+            return items, saw_comma, i + 1
+        raise _Fallback()
+
+
+def _parse_dict(s, i):
+    out = {}
+    i = _skip_ws(s, i)
+    if i < len(s) and s[i] == "}":
+        return out, i + 1
+    while True:
+        key, i = _parse_value(s, i)
+        i = _skip_ws(s, i)
+        if i >= len(s) or s[i] != ":":
+            raise _Fallback()
+        value, i = _parse_value(s, i + 1)
+        try:
+            out[key] = value
+        except TypeError:
+            raise _Fallback()
+        i = _skip_ws(s, i)
+        if i >= len(s):
+            raise _Fallback()
+        if s[i] == ",":
+            i = _skip_ws(s, i + 1)
+            if i < len(s) and s[i] == "}":
+                return out, i + 1
+            continue
+        if s[i] == "}":
+            return out, i + 1
+        raise _Fallback()
+
+
+def _parse_value(s, i):
+    i = _skip_ws(s, i)
+    if i >= len(s):
+        raise _Fallback()
+    c = s[i]
+    if c in "'\"":
+        return _parse_string(s, i)
+    if c == "[":
+        items, _, i = _parse_seq(s, i + 1, "]")
+        return items, i
+    if c == "(":
+        items, saw_comma, i = _parse_seq(s, i + 1, ")")
+        if len(items) == 1 and not saw_comma:
+            return items[0], i  # paréntesis de agrupación, no tupla
+        return tuple(items), i
+    if c == "{":
+        return _parse_dict(s, i + 1)
+    if c.isdigit() or c in "+-.":
+        return _parse_number(s, i)
+    for word, value in _KEYWORDS.items():
+        if s.startswith(word, i):
+            j = i + len(word)
+            if j >= len(s) or not (s[j].isalnum() or s[j] == "_"):
+                return value, j
+    raise _Fallback()
+
+
+@lru_cache(maxsize=65536)
+def _parse_cached(s):
+    try:
+        value, i = _parse_value(s, 0)
+        if _skip_ws(s, i) == len(s):
+            return value
+    except (_Fallback, RecursionError):
+        pass
+    try:
+        return ast.literal_eval(s)
+    except Exception:
+        return _INVALID
+
+
+def looks_like_literal(s):
+    """True si la cadena podría ser un literal Python (test O(1))."""
+    if not s:
+        return False
+    return s[0] in _OPENERS or s in _KEYWORDS
+
+
+def parse_literal(value, default=None):
+    """
+    Equivalente a ast.literal_eval(value.strip()) devolviendo `default` si no
+    es un literal válido. Los valores que no son str devuelven `default`.
+    """
+    if not isinstance(value, str):
+        return default
+    s = value.strip()
+    if not looks_like_literal(s):
+        return default
+    parsed = _parse_cached(s)
+    return default if parsed is _INVALID else parsed
+
+
+def parse_list_literal(value):
+    """Lista/tupla si `value` es una cadena con sintaxis de lista o tupla; si no, None."""
+    if not isinstance(value, str):
+        return None
+    s = value.strip()
+    if not s or s[0] not in "[(":
+        return None
+    parsed = _parse_cached(s)
+    return parsed if isinstance(parsed, (list, tuple)) else None
@@ -0,0 +1,215 @@
+"""
+Bloqueo de red a nivel CDP común a todos los Chrome de los scrapers.
+
+`Network.setBlockedURLs` corta en el propio navegador anuncios, analítica,
+trackers, teselas de mapas, vídeo y (según el portal) imágenes y fuentes, antes
+de que se descarguen. Cada portal parte de la lista común y puede añadir
+patrones propios o liberar los que necesita (p. ej. Idealista deja pasar las
+imágenes porque el captcha de DataDome las usa).
+
+El tipo de recurso se bloquea por extensión dentro de la misma lista: la
+interceptación con `Fetch.enable` exige atender eventos `requestPaused` y
+Selenium solo expone comandos CDP síncronos.
+
+Para las estadísticas se activa el log de rendimiento de ChromeDriver
+(`goog:loggingPrefs`) y `collect(browser)` lo vacía sumando peticiones
+bloqueadas por tipo y bytes descargados. Los bytes ahorrados son una
+estimación: media observada del mismo tipo en la ejecución o, si no hay
+muestras, un tamaño típico.
+"""
+
+import json
+import os
+import threading
+from collections import Counter
+
+NET_BLOCKING = (os.getenv("NET_BLOCKING") or "true").lower() in ("1", "true", "yes")
+NET_BLOCKING_STATS = (os.getenv("NET_BLOCKING_STATS") or "true").lower() in ("1", "true", "yes")
+
+IMAGE_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"]
+FONT_PATTERNS = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+MEDIA_PATTERNS = [
+    "*.mp4", "*.webm", "*.m3u8", "*.mp3", "*.m4a", "*.avi", "*.mov", "*.mkv", "*.flac",
+    "*youtube.com/embed*", "*ytimg.com*", "*player.vimeo.com*", "*vimeocdn.com*",
+]
+TRACKER_PATTERNS = [
+    "*googletagmanager.com*", "*google-analytics.com*", "*analytics.google.com*",
+    "*doubleclick.net*", "*googlesyndication.com*", "*googleadservices.com*",
+    "*adservice.google.*", "*amazon-adsystem.com*", "*criteo.com*", "*criteo.net*",
+    "*taboola.com*", "*outbrain.com*", "*connect.facebook.net*", "*facebook.com/tr*",
+    "*hotjar.com*", "*clarity.ms*", "*bat.bing.com*", "*scorecardresearch.com*",
+    "*tiqcdn.com*", "*omtrdc.net*", "*demdex.net*", "*newrelic.com*", "*nr-data.net*",
+    "*adnxs.com*", "*rubiconproject.com*", "*pubmatic.com*", "*smartadserver.com*",
+    "*tiktok.com/i18n/pixel*", "*analytics.tiktok.com*", "*snap.licdn.com*",
+]
+MAP_TILE_PATTERNS = [
+    "*tile.openstreetmap.org*", "*tiles.stadiamaps.com*", "*api.mapbox.com/*tiles*",
+    "*maps.googleapis.com/maps/vt*", "*maps.googleapis.com/maps/api/staticmap*",
+    "*khms*.googleapis.com*", "*maps.gstatic.com/mapfiles*",
+]
+
+COMMON_BLOCKLIST = TRACKER_PATTERNS + MAP_TILE_PATTERNS + MEDIA_PATTERNS + FONT_PATTERNS + IMAGE_PATTERNS
+
+# Perfiles por portal: `block` se añade a la lista común y `allow` retira de
+# ella los patrones que contengan alguno de sus textos.
+PORTAL_PROFILES = {
+    "fotocasa": {"block": [], "allow": []},
+    # Las imágenes del captcha de DataDome tienen que cargar para poder resolverlo
+    "idealista": {"block": [], "allow": IMAGE_PATTERNS},
+    "pico_blanes": {"block": [], "allow": []},
+    "ego": {"block": [], "allow": []},
+}
+
+# Tamaño típico (bytes) por tipo de recurso CDP cuando no hay muestras propias
+TYPICAL_BYTES = {
+    "Image": 45_000,
+    "Font": 35_000,
+    "Media": 400_000,
+    "Script": 60_000,
+    "Stylesheet": 25_000,
+    "XHR": 4_000,
+    "Fetch": 4_000,
+    "Ping": 500,
+    "Other": 8_000,
+}
+
+
+def blocked_patterns(portal: str) -> list:
+    """Lista final de patrones para `portal` (común + propios − permitidos)."""
+    profile = PORTAL_PROFILES.get(portal, {})
+    allow = profile.get("allow") or []
+    patterns = []
+    for p in COMMON_BLOCKLIST + list(profile.get("block") or []):
+        if p in patterns or any(a in p for a in allow):
+            continue
+        patterns.append(p)
+    return patterns
+
+
+def configure_options(opts) -> None:
+    """
+    Activa el log de rendimiento (solo eventos de red) en unas ChromeOptions
+    para poder medir lo ahorrado. No hace nada si las estadísticas están
+    desactivadas.
+    """
+    if not (NET_BLOCKING and NET_BLOCKING_STATS):
+        return
+    try:
+        opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        opts.add_experimental_option(
+            "perfLoggingPrefs", {"enableNetwork": True, "enablePage": False}
+        )
+    except Exception:
+        pass
+
+
+def apply_blocking(browser, portal: str) -> list:
+    """
+    Activa `Network.setBlockedURLs` con el perfil de `portal` en un navegador ya
+    creado. Devuelve los patrones aplicados ([] si está desactivado o falla).
+    """
+    if not NET_BLOCKING:
+        return []
+    patterns = blocked_patterns(portal)
+    try:
+        browser.execute_cdp_cmd("Network.enable", {})
+        browser.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception:
+        return []
+    return patterns
+
+
+class NetBlockStats:
+    """Acumulador (seguro entre hilos) de peticiones bloqueadas y bytes de una ejecución."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_downloaded = 0
+        self.blocked = Counter()
+        self._bytes_by_type = Counter()
+        self._count_by_type = Counter()
+
+    def collect(self, browser) -> None:
+        """Vacía el log de rendimiento del navegador y suma sus eventos de red."""
+        if not (NET_BLOCKING and NET_BLOCKING_STATS):
+            return
+        try:
+            entries = browser.get_log("performance")
+        except Exception:
+            return
+        types = {}
+        requests = 0
+        downloaded = 0
+        blocked = Counter()
+        bytes_by_type = Counter()
+        count_by_type = Counter()
+        for entry in entries:
+            try:
+                msg = json.loads(entry["message"])["message"]
+            except Exception:
+                continue
+            method = msg.get("method")
+            params = msg.get("params") or {}
+            if method == "Network.requestWillBeSent":
+                requests += 1
+                types[params.get("requestId")] = params.get("type") or "Other"
+            elif method == "Network.loadingFinished":
+                size = int(params.get("encodedDataLength") or 0)
+                rtype = types.pop(params.get("requestId"), "Other")
+                downloaded += size
+                bytes_by_type[rtype] += size
+                count_by_type[rtype] += 1
+            elif method == "Network.loadingFailed":
+                rtype = params.get("type") or types.get(params.get("requestId")) or "Other"
+                types.pop(params.get("requestId"), None)
+                if params.get("blockedReason") == "inspector" or "BLOCKED_BY_CLIENT" in (
+                    params.get("errorText") or ""
+                ):
+                    blocked[rtype] += 1
+        with self._lock:
+            self.requests += requests
+            self.bytes_downloaded += downloaded
+            self.blocked.update(blocked)
+            self._bytes_by_type.update(bytes_by_type)
+            self._count_by_type.update(count_by_type)
+
+    def _avg_bytes(self, rtype: str) -> int:
+        n = self._count_by_type.get(rtype, 0)
+        if n:
+            return int(self._bytes_by_type[rtype] / n)
+        return TYPICAL_BYTES.get(rtype, TYPICAL_BYTES["Other"])
+
+    def summary(self) -> dict:
+        with self._lock:
+            blocked_total = sum(self.blocked.values())
+            saved = sum(self._avg_bytes(t) * n for t, n in self.blocked.items())
+            return {
+                "peticiones": self.requests,
+                "bloqueadas": blocked_total,
+                "bloqueadas_por_tipo": dict(self.blocked.most_common()),
+                "mb_descargados": round(self.bytes_downloaded / 1_048_576, 2),
+                "mb_ahorrados_est": round(saved / 1_048_576, 2),
+            }
+
+    def report(self, label: str = "") -> dict:
+        """Imprime y devuelve el resumen de la ejecución."""
+        s = self.summary()
+        if NET_BLOCKING and NET_BLOCKING_STATS:
+            pct = (s["bloqueadas"] / s["peticiones"] * 100) if s["peticiones"] else 0.0
+            print(
+                f"[NET]{' ' + label if label else ''} peticiones={s['peticiones']} "
+                f"bloqueadas={s['bloqueadas']} ({pct:.1f}%) "
+                f"descargado={s['mb_descargados']} MB ahorrado≈{s['mb_ahorrados_est']} MB "
+                f"por_tipo={s['bloqueadas_por_tipo']}"
+            )
+        return s
+
+
+# Un acumulador por proceso: cada scraper se lanza como script independiente
+run_stats = NetBlockStats()
+
+
+def collect(browser) -> None:
+    """Atajo para `run_stats.collect(browser)`; llamar antes de quit/limpiezas."""
+    run_stats.collect(browser)
@@ -0,0 +1,181 @@
+"""
+Caché en disco del HTML de las fichas, comprimido (zstd si está instalado,
+gzip si no) y repartido en subcarpetas por el hash de la URL canónica.
+
+Cada entrada guarda una cabecera JSON (url, fecha de descarga) y el HTML. Las
+ejecuciones online solo escriben (una ficha siempre se descarga: el precio
+puede haber cambiado); se lee en modo offline (PAGE_CACHE_OFFLINE), donde la
+caché es la única fuente y se puede volver a parsear un día entero sin red.
+Por eso no hay caducidad: la última versión guardada es la que vale.
+`evict()` recorta la caché a `max_mb` borrando primero las entradas más
+antiguas.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+try:
+    import zstandard as zstd
+except ImportError:  # pragma: no cover - zstd es opcional
+    zstd = None
+
+PAGE_CACHE = (os.getenv("PAGE_CACHE") or "true").lower() in ("1", "true", "yes")
+PAGE_CACHE_OFFLINE = (os.getenv("PAGE_CACHE_OFFLINE") or "false").lower() in ("1", "true", "yes")
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR") or ""
+PAGE_CACHE_MAX_MB = int(os.getenv("PAGE_CACHE_MAX_MB") or "2048")
+
+_EXTS = (".html.zst", ".html.gz")
+
+
+def _compress(data: bytes) -> tuple:
+    if zstd is not None:
+        return zstd.ZstdCompressor(level=10).compress(data), ".html.zst"
+    return gzip.compress(data, compresslevel=6), ".html.gz"
+
+
+def _decompress(data: bytes, ext: str) -> bytes:
+    if ext == ".html.zst":
+        if zstd is None:
+            raise ValueError("entrada zstd sin el paquete zstandard")
+        return zstd.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class PageCache:
+    def __init__(
+        self,
+        root,
+        max_mb: int = PAGE_CACHE_MAX_MB,
+        offline: bool = PAGE_CACHE_OFFLINE,
+        enabled: bool = PAGE_CACHE,
+    ):
+        self.root = Path(root)
+        self.max_bytes = int(max_mb) * 1024 * 1024
+        self.offline = bool(offline)
+        # En offline la caché es imprescindible aunque se haya desactivado
+        self.enabled = bool(enabled) or self.offline
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @classmethod
+    def for_portal(cls, repo_root, portal: str, **kwargs) -> "PageCache":
+        """Caché de un portal en PAGE_CACHE_DIR o <repo>/.cache/pages/<portal>."""
+        base = Path(PAGE_CACHE_DIR) if PAGE_CACHE_DIR else Path(repo_root) / ".cache" / "pages"
+        return cls(base / portal, **kwargs)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(str(url).strip().encode("utf-8")).hexdigest()
+
+    def _stem(self, url: str) -> Path:
+        k = self.key(url)
+        return self.root / k[:2] / k[2:4] / k
+
+    def _find(self, url: str) -> Optional[Path]:
+        stem = self._stem(url)
+        for ext in _EXTS:
+            p = stem.with_name(stem.name + ext)
+            if p.exists():
+                return p
+        return None
+
+    def get(self, url: str) -> Optional[str]:
+        """HTML cacheado de `url` o None si no hay entrada."""
+        if not self.enabled:
+            return None
+        path = self._find(url)
+        if path is None:
+            self._count("misses")
+            return None
+        try:
+            raw = _decompress(path.read_bytes(), "".join(path.suffixes[-2:]))
+            header, _, body = raw.partition(b"\n")
+            json.loads(header)
+        except Exception:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return body.decode("utf-8", errors="replace")
+
+    def put(self, url: str, html: str) -> None:
+        """Guarda el HTML de `url` (escritura atómica)."""
+        if not self.enabled or not html:
+            return
+        header = json.dumps({"url": str(url), "ts": time.time()}).encode("utf-8")
+        data, ext = _compress(header + b"\n" + html.encode("utf-8"))
+        stem = self._stem(url)
+        path = stem.with_name(stem.name + ext)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            # Una entrada previa con el otro compresor quedaría obsoleta
+            for ext_old in _EXTS:
+                if ext_old != ext:
+                    stem.with_name(stem.name + ext_old).unlink(missing_ok=True)
+            self._count("stores")
+        except OSError:
+            pass
+
+    def iter_entries(self):
+        """Recorre la caché entera (sin mirar la caducidad) como pares (url, html)."""
+        if not self.root.exists():
+            return
+        for path in sorted(self.root.rglob("*.html.*")):
+            ext = "".join(path.suffixes[-2:])
+            if ext not in _EXTS:
+                continue
+            try:
+                header, _, body = _decompress(path.read_bytes(), ext).partition(b"\n")
+                url = json.loads(header).get("url")
+            except Exception:
+                continue
+            if url:
+                yield url, body.decode("utf-8", errors="replace")
+
+    def evict(self) -> int:
+        """Borra las entradas más antiguas hasta quedar bajo `max_mb`. Devuelve cuántas."""
+        if not self.enabled or not self.root.exists():
+            return 0
+        entries = []
+        total = 0
+        for p in self.root.rglob("*.html.*"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        removed = 0
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def report(self, label: str = "") -> None:
+        if self.enabled:
+            print(
+                f"[CACHE]{' ' + label if label else ''} hits={self.hits} "
+                f"misses={self.misses} guardadas={self.stores}"
+                f"{' (offline)' if self.offline else ''}"
+            )
+
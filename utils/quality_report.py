@@ -0,0 +1,223 @@
+import glob
+import html
+import json
+import os
+from datetime import date
+from typing import Optional
+
+import pandas as pd
+
+# Valores de relleno que el merge usa en lugar de NaN: no cuentan como fallo de
+# conversión, pero sí como nulos.
+PLACEHOLDERS = {"A consultar", "Desconocido", "", "nan", "None", "-"}
+
+NUMERIC_COLS = ["precio", "metros_cuadrados", "habitaciones", "baños"]
+
+RANGES = {
+    "precio": (50, 50_000_000),
+    "metros_cuadrados": (5, 1_000_000),
+    "habitaciones": (0, 50),
+    "baños": (0, 30),
+}
+
+DEFAULT_THRESHOLDS = {
+    # tasa máxima de nulos/relleno por columna
+    "max_null_rate": {"link_inmueble": 0.0, "web": 0.0, "precio": 0.5},
+    # tasa máxima de valores no convertibles a número
+    "max_coercion_rate": 0.02,
+    # tasa máxima de valores fuera de rango
+    "max_out_of_range_rate": 0.05,
+    # tasa máxima de zonas sin municipio reconocido
+    "max_unknown_zona_rate": 0.35,
+    # caída máxima (%) de filas de un portal respecto al informe anterior
+    "max_portal_drop_pct": 50.0,
+    # filas mínimas por portal
+    "min_rows_per_portal": 1,
+}
+
+
+def _zona_conocida(valor) -> bool:
+    """True si la zona normalizada tiene al menos un municipio reconocido."""
+    items = valor if isinstance(valor, list) else [valor]
+    for item in items:
+        if isinstance(item, tuple) and len(item) == 2 and isinstance(item[1], dict):
+            if item[1].get("municipio"):
+                return True
+    return False
+
+
+def _rates(flags: pd.DataFrame, portal: pd.Series) -> dict:
+    """Tasa global y por portal de cada columna booleana de `flags`."""
+    total = flags.mean().round(4)
+    por_portal = flags.groupby(portal, observed=True).mean().round(4)
+    return {
+        "total": total.to_dict(),
+        "por_portal": {str(k): v for k, v in por_portal.to_dict(orient="index").items()},
+    }
+
+
+def profile_unificado(df: pd.DataFrame, portal_col: str = "web") -> dict:
+    """
+    Perfil de calidad de la tabla unificada en una pasada por columna:
+    nulos, fallos de conversión numérica, fuera de rango y zonas desconocidas,
+    globales y por portal.
+    """
+    n = len(df)
+    portal = df[portal_col].astype(str) if portal_col in df else pd.Series("?", index=df.index)
+
+    as_str = df.astype("string")
+    nulls = df.isna() | as_str.apply(lambda s: s.str.strip()).isin(PLACEHOLDERS)
+
+    num_cols = [c for c in NUMERIC_COLS if c in df]
+    nums = df[num_cols].apply(pd.to_numeric, errors="coerce")
+    coercion = nums.isna() & ~nulls[num_cols]
+
+    lo = pd.Series({c: RANGES[c][0] for c in num_cols})
+    hi = pd.Series({c: RANGES[c][1] for c in num_cols})
+    out_of_range = nums.notna() & (nums.lt(lo) | nums.gt(hi))
+
+    if "zona" in df:
+        zona_unknown = ~df["zona"].map(_zona_conocida).astype(bool)
+    else:
+        zona_unknown = pd.Series(True, index=df.index)
+
+    filas = portal.value_counts().sort_index()
+    return {
+        "fecha": date.today().isoformat(),
+        "filas": int(n),
+        "filas_por_portal": {str(k): int(v) for k, v in filas.items()},
+        "nulos": _rates(nulls, portal),
+        "conversion": _rates(coercion, portal),
+        "fuera_de_rango": _rates(out_of_range, portal),
+        "zona_desconocida": _rates(zona_unknown.to_frame("zona"), portal),
+        "numericos": {
+            c: {
+                "min": None if nums[c].dropna().empty else float(nums[c].min()),
+                "mediana": None if nums[c].dropna().empty else float(nums[c].median()),
+                "max": None if nums[c].dropna().empty else float(nums[c].max()),
+            }
+            for c in num_cols
+        },
+    }
+
+
+def add_deltas(report: dict, previous: Optional[dict]) -> dict:
+    """Añade la variación de filas por portal respecto al informe anterior."""
+    deltas = {}
+    prev_rows = (previous or {}).get("filas_por_portal") or {}
+    for portal in sorted(set(prev_rows) | set(report["filas_por_portal"])):
+        hoy = report["filas_por_portal"].get(portal, 0)
+        antes = prev_rows.get(portal)
+        pct = None
+        if antes:
+            pct = round((hoy - antes) / antes * 100, 2)
+        deltas[portal] = {"hoy": hoy, "anterior": antes, "delta_pct": pct}
+    report["deltas_por_portal"] = deltas
+    report["informe_anterior"] = (previous or {}).get("fecha")
+    return report
+
+
+def evaluate(report: dict, thresholds: Optional[dict] = None) -> list:
+    """Lista de anomalías (texto) que superan los umbrales."""
+    th = dict(DEFAULT_THRESHOLDS)
+    th.update(thresholds or {})
+    # Los límites de nulos se fijan por columna: un fichero que solo ajusta una
+    # no debe quitar los de las demás
+    th["max_null_rate"] = {
+        **DEFAULT_THRESHOLDS["max_null_rate"],
+        **((thresholds or {}).get("max_null_rate") or {}),
+    }
+    issues = []
+
+    for col, limit in (th.get("max_null_rate") or {}).items():
+        rate = report["nulos"]["total"].get(col)
+        if rate is not None and rate > limit:
+            issues.append(f"nulos en {col}: {rate:.2%} > {limit:.2%}")
+
+    for key, name in (("conversion", "max_coercion_rate"), ("fuera_de_rango", "max_out_of_range_rate")):
+        limit = th[name]
+        for col, rate in report[key]["total"].items():
+            if rate > limit:
+                issues.append(f"{key} en {col}: {rate:.2%} > {limit:.2%}")
+
+    rate = report["zona_desconocida"]["total"].get("zona", 0.0)
+    if rate > th["max_unknown_zona_rate"]:
+        issues.append(f"zonas desconocidas: {rate:.2%} > {th['max_unknown_zona_rate']:.2%}")
+
+    for portal, d in (report.get("deltas_por_portal") or {}).items():
+        if d["hoy"] < th["min_rows_per_portal"]:
+            issues.append(f"{portal}: {d['hoy']} filas (mínimo {th['min_rows_per_portal']})")
+        elif d["delta_pct"] is not None and -d["delta_pct"] > th["max_portal_drop_pct"]:
+            issues.append(
+                f"{portal}: {d['hoy']} filas vs {d['anterior']} ({d['delta_pct']}%)"
+            )
+
+    report["anomalias"] = issues
+    return issues
+
+
+def _html_table(data: dict, title: str) -> str:
+    frame = pd.DataFrame(data)
+    return f"<h2>{html.escape(title)}</h2>\n" + frame.to_html(na_rep="", float_format="{:.4f}".format)
+
+
+def write_report(report: dict, out_dir: str) -> str:
+    """
+    Escribe quality_<fecha>.json (histórico de informes) y quality_report.html
+    (último). Devuelve la ruta del JSON.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    json_path = os.path.join(out_dir, f"quality_{report['fecha']}.json")
+    tmp = f"{json_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=float)
+    os.replace(tmp, json_path)
+
+    parts = [
+        "<html><head><meta charset='utf-8'><title>Calidad merge</title></head><body>",
+        f"<h1>Calidad de inmuebles_unificado — {html.escape(report['fecha'])}</h1>",
+        f"<p>Filas: {report['filas']} | informe anterior: {html.escape(str(report.get('informe_anterior')))}</p>",
+    ]
+    anomalias = report.get("anomalias") or []
+    if anomalias:
+        parts.append("<h2>Anomalías</h2><ul>")
+        parts += [f"<li>{html.escape(a)}</li>" for a in anomalias]
+        parts.append("</ul>")
+    else:
+        parts.append("<p>Sin anomalías.</p>")
+    parts.append(_html_table(report.get("deltas_por_portal") or {}, "Filas por portal"))
+    for key in ("nulos", "conversion", "fuera_de_rango", "zona_desconocida"):
+        parts.append(_html_table(report[key]["por_portal"], f"{key} por portal"))
+    parts.append(_html_table(report["numericos"], "Numéricos"))
+    parts.append("</body></html>")
+    with open(os.path.join(out_dir, "quality_report.html"), "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+    return json_path
+
+
+def load_previous(out_dir: str, antes_de: Optional[str] = None) -> Optional[dict]:
+    """Último informe guardado con fecha anterior a `antes_de` (hoy por defecto)."""
+    antes_de = antes_de or date.today().isoformat()
+    candidatos = sorted(
+        p
+        for p in glob.glob(os.path.join(out_dir, "quality_*.json"))
+        if os.path.basename(p)[len("quality_"):-len(".json")] < antes_de
+    )
+    if not candidatos:
+        return None
+    try:
+        with open(candidatos[-1], "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def run_quality_report(
+    df: pd.DataFrame, out_dir: str, thresholds: Optional[dict] = None
+) -> dict:
+    """Perfila, compara con el informe anterior, evalúa umbrales y escribe el informe."""
+    report = profile_unificado(df)
+    add_deltas(report, load_previous(out_dir, report["fecha"]))
+    evaluate(report, thresholds)
+    write_report(report, out_dir)
+    return report
@@ -0,0 +1,133 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class HostRateLimiter:
+    """
+    Limitador educado por host: garantiza al menos `min_interval` segundos entre
+    el inicio de dos peticiones al mismo host, aunque las lancen hilos distintos.
+    Cada hilo reserva su turno bajo el lock y duerme fuera de él.
+    """
+
+    def __init__(self, min_interval: float = 0.5):
+        self.min_interval = max(0.0, float(min_interval))
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> float:
+        """Bloquea hasta que le toque a `url`. Devuelve los segundos esperados."""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class AdaptivePacer:
+    """
+    Control de ritmo AIMD para un único flujo de peticiones (p. ej. un
+    navegador). Trabaja sobre la tasa (peticiones/s = 1/espera):
+      - cada respuesta sana suma `increase` a la tasa (la espera baja poco a poco)
+      - cada señal de bloqueo/captcha multiplica la tasa por `decrease`
+        (la espera sube de golpe) y congela las subidas durante `hold`
+        respuestas sanas
+      - las señales leves (página vacía o incompleta) usan `soft_decrease`
+    La espera real lleva un jitter de ±`jitter` para no marcar un patrón fijo.
+    """
+
+    def __init__(
+        self,
+        initial: float,
+        min_delay: float,
+        max_delay: float,
+        *,
+        increase: float = 0.02,
+        decrease: float = 0.5,
+        soft_decrease: float = 0.85,
+        hold: int = 5,
+        jitter: float = 0.2,
+    ):
+        self.min_delay = max(0.0, float(min_delay))
+        self.max_delay = max(self.min_delay, float(max_delay))
+        self.delay = min(self.max_delay, max(self.min_delay, float(initial)))
+        self.increase = float(increase)
+        self.decrease = float(decrease)
+        self.soft_decrease = float(soft_decrease)
+        self.hold = int(hold)
+        self.jitter = max(0.0, min(0.9, float(jitter)))
+        self._hold_left = 0
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.slept = 0.0
+        self.ok_count = 0
+        self.penalties = {}
+        self.min_seen = self.delay
+        self.max_seen = self.delay
+
+    def _set_rate(self, rate: float) -> None:
+        delay = 1.0 / rate if rate > 0 else self.max_delay
+        self.delay = min(self.max_delay, max(self.min_delay, delay))
+        self.min_seen = min(self.min_seen, self.delay)
+        self.max_seen = max(self.max_seen, self.delay)
+
+    def wait(self) -> float:
+        """Duerme la espera actual (con jitter). Devuelve los segundos dormidos."""
+        with self._lock:
+            delay = self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self.waits += 1
+            self.slept += delay
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def ok(self) -> None:
+        """Respuesta sana: subida aditiva de la tasa (salvo tras una penalización)."""
+        with self._lock:
+            self.ok_count += 1
+            if self._hold_left > 0:
+                self._hold_left -= 1
+                return
+            if self.delay > 0:
+                self._set_rate(1.0 / self.delay + self.increase)
+
+    def penalize(self, reason: str = "bloqueo", soft: bool = False) -> None:
+        """Señal de bloqueo (o leve si `soft`): bajada multiplicativa de la tasa."""
+        with self._lock:
+            self.penalties[reason] = self.penalties.get(reason, 0) + 1
+            factor = self.soft_decrease if soft else self.decrease
+            rate = 1.0 / self.delay if self.delay > 0 else 1.0 / max(self.min_delay, 1e-3)
+            self._set_rate(rate * factor)
+            if not soft:
+                self._hold_left = self.hold
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "esperas": self.waits,
+                "dormido_s": round(self.slept, 1),
+                "espera_media_s": round(self.slept / self.waits, 2) if self.waits else None,
+                "espera_final_s": round(self.delay, 2),
+                "espera_min_s": round(self.min_seen, 2),
+                "espera_max_s": round(self.max_seen, 2),
+                "peticiones_min": round(60.0 / self.delay, 1) if self.delay else None,
+                "ok": self.ok_count,
+                "penalizaciones": dict(self.penalties),
+            }
+
+    def report(self, label: str = "") -> dict:
+        """Imprime y devuelve las estadísticas de la ejecución."""
+        s = self.stats()
+        print(
+            f"[PACE]{' ' + label if label else ''} esperas={s['esperas']} "
+            f"dormido={s['dormido_s']}s media={s['espera_media_s']}s "
+            f"final={s['espera_final_s']}s (~{s['peticiones_min']}/min) "
+            f"rango=[{s['espera_min_s']}, {s['espera_max_s']}]s "
+            f"ok={s['ok']} penalizaciones={s['penalizaciones']}"
+        )
+        return s
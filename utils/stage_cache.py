@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+import pandas as pd
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hash SHA-256 del contenido del fichero, leído por bloques."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class StageCache:
+    """
+    Caché direccionada por contenido para los intermedios del merge.
+
+    - Cada entrada se identifica por (size, mtime_ns, sha256). Si size y mtime
+      coinciden con el manifiesto no se vuelve a leer el fichero; si cambian se
+      recalcula el hash y, si el contenido es idéntico, se reutiliza igualmente.
+    - Los intermedios se guardan como pickle de pandas para conservar los
+      objetos Python (tuplas/dicts de zona_std) sin reparsear.
+    - `version` forma parte de la clave: cambiarla invalida toda la caché.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, cache_dir: str, version: str = "", enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.version = version
+        self.enabled = enabled
+        self._manifest = {}
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            try:
+                with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                    self._manifest = json.load(f) or {}
+            except Exception:
+                self._manifest = {}
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, self.MANIFEST)
+
+    def fingerprint(self, path: str) -> dict:
+        """Devuelve {size, mtime_ns, sha256} reutilizando el hash si el stat no cambió."""
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        prev = self._manifest.get(key) or {}
+        if (
+            prev.get("size") == st.st_size
+            and prev.get("mtime_ns") == st.st_mtime_ns
+            and prev.get("sha256")
+        ):
+            sha = prev["sha256"]
+        else:
+            sha = file_sha256(path)
+        fp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+        self._manifest[key] = fp
+        return fp
+
+    def _entry_path(self, stage: str, fp: dict) -> str:
+        key = hashlib.sha256(f"{fp['sha256']}:{self.version}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{stage}-{key[:24]}.pkl")
+
+    def load(self, stage: str, fp: dict) -> Optional[pd.DataFrame]:
+        if not self.enabled:
+            return None
+        path = self._entry_path(stage, fp)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_pickle(path)
+        except Exception:
+            # Entrada corrupta: se ignora y se recalcula
+            return None
+
+    def store(self, stage: str, fp: dict, df: pd.DataFrame) -> None:
+        if not self.enabled:
+            return
+        path = self._entry_path(stage, fp)
+        tmp_path = f"{path}.tmp"
+        try:
+            df.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            return
+        # Solo se conserva la última entrada de cada etapa
+        for name in os.listdir(self.cache_dir):
+            other = os.path.join(self.cache_dir, name)
+            if name.startswith(f"{stage}-") and name.endswith(".pkl") and other != path:
+                try:
+                    os.remove(other)
+                except OSError:
+                    pass
+        self.save_manifest()
+
+    def save_manifest(self) -> None:
+        if not self.enabled:
+            return
+        tmp_path = f"{self._manifest_path()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._manifest, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self._manifest_path())
+        except Exception:
+            pass
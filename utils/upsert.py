@@ -0,0 +1,146 @@
+"""
+Upsert por clave de DataFrames (existentes + nuevos -> consolidado), sin
+bucles por fila: se alinea todo por la clave en un par de operaciones de
+pandas, así que escala a decenas de miles de filas.
+
+Reglas de conflicto cuando una clave está en los dos lados (`on_conflict`):
+- "replace": la fila nueva sustituye entera a la existente (por defecto).
+- "update": la fila nueva gana solo en sus valores no nulos; los nulos
+  conservan el valor existente.
+- "keep": gana la existente; de los nuevos solo entran claves nuevas.
+Con `preserve` se fijan columnas que siempre conservan el valor existente
+(no nulo), p. ej. la fecha en que el registro entró por primera vez.
+
+Las claves se comparan como texto (2, "2" y 2.0 son la misma; las nulas se
+descartan) y cada lado se deduplica (gana la última aparición) antes de
+combinar, de modo que el resultado nunca repite clave.
+
+`rebuild_today_from_cache` rehace el consolidado del día de un portal a partir
+de las fichas guardadas en la caché (modo offline de los scrapers).
+"""
+
+from typing import Iterable, Optional, Sequence
+
+import pandas as pd
+
+CONFLICT_RULES = ("replace", "update", "keep")
+
+
+def _key_str(v) -> str:
+    """Clave como texto; un float entero va sin ".0" (un id leído como float es la misma clave)."""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
+
+
+def _prepare(df: Optional[pd.DataFrame], key: str) -> pd.DataFrame:
+    if df is None:
+        return pd.DataFrame(columns=[key])
+    if key not in df.columns:
+        if df.empty:
+            return df.reindex(columns=list(df.columns) + [key])
+        raise KeyError(f"falta la columna clave '{key}'")
+    # Nulos fuera antes de pasar a texto: NaN no es clave (ni coincide con otro NaN)
+    out = df[df[key].notna()].copy()
+    out[key] = out[key].map(_key_str).astype(object)
+    out = out[~out[key].isin(("", "nan", "None"))]
+    return out.drop_duplicates(subset=[key], keep="last")
+
+
+def keyed_upsert(
+    existing: Optional[pd.DataFrame],
+    updates: Optional[pd.DataFrame],
+    key: str = "id",
+    *,
+    on_conflict: str = "replace",
+    preserve: Sequence[str] = (),
+    keep_keys: Optional[Iterable] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Consolida `updates` sobre `existing` por `key`.
+
+    - `keep_keys`: si se indica, las filas existentes cuya clave no esté en
+      él se descartan (p. ej. anuncios que ya no aparecen hoy). Las de
+      `updates` se conservan siempre.
+    - `columns`: columnas (y orden) del resultado; por defecto las de
+      `existing` seguidas de las nuevas de `updates`.
+
+    Orden del resultado: existentes no tocadas en su orden, y después las
+    filas de `updates` en el suyo (como concat + drop_duplicates(keep="last")).
+    """
+    if on_conflict not in CONFLICT_RULES:
+        raise ValueError(f"on_conflict debe ser uno de {CONFLICT_RULES}")
+    old = _prepare(existing, key)
+    new = _prepare(updates, key)
+
+    if keep_keys is not None:
+        old = old[old[key].isin({_key_str(k) for k in keep_keys if pd.notna(k)})]
+
+    if columns is None:
+        columns = list(old.columns) + [c for c in new.columns if c not in old.columns]
+    columns = list(columns)
+    if key not in columns:
+        columns = [key] + columns
+    old = old.reindex(columns=columns)
+    new = new.reindex(columns=columns)
+
+    if new.empty:
+        return old.reset_index(drop=True)
+    if old.empty:
+        return new.reset_index(drop=True)
+
+    overlap = new[key].isin(old[key])
+    if on_conflict == "keep":
+        new = new[~overlap]
+    else:
+        old_idx = old.set_index(key)
+        new_idx = new.set_index(key)
+        shared = new_idx.index[overlap.to_numpy()]
+        if on_conflict == "update" and len(shared):
+            merged = new_idx.loc[shared].combine_first(old_idx.loc[shared])
+            new_idx.loc[shared, merged.columns] = merged
+        for col in preserve:
+            if col in new_idx.columns and len(shared):
+                prev = old_idx.loc[shared, col]
+                keep = prev.notna()
+                if keep.any():
+                    new_idx.loc[prev.index[keep.to_numpy()], col] = prev[keep]
+        new = new_idx.reset_index()[columns]
+
+    untouched = old[~old[key].isin(new[key])]
+    return pd.concat([untouched, new], ignore_index=True)[columns]
+
+
+def rebuild_today_from_cache(ids, parse_cached, df_prev, keep_cols=("fecha_inclusion",)):
+    """
+    Consolidado del día reparseado offline desde la caché de fichas: `parse_cached(id)` devuelve un DataFrame de una
+    fila desde la caché (o None). Las fichas sin caché conservan su fila de
+    `df_prev` y las reparseadas mantienen de ella las columnas `keep_cols`
+    (p. ej. la fecha en que entraron). Devuelve (df_today, n_reparseadas).
+    """
+    ids = [_key_str(i) for i in ids if pd.notna(i)]
+    prev = pd.DataFrame()
+    if not df_prev.empty and "id_inmueble" in df_prev.columns:
+        prev = _prepare(df_prev, "id_inmueble")
+        prev = prev[prev["id_inmueble"].isin(set(ids))]
+        prev.index = prev["id_inmueble"]
+
+    filas = []
+    reparseadas = 0
+    for _id in ids:
+        df_i = parse_cached(_id)
+        if df_i is not None and not df_i.empty:
+            df_i = df_i.copy()
+            if _id in prev.index:
+                for col in keep_cols:
+                    if col in prev.columns and pd.notna(prev.at[_id, col]):
+                        df_i[col] = prev.at[_id, col]
+            filas.append(df_i)
+            reparseadas += 1
+        elif _id in prev.index:
+            filas.append(prev.loc[[_id]])
+
+    if not filas:
+        return df_prev.iloc[0:0].copy(), 0
+    return pd.concat(filas, ignore_index=True), reparseadas